@@ -0,0 +1,160 @@
+#
+# Import time of the argoneon modules behind the CLI entry points, each measured in a
+# fresh interpreter, and a check that importing them touches no hardware: RPi.GPIO
+# and smbus2 must not be loaded until something uses the board.  Then each entry
+# point is run the way a login script or unit file would run its quickest command,
+# under python -X importtime, and the import report is totalled.  Exits with status 1
+# if a module or an entry point is over the budget or a module loads a hardware
+# module, so it can gate changes.
+#
+#   python benchmarks/import_time.py                    # table
+#   python benchmarks/import_time.py --budget-ms 150    # stricter budget
+#   python benchmarks/import_time.py --json out.json    # plus machine-readable results
+#
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from argoneon.version import ARGON_VERSION
+
+# Modules with entry points, plus the ones the daemons build on
+MODULES = ("argoneon.argond", "argoneon.oned", "argoneon.eond", "argoneon.irdecoder",
+           "argoneon.status", "argoneon.oled", "argoneon.screens", "argoneon.sysinfo")
+
+HARDWARE_MODULES = ("RPi.GPIO", "smbus2")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(name for name in {hardware!r} if name in sys.modules))
+"""
+
+# Entry point, module with its main() and the arguments to run it with.  None only
+# imports the module, for commands that have nothing quick to run.
+ENTRY_POINTS = (
+    ("argond --version", "argoneon.argond", ["--version"]),
+    ("argononed --version", "argoneon.oned", ["--version"]),
+    ("argoneond --version", "argoneon.eond", ["--version"]),
+    ("argonstatus -v", "argoneon.status", ["-v"]),
+    ("argonstatus --fan", "argoneon.status", ["--fan"]),
+    ("argonirdecoder", "argoneon.irdecoder", None),
+)
+
+RUN = """
+import sys
+sys.argv = ["{name}"] + {args!r}
+from {module} import main
+main()
+"""
+
+IMPORT = "import {module}"
+
+
+def measure(module, runs):
+    """
+    Best and mean import time of module in ms over runs fresh interpreters, and the
+    hardware modules the import loaded.
+    """
+    times = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, hardware=HARDWARE_MODULES)],
+                                capture_output=True, text=True, check=True).stdout
+        # The last line is ours, modules may print on import
+        output = output.splitlines()[-1].split()
+        times.append(float(output[0]) * 1000)
+        loaded = output[1].split(",") if len(output) > 1 else []
+    return {"name": module, "best_ms": min(times), "mean_ms": sum(times) / len(times), "hardware": loaded}
+
+
+def importtimes(report):
+    """
+    Parse a -X importtime report into (cumulative us, self us, module, depth) rows.
+    """
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(fields[1]), int(fields[0]), name.strip(), depth))
+    return rows
+
+
+def measureentry(name, module, args, runs):
+    """
+    Best of runs: total import time, the package's own share, modules imported and the
+    heaviest top level imports, plus the wall time of the whole process.
+    """
+    if args is None:
+        code = IMPORT.format(module=module)
+    else:
+        code = RUN.format(name=name.split()[0], args=args, module=module)
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                                 capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        rows = importtimes(process.stderr)
+        toplevel = sorted((row for row in rows if row[3] == 0), reverse=True)
+        result = {"name": name, "wall_ms": wall * 1000,
+                  "import_ms": sum(row[0] for row in toplevel) / 1000,
+                  "argoneon_ms": sum(row[1] for row in rows if row[2].startswith("argoneon")) / 1000,
+                  "modules": len(rows),
+                  "heaviest": [[row[2], row[0] / 1000] for row in toplevel[:3]]}
+        if best is None or result["import_ms"] < best["import_ms"]:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure argoneon import times, side effects and CLI startup.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module and entry point (default 5).")
+    parser.add_argument("--budget-ms", type=float, default=250, help="Import time budget per module and entry point (default 250).")
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON to FILE ('-' for stdout).")
+    args = parser.parse_args()
+
+    results = [measure(module, args.runs) for module in MODULES]
+    entrypoints = [measureentry(name, module, cmdargs, args.runs) for name, module, cmdargs in ENTRY_POINTS]
+    failed = [result for result in results
+              if result["best_ms"] > args.budget_ms or len(result["hardware"]) > 0]
+    failed.extend(result for result in entrypoints if result["import_ms"] > args.budget_ms)
+
+    if args.json != "-":
+        print(f"{'module':<24} {'best ms':>9} {'mean ms':>9}  hardware loaded")
+        for result in results:
+            print(f"{result['name']:<24} {result['best_ms']:>9.1f} {result['mean_ms']:>9.1f}"
+                  f"  {', '.join(result['hardware'])}")
+        print()
+        print(f"{'entry point':<22} {'import ms':>9} {'own ms':>7} {'modules':>7} {'wall ms':>8}  heaviest imports")
+        for result in entrypoints:
+            heaviest = ", ".join("%s %.1f" % (module, ms) for module, ms in result["heaviest"])
+            print(f"{result['name']:<22} {result['import_ms']:>9.1f} {result['argoneon_ms']:>7.1f}"
+                  f" {result['modules']:>7} {result['wall_ms']:>8.1f}  {heaviest}")
+        for result in failed:
+            print(f"FAIL {result['name']}", file=sys.stderr)
+
+    if args.json:
+        report = {"version": ARGON_VERSION, "python": platform.python_version(),
+                  "machine": platform.machine(), "time": time.time(), "budget_ms": args.budget_ms,
+                  "results": results, "entry_points": entrypoints}
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
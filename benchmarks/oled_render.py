@@ -0,0 +1,154 @@
+#
+# Micro-benchmarks for argoneon.oled and the OLED screens, runnable without an Argon
+# board: all panel traffic goes to a virtualoled.VirtualPanel, which also counts the
+# I2C transactions and bytes each flushimage() costs.
+#
+#   python benchmarks/oled_render.py                 # table
+#   python benchmarks/oled_render.py --json out.json # plus machine-readable results
+#
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+from timeit import Timer
+
+from argoneon import oled, screens
+from argoneon.version import ARGON_VERSION
+from argoneon.virtualoled import VirtualPanel
+
+# Every font shipped in oled/, by character width
+FONTWIDTHS = (6, 8, 12, 16, 24, 32, 48)
+
+# Five minutes of history samples
+CPUHISTORY = [(i * 37) % 100 for i in range(60)]
+TEMPHISTORY = [45 + (i * 7) % 20 for i in range(60)]
+DISKHISTORY = [(i * 1297) % 20000 for i in range(60)]
+
+CPU = [{"title": "cpu0", "value": 12}, {"title": "cpu1", "value": 3},
+       {"title": "cpu2", "value": 87}, {"title": "cpu3", "value": 40}]
+STORAGE = [{"title": "nvme0n1", "value": "477GB", "usage": 31},
+           {"title": "md0", "value": "11TB", "usage": 64},
+           {"title": "mmcblk0", "value": "30GB", "usage": 12}]
+BANDWIDTH = [{"disk": "md0", "read": 20480, "write": 1024},
+             {"disk": "nvme0n1", "read": 0, "write": 256}]
+RAID = {"title": "md0", "value": "raid5",
+        "info": {"state": "clean, degraded, recovering", "raidtype": "raid5", "size": 11718752256,
+                 "used": 3906250752, "devices": 4, "active": 3, "working": 4, "failed": 0,
+                 "spare": 1, "resync": "42% complete", "hddlist": []}}
+RAM = ["71%", "8GB"]
+TEMP = {"cpu": 52.6, "hdd": {"sda": 34.0, "sdb": 36.0, "sdc": 35.0, "sdd": 38.0}, "unit": "C",
+        "history": TEMPHISTORY}
+IP = ("eth0", "192.168.100.200")
+CLOCK = datetime.datetime(2023, 1, 16, 9, 5)
+
+SCREENS = {
+    "cpu": lambda: screens.drawcpu(CPU),
+    "cpu history": lambda: screens.drawcpuhistory(CPUHISTORY),
+    "storage": lambda: screens.drawstorage(STORAGE),
+    "bandwidth": lambda: screens.drawbandwidth(BANDWIDTH, DISKHISTORY),
+    "raid": lambda: screens.drawraid(RAID),
+    "ram": lambda: screens.drawram(RAM),
+    "temp": lambda: screens.drawtemp(TEMP),
+    "ip": lambda: screens.drawip(IP),
+    "clock": lambda: screens.drawclock(CLOCK),
+}
+
+
+def measure(name, stmt):
+    """
+    Time stmt, best of five runs, in microseconds per call.
+    """
+    timer = Timer(stmt)
+    number, _ = timer.autorange()
+    runs = [t / number * 1e6 for t in timer.repeat(repeat=5, number=number)]
+    return {"name": name, "best_us": min(runs), "mean_us": sum(runs) / len(runs), "number": number}
+
+
+def primitives():
+    results = [
+        measure("loadbg", lambda: oled.loadbg("bgcpu")),
+        measure("clearbuffer", lambda: oled.clearbuffer()),
+        measure("drawfilledrectangle aligned 64x16", lambda: oled.drawfilledrectangle(32, 16, 64, 16)),
+        measure("drawfilledrectangle unaligned 64x13", lambda: oled.drawfilledrectangle(32, 13, 64, 13, 2)),
+        measure("drawcolumns 74x48", lambda: oled.drawcolumns(CPUHISTORY, 54, 16, 74, 48)),
+        measure("drawsparkline 74x8 unaligned", lambda: oled.drawsparkline(TEMPHISTORY, 54, 53, 74, 8, 40, 80)),
+    ]
+    for charwd in FONTWIDTHS:
+        font = oled.loadfont(charwd)
+        fontname = "%dx%d" % (font.charht, font.charwd)
+        for y, kind in ((8, "aligned"), (11, "unaligned")):
+            results.append(measure("writetext %s %s" % (fontname, kind),
+                                   lambda: oled.writetext("Argon 42%", 0, y, charwd)))
+            results.append(measure("writetextaligned %s %s" % (fontname, kind),
+                                   lambda: oled.writetextaligned("Argon 42%", 0, y, oled.WD, 1, charwd)))
+        # Same text every time is the text cache's best case, defeat it for comparison
+        results.append(measure("writetext %s aligned uncached" % fontname,
+                               lambda: (oled.textcache.clear(), oled.writetext("Argon 42%", 0, 8, charwd))))
+    return results
+
+
+def screenrenders():
+    results = []
+    for name, draw in SCREENS.items():
+        results.append(measure("screen %s" % name, draw))
+    return results
+
+
+def flushes(panel):
+    """
+    Time the Python side of a full flush and a marquee and count their I2C traffic.
+    """
+    results = []
+    for hidescreen in (True, False):
+        name = "flushimage hidescreen=%s" % hidescreen
+        result = measure(name, lambda: oled.flushimage(hidescreen))
+        transactions, nbytes = panel.transactions, panel.bytes
+        oled.flushimage(hidescreen)
+        result["i2c_transactions"] = panel.transactions - transactions
+        result["i2c_bytes"] = panel.bytes - nbytes
+        results.append(result)
+
+    # A hardware scrolled marquee costs its setup commands, however long it runs
+    animation = oled.marquee("nvme0n1p12  ", 24)
+    result = measure("marquee start", lambda: oled.sendcommands(animation))
+    transactions, nbytes = panel.transactions, panel.bytes
+    oled.sendcommands(animation)
+    result["i2c_transactions"] = panel.transactions - transactions
+    result["i2c_bytes"] = panel.bytes - nbytes
+    results.append(result)
+    oled.stopscroll()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OLED rendering without hardware.")
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON to FILE ('-' for stdout).")
+    args = parser.parse_args()
+
+    panel = VirtualPanel(maxframes=1)
+    oled.setbackend(panel)
+
+    results = primitives() + screenrenders() + flushes(panel)
+
+    if args.json != "-":
+        print(f"{'benchmark':<44} {'best us':>10} {'mean us':>10} {'i2c tx':>7} {'i2c bytes':>10}")
+        for result in results:
+            print(f"{result['name']:<44} {result['best_us']:>10.1f} {result['mean_us']:>10.1f}"
+                  f" {result.get('i2c_transactions', ''):>7} {result.get('i2c_bytes', ''):>10}")
+
+    if args.json:
+        report = {"version": ARGON_VERSION, "python": platform.python_version(),
+                  "machine": platform.machine(), "time": time.time(), "results": results}
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#
+# Times oled.writetext() for text that does not start on a page boundary, against the
+# per-pixel writebuffer() loop it replaced.
+#
+#   python benchmarks/oled_text.py
+#
+
+from timeit import repeat
+
+from argoneon import oled
+
+TEXT = "sda1 1.8TB"
+NUMBER = 200
+
+
+def pixelwritetext(textdata, x, y, charwd=6, mode=0):
+    """
+    The old unaligned path of writetext(): one writebuffer() call per glyph pixel.
+    """
+    font = oled.loadfont(charwd)
+    numfontrow = font.charht >> 3
+    for ch in textdata:
+        fontoffset = ord(ch)*font.charwd
+        fontcol = 0
+        while fontcol < font.charwd and x < oled.WD:
+            fontrow = 0
+            row = y
+            while fontrow < numfontrow and row < oled.HT and x >= 0:
+                curbit = 0x80
+                curbyte = font.fontbytes[fontoffset + fontcol + (oled.NUMFONTCHAR*font.charwd*fontrow)]
+                subrow = 0
+                while subrow < 8 and row < oled.HT:
+                    oled.writebuffer(x, row, curbyte & curbit, mode)
+                    curbit = curbit >> 1
+                    row = row + 1
+                    subrow = subrow + 1
+                fontrow = fontrow + 1
+            fontcol = fontcol + 1
+            x = x + 1
+
+
+def best(stmt):
+    return min(repeat(stmt, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+
+def main():
+    print(f"{'font':<6} {'y':>3} {'per-pixel us':>13} {'shifted us':>11} {'speedup':>8}")
+    for charwd in (6, 8):
+        font = oled.loadfont(charwd)
+        for y in (1, 3, 5, 7, 13):
+            old = best(lambda: pixelwritetext(TEXT, 0, y, charwd))
+            new = best(lambda: oled.writetext(TEXT, 0, y, charwd))
+            name = f"{font.charht}x{font.charwd}"
+            print(f"{name:<6} {y:>3} {old:>13.1f} {new:>11.1f} {old/new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
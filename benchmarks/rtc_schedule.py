@@ -0,0 +1,446 @@
+#
+# RTC schedules: the bit mask schedules of argoneon.schedule against the ones eond
+# used before, a dict for every combination of the listed values of a line.  Times
+#
+#  * the search for the next alarm, which setNextAlarm() did by stepping through the
+#    calendar a week and then a minute at a time, and
+#  * the check whether a command is due, which getCommandForTime() did by comparing
+#    every dict's fields.
+#
+# The old code is kept below as the reference, and both must agree on every case.  It
+# knows no ranges or steps, so the lines using them come with their spelt out form.
+#
+#   python benchmarks/rtc_schedule.py                 # table
+#   python benchmarks/rtc_schedule.py --json out.json # plus machine-readable results
+#
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+from timeit import Timer
+
+from argoneon import eond, schedule
+from argoneon.version import ARGON_VERSION
+
+# rtc.conf contents, "on" lines only as only those set the alarm, and the same for the
+# reference if it needs them spelt out
+CONFIGS = (
+    ("daily", ["0 7 * * * on"], None),
+    ("weekdays", ["30 6 * * 1-5 on", "0 9 * * 0,6 on"], ["30 6 * * 1,2,3,4,5 on", "0 9 * * 0,6 on"]),
+    ("hourly", ["15 * * * * on"], None),
+    ("monthly", ["0 6 31 * * on", "0 8 1,15 * * on"], None),
+    ("friday 13th", ["0 0 13 * 5 on"], None),
+    ("sunday 31st", ["0 6 31 * 0 on"], None),
+    ("expanded", ["*/15 1-3 * * 1-5 on", "5,35 8-22/4,22 * * * on", "0 0 1,15 * * on", "0 12 29 * 1 on"],
+     ["0,15,30,45 1,2,3 * * 1,2,3,4,5 on", "5,35 8,12,16,20,22 * * * on", "0 0 1,15 * * on",
+      "0 12 29 * 1 on"]),
+)
+
+# Alarms in a row for the walk, and how late argoneond sees each go off
+WALK = 50
+LATE = datetime.timedelta(seconds=30)
+
+# Times to search from, spread over a few years
+STARTS = [datetime.datetime(2023, 1, 16, 12, 0, 30) + datetime.timedelta(minutes=9973 * i) for i in range(100)]
+
+
+#
+# Reference: eond before argoneon.schedule, without the RTC writes
+#
+
+def getConfigValue(valuestr):
+    # Load config value as array of integers
+    try:
+        if valuestr == "*":
+            return [-1]
+        tmplist = valuestr.split(",")
+        map_object = map(int, tmplist)
+        return list(map_object)
+    except:
+        return [-1]
+
+
+def newCommandSchedule(curline):
+    # Load config line data as array of Command schedule
+    result = []
+    linedata = curline.split(" ")
+    if len(linedata) < 6:
+        return result
+
+    minutelist = getConfigValue(linedata[0])
+    hourlist = getConfigValue(linedata[1])
+    datelist = getConfigValue(linedata[2])
+    # monthlist = getConfigValue(linedata[3])
+    monthlist = [-1]  # Certain edge cases will not be handled properly
+    weekdaylist = getConfigValue(linedata[4])
+
+    cmd = ""
+    ctr = 5
+    while ctr < len(linedata):
+        cmd = cmd + " " + linedata[ctr]
+        ctr = ctr + 1
+    cmd = cmd.strip()
+
+    for curmin in minutelist:
+        for curhour in hourlist:
+            for curdate in datelist:
+                for curmonth in monthlist:
+                    for curweekday in weekdaylist:
+                        result.append({"minute": curmin, "hour": curhour, "date": curdate,
+                                      "month": curmonth, "weekday": curweekday, "cmd": cmd})
+
+    return result
+
+
+def legacyschedules(lines):
+    # eond.formCommandScheduleList()
+    result = []
+    for line in lines:
+        result = result + newCommandSchedule(line)
+    return result
+
+
+def checkDateForCommandSchedule(commandschedule, datetimeobj):
+    # Check Command schedule if it should fire for the give time
+    testminute = commandschedule.get("minute", -1)
+    testhour = commandschedule.get("hour", -1)
+    testdate = commandschedule.get("date", -1)
+    testmonth = commandschedule.get("month", -1)
+    testweekday = commandschedule.get("weekday", -1)
+
+    if testminute < 0 or testminute == datetimeobj.minute:
+        if testhour < 0 or testhour == datetimeobj.hour:
+            if testdate < 0 or testdate == datetimeobj.day:
+                if testmonth < 0 or testmonth == datetimeobj.month:
+                    if testweekday < 0:
+                        return True
+                    else:
+                        # python Sunday = 6, RTC Sunday = 0
+                        weekDay = datetimeobj.weekday()
+                        if weekDay == 6:
+                            weekDay = 0
+                        else:
+                            weekDay = weekDay + 1
+                        if testweekday == weekDay:
+                            return True
+    return False
+
+
+def getLastMonthDate(year, month):
+    # Get Last Date of Month
+    if month < 12:
+        testtime = datetime.datetime(year, month+1, 1)
+    else:
+        testtime = datetime.datetime(year+1, 1, 1)
+    testtime = testtime - datetime.timedelta(days=1)
+    return testtime.day
+
+
+def incrementCommandScheduleTime(commandschedule, testtime, addmode):
+    # Increment to the next iteration of command schedule
+    if addmode == "minute":
+        testfield = commandschedule.get(addmode, -1)
+        if testfield < 0:
+            if testtime.minute < 59:
+                return testtime + datetime.timedelta(minutes=1)
+            else:
+                return incrementCommandScheduleTime(commandschedule, testtime.replace(minute=0), "hour")
+        else:
+            return incrementCommandScheduleTime(commandschedule, testtime, "hour")
+    elif addmode == "hour":
+        testfield = commandschedule.get(addmode, -1)
+        if testfield < 0:
+            if testtime.hour < 23:
+                return testtime + datetime.timedelta(hours=1)
+            else:
+                return incrementCommandScheduleTime(commandschedule, testtime.replace(hour=0), "date")
+        else:
+            return incrementCommandScheduleTime(commandschedule, testtime, "date")
+    elif addmode == "date":
+        testfield = commandschedule.get(addmode, -1)
+        if testfield < 0:
+            maxmonthdate = getLastMonthDate(testtime.year, testtime.month)
+            if testtime.day < maxmonthdate:
+                return testtime + datetime.timedelta(days=1)
+            else:
+                return incrementCommandScheduleTime(commandschedule, testtime.replace(day=1), "month")
+        else:
+            return incrementCommandScheduleTime(commandschedule, testtime, "month")
+    elif addmode == "month":
+        testfield = commandschedule.get(addmode, -1)
+        if testfield < 0:
+            nextmonth = testtime.month
+            nextyear = testtime.year
+            while True:
+                if nextmonth < 12:
+                    nextmonth = nextmonth + 1
+                else:
+                    nextmonth = 1
+                    nextyear = nextyear + 1
+                maxmonthdate = getLastMonthDate(nextyear, nextmonth)
+                if testtime.day <= maxmonthdate:
+                    return testtime.replace(month=nextmonth, year=nextyear)
+        else:
+            return incrementCommandScheduleTime(commandschedule, testtime, "year")
+    else:
+        # Year
+        if testtime.month == 2 and testtime.day == 29:
+            # Leap day handling
+            nextyear = testtime.year
+            while True:
+                nextyear = nextyear + 1
+                maxmonthdate = getLastMonthDate(nextyear, testtime.month)
+                if testtime.day <= maxmonthdate:
+                    return testtime.replace(year=nextyear)
+        else:
+            return testtime.replace(year=(testtime.year+1))
+
+
+def getCommandForTime(commandschedulelist, datetimeobj, checkcmd):
+    # Get current command
+    ctr = 0
+    while ctr < len(commandschedulelist):
+        testcmd = commandschedulelist[ctr].get("cmd", "")
+        if (testcmd.lower() == checkcmd or len(checkcmd) == 0) and len(testcmd) > 0:
+            if checkDateForCommandSchedule(commandschedulelist[ctr], datetimeobj) == True:
+                return testcmd
+        ctr = ctr + 1
+    return ""
+
+
+def legacynext(commandschedulelist, curtime):
+    # eond.setNextAlarm() up to the RTC writes
+
+    # Divisible by 4 for leap day
+    checklimityears = 12
+    foundnextcmd = False
+    nextcommandschedule = {}
+    # To be sure it's later than any schedule
+    nextcommandtime = curtime.replace(year=(curtime.year+checklimityears))
+
+    ctr = 0
+    while ctr < len(commandschedulelist):
+        testcmd = commandschedulelist[ctr].get("cmd", "").lower()
+        if testcmd == "on":
+            invaliddata = False
+            testminute = commandschedulelist[ctr].get("minute", -1)
+            testhour = commandschedulelist[ctr].get("hour", -1)
+            testdate = commandschedulelist[ctr].get("date", -1)
+            testmonth = commandschedulelist[ctr].get("month", -1)
+            testweekday = commandschedulelist[ctr].get("weekday", -1)
+
+            tmpminute = testminute
+            tmphour = testhour
+            tmpdate = testdate
+            tmpmonth = testmonth
+            tmpyear = curtime.year
+
+            if tmpminute < 0:
+                tmpminute = curtime.minute
+
+            if tmphour < 0:
+                tmphour = curtime.hour
+
+            if tmpdate < 0:
+                tmpdate = curtime.day
+
+            if tmpmonth < 0:
+                tmpmonth = curtime.month
+
+            maxmonthdate = getLastMonthDate(tmpyear, tmpmonth)
+            if tmpdate > maxmonthdate:
+                # Invalid month date
+                if testdate < 0:
+                    tmpdate = maxmonthdate
+                else:
+                    # Date is fixed
+                    if testminute < 0:
+                        tmpminute = 0
+                    if testhour < 0:
+                        tmphour = 0
+                    if testmonth < 0 and testdate <= 31:
+                        # Look for next valid month
+                        while tmpdate > maxmonthdate:
+                            if tmpmonth < 12:
+                                tmpmonth = tmpmonth + 1
+                            else:
+                                tmpmonth = 1
+                                tmpyear = tmpyear + 1
+                            maxmonthdate = getLastMonthDate(tmpyear, tmpmonth)
+                    elif tmpdate == 29 and tmpmonth == 2:
+                        # Fixed to leap day
+                        while tmpdate > maxmonthdate:
+                            tmpyear = tmpyear + 1
+                            maxmonthdate = getLastMonthDate(tmpyear, tmpmonth)
+                    else:
+                        invaliddata = True
+            if invaliddata == False:
+                try:
+                    testtime = datetime.datetime(
+                        tmpyear, tmpmonth, tmpdate, tmphour, tmpminute)
+                except:
+                    # Force time diff
+                    testtime = curtime - datetime.timedelta(hours=1)
+                tmptimediff = (curtime - testtime).total_seconds()
+            else:
+                tmptimediff = 0
+
+            if testweekday >= 0:
+                # Day of Week check
+                # python Sunday = 6, RTC Sunday = 0
+                weekDay = testtime.weekday()
+                if weekDay == 6:
+                    weekDay = 0
+                else:
+                    weekDay = weekDay + 1
+
+                if weekDay != testweekday or tmptimediff > 0:
+                    # Resulting 0-ed time will be <= the testtime
+                    if testminute < 0:
+                        testtime = testtime.replace(minute=0)
+                    if testhour < 0:
+                        testtime = testtime.replace(hour=0)
+
+                    dayoffset = testweekday-weekDay
+                    if dayoffset < 0:
+                        dayoffset = dayoffset + 7
+                    elif dayoffset == 0:
+                        dayoffset = 7
+
+                    testtime = testtime + datetime.timedelta(days=dayoffset)
+
+                # Just look for the next valid weekday; Can be optimized
+                while checkDateForCommandSchedule(commandschedulelist[ctr], testtime) == False and (testtime.year - curtime.year) < checklimityears:
+                    testtime = testtime + datetime.timedelta(days=7)
+
+                if (testtime.year - curtime.year) >= checklimityears:
+                    # Too many iterations, abort/ignore
+                    tmptimediff = 0
+                else:
+                    tmptimediff = (curtime - testtime).total_seconds()
+            if tmptimediff > 0:
+                # Find next iteration that's greater than the current time (Day of Week check already handled)
+                while tmptimediff >= 0:
+                    testtime = incrementCommandScheduleTime(
+                        commandschedulelist[ctr], testtime, "minute")
+                    tmptimediff = (curtime - testtime).total_seconds()
+
+            if nextcommandtime > testtime and tmptimediff < 0:
+                nextcommandschedule = commandschedulelist[ctr]
+                nextcommandtime = testtime
+                foundnextcmd = True
+
+        ctr = ctr + 1
+    if foundnextcmd == True:
+        return nextcommandtime, nextcommandschedule
+    return None
+
+
+def legacyresult(found):
+    # The alarm time as for the new code, the dict will differ
+    return found and found[0]
+
+
+def agendanext(commandschedulelist, curtime):
+    return schedule.Agenda(commandschedulelist, "on").next(curtime)
+
+
+def legacywalk(commandschedulelist, count):
+    """
+    The next count alarms from STARTS[0], as argoneond sets them one after the other,
+    each half a minute after the one before went off.  Fewer if the schedules run out.
+    """
+    found = (STARTS[0],)
+    times = []
+    for _ in range(count):
+        found = legacynext(commandschedulelist, found[0] + LATE)
+        if found is None:
+            break
+        times.append(found[0])
+    return times
+
+
+def agendawalk(commandschedulelist, count):
+    agenda = schedule.Agenda(commandschedulelist, "on")
+    found = (STARTS[0],)
+    times = []
+    for _ in range(count):
+        found = agenda.next(found[0] + LATE)
+        if found is None:
+            break
+        times.append(found[0])
+    return times
+
+
+def best(func, *args):
+    timer = Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(3, number)) / number
+
+
+def measure(name, lines, legacylines):
+    """
+    Microseconds per search from each of STARTS with a new agenda each time, per alarm
+    of a walk through the next WALK alarms with one agenda, and per check of a minute.
+    """
+    legacy = legacyschedules(legacylines or lines)
+    schedules = eond.formCommandScheduleList(lines)
+    minutes = [start + datetime.timedelta(minutes=minute) for start in STARTS[:10] for minute in range(60)]
+    mismatches = [start for start in STARTS
+                  if legacyresult(legacynext(legacy, start)) != legacyresult(agendanext(schedules, start))]
+    if legacywalk(legacy, WALK) != agendawalk(schedules, WALK):
+        mismatches.append("walk")
+    mismatches.extend(minute for minute in minutes
+                      if getCommandForTime(legacy, minute, "on") != eond.getCommandForTime(schedules, minute, "on"))
+    for start in mismatches[:3]:
+        print(f"MISMATCH {name} from {start}", file=sys.stderr)
+
+    results = {"name": name, "schedules": len(schedules), "legacy_schedules": len(legacy),
+               "mismatches": len(mismatches)}
+    for label, search, walk, match, compiled in (
+            ("legacy", legacynext, legacywalk, getCommandForTime, legacy),
+            ("nextfire", agendanext, agendawalk, eond.getCommandForTime, schedules)):
+        results[label + "_us"] = best(lambda: [search(compiled, start) for start in STARTS]) / len(STARTS) * 1e6
+        results[label + "_walk_us"] = best(walk, compiled, WALK) / WALK * 1e6
+        results[label + "_match_us"] = best(lambda: [match(compiled, minute, "on") for minute in minutes]) \
+            / len(minutes) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the next RTC alarm search.")
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON to FILE ('-' for stdout).")
+    args = parser.parse_args()
+
+    results = [measure(name, lines, legacylines) for name, lines, legacylines in CONFIGS]
+    failed = [result for result in results if result["mismatches"] > 0]
+
+    if args.json != "-":
+        print(f"{'config':<14} {'schedules':>9} {'legacy us':>10} {'nextfire us':>12}"
+              f" {'legacy walk us':>15} {'nextfire walk us':>17} {'legacy match us':>16}"
+              f" {'mask match us':>14} {'mismatches':>10}")
+        for result in results:
+            schedules = f"{result['legacy_schedules']}/{result['schedules']}"
+            print(f"{result['name']:<14} {schedules:>9} {result['legacy_us']:>10.1f}"
+                  f" {result['nextfire_us']:>12.1f} {result['legacy_walk_us']:>15.1f}"
+                  f" {result['nextfire_walk_us']:>17.1f} {result['legacy_match_us']:>16.2f}"
+                  f" {result['nextfire_match_us']:>14.2f} {result['mismatches']:>10}")
+
+    if args.json:
+        report = {"version": ARGON_VERSION, "python": platform.python_version(),
+                  "machine": platform.machine(), "time": time.time(), "results": results}
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as file:
+                json.dump(report, file, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#
+# One daemon for everything on the Argon board.  argond looks at which devices answer
+# on the I2C bus and runs the matching parts of argononed (fan, OLED display, power
+# button) and argoneond (RTC schedules) as tasks of a single event loop, sharing the
+# bus and the collector threads.
+#
+# Standard Deployment/Triggers:
+#  * Runs as service via /lib/systemd/system/argond.service, in place of
+#    argononed.service and argoneond.service
+#
+
+from . import eond, hardware, oned, timing
+from . import logging as log
+from .cli import Cli
+from .config import loadDebugMode, loadMetricsConfig
+from .version import ARGON_VERSION
+
+main = Cli('Operates the fan, billboard display, power button and RTC on the Argon EON and Argon ONE.')
+
+
+@main.command('Print the features found on the board.')
+def cmd_features():
+    for name in sorted(hardware.features()):
+        print(name)
+
+
+@main.command('Print how long the running service takes for its tasks.')
+def cmd_timing():
+    print(timing.describe(timing.load(timing.statsfile("argond"))))
+
+
+@main.command('Run the daemon.')
+async def cmd_service():
+    from . import metrics, profiler
+
+    log.enable(loadDebugMode())
+    log.info("argond service version %s starting.", ARGON_VERSION)
+    log.install("argond")
+    profiler.install("argond")
+    found = hardware.features()
+    log.info("Found %s", ", ".join(sorted(found)) if found else "no Argon devices")
+
+    others = [timing.monitor("argond"), *metrics.tasks(loadMetricsConfig())]
+    if "rtc" in found:
+        others.append(eond.rtc_loop())
+    await oned.service("fan" in found, "oled" in found and oned.OLED_ENABLED, *others)
+    log.debug('cmd_service return')
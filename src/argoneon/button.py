@@ -0,0 +1,78 @@
+#
+# Power button events.  The MCU reports the button on BCM pin 4 as a single pulse
+# whose width says what happened:
+#
+#   20-30ms  reboot request (double-tap)
+#   40-50ms  shutdown request (hold and release after 3 secs)
+#   60-70ms  switch OLED screen (single tap)
+#
+# PulseDecoder gets a callback from RPi.GPIO for both edges, timestamps them with
+# time.monotonic_ns() and hands each classified pulse to a function, so nothing polls
+# the pin while the button is idle or pressed.
+#
+
+import time
+
+from . import logging as log
+
+REBOOT = "REBOOT"
+SHUTDOWN = "SHUTDOWN"
+SWITCH = "OLEDSWITCH"
+
+# Pulse width bands in ms, from (inclusive) and to (exclusive), with some slack
+# around the nominal widths for callback latency
+PULSES = (
+    (10, 35, REBOOT),
+    (35, 55, SHUTDOWN),
+    (55, 80, SWITCH),
+)
+
+
+def classify(widthns):
+    """
+    The event a pulse widthns nanoseconds wide stands for, or None for noise.
+    """
+    widthms = widthns / 1000000
+    for low, high, event in PULSES:
+        if low <= widthms < high:
+            return event
+    return None
+
+
+class PulseDecoder(object):
+    """
+    Measures pulses on pin from edge callbacks and calls deliver(event, widthns) for
+    every pulse that classify() recognises.  gpio is RPi.GPIO or a stand in such as
+    virtualgpio.ReplayGPIO, clock a monotonic_ns() compatible function.  deliver runs
+    on the GPIO callback thread.
+    """
+
+    def __init__(self, gpio, pin, deliver, clock=time.monotonic_ns):
+        self.gpio = gpio
+        self.pin = pin
+        self.deliver = deliver
+        self.clock = clock
+        self.rise = None
+
+    def start(self):
+        self.rise = None
+        self.gpio.add_event_detect(self.pin, self.gpio.BOTH, callback=self.edge)
+
+    def stop(self):
+        self.gpio.remove_event_detect(self.pin)
+
+    def edge(self, channel):
+        now = self.clock()
+        # The callback does not say which edge it was, the pin level does as long as
+        # the pulse outlasts the callback latency, which is well under a millisecond
+        if self.gpio.input(channel) == self.gpio.HIGH:
+            self.rise = now
+            return
+        if self.rise is None:
+            return
+        width = now - self.rise
+        self.rise = None
+        event = classify(width)
+        log.debug("Button pulse of %.1fms: %s", width / 1000000, event)
+        if event is not None:
+            self.deliver(event, width)
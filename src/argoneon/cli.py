@@ -1,5 +1,4 @@
 from argparse import ArgumentParser, _SubParsersAction
-from asyncio import run
 from inspect import iscoroutine
 from typing import Any, Callable, Dict, Protocol, TypedDict
 
@@ -56,6 +55,8 @@ class Cli(object):
             ret = args.func(args)
 
         if iscoroutine(ret):
+            # Only the daemons need asyncio, the other commands start faster without it
+            from asyncio import run
             ret = run(ret, debug=True)
 
         print('exit(', ret, ')')
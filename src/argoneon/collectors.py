@@ -0,0 +1,125 @@
+#
+# Runs the blocking probes the daemon needs (smartctl, df, mount and mdadm through
+# os.popen, /proc and /sys reads) on a small pool of collector threads, so the event
+# loop never waits on an external tool.
+#
+# Every probe has a name and a timeout.  A probe that is still running when it is
+# asked for again, the same function with the same arguments under the same name, is
+# shared rather than started twice, so a hung tool ties up one
+# collector thread at most and its result still reaches whoever asks next.
+#
+#   temp = await collectors.collect("hdd temp", sysinfo.get_max_hdd_temp, timeout=20)
+#
+
+import time
+from asyncio import TimeoutError, shield, wait_for, wrap_future
+from concurrent.futures import ThreadPoolExecutor
+from threading import RLock
+
+from . import logging as log
+from . import timing
+
+MAX_WORKERS = 4
+TIMEOUT = 10
+
+
+class Collectors(object):
+    """
+    A bounded pool of collector threads, with queue depth and outcome counts.
+    """
+
+    def __init__(self, maxworkers=MAX_WORKERS):
+        self.maxworkers = maxworkers
+        self._executor = None
+        self._lock = RLock()
+        self._inflight = {}
+        self.durations = {}
+        self.queued = 0
+        self.maxqueued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.shared = 0
+
+    async def run(self, name, func, *args, timeout=TIMEOUT):
+        """
+        Return func(*args) as run on a collector thread.  Raises TimeoutError after
+        timeout seconds, the probe then finishes in the background and the next run() of
+        the same name, func and args waits for it rather than starting another.
+        """
+        key = (name, func, args)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.maxworkers, thread_name_prefix='collector')
+                future = self._executor.submit(self._call, name, func, args)
+                self._inflight[key] = future
+                self.queued = self.queued + 1
+                self.maxqueued = max(self.maxqueued, self.queued)
+                future.add_done_callback(lambda future: self._done(key, future))
+            else:
+                self.shared = self.shared + 1
+
+        try:
+            # Shielded, a caller giving up must not cancel a probe others wait for
+            return await wait_for(shield(wrap_future(future)), timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts = self.timeouts + 1
+            log.error("Collecting %s timed out after %ss", name, timeout)
+            raise
+
+    def _call(self, name, func, args):
+        with self._lock:
+            self.queued = self.queued - 1
+            self.running = self.running + 1
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            duration = time.monotonic() - start
+            with self._lock:
+                self.running = self.running - 1
+                self.durations[name] = duration
+            timing.observe("collect " + name, duration)
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.cancelled():
+                # Never started
+                self.queued = self.queued - 1
+            elif future.exception() is not None:
+                self.failed = self.failed + 1
+            else:
+                self.completed = self.completed + 1
+
+    def stats(self):
+        with self._lock:
+            return {"queued": self.queued, "maxqueued": self.maxqueued, "running": self.running,
+                    "completed": self.completed, "failed": self.failed, "timeouts": self.timeouts,
+                    "shared": self.shared}
+
+    def shutdown(self):
+        """
+        Cancel the probes that have not started.  Running ones can't be interrupted,
+        their threads end when the probe returns.  Does not block.
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool = Collectors()
+
+
+async def collect(name, func, *args, timeout=TIMEOUT):
+    """
+    Run a blocking probe on the shared collector pool, see Collectors.run().
+    """
+    return await pool.run(name, func, *args, timeout=timeout)
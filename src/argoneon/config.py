@@ -43,6 +43,22 @@ def setGeneralDefaults(config):
         config['General']['debug'] = 'N'
 
 
+def setMetricsDefaults(config):
+    """
+    Setup the defaults for the Metrics section: no port and no textfile, so the metrics
+    are not exported.
+    """
+    if not 'Metrics' in config.keys():
+        config['Metrics'] = {}
+
+    if not 'port' in config['Metrics'].keys():
+        config['Metrics']['port'] = '0'
+    if not 'address' in config['Metrics'].keys():
+        config['Metrics']['address'] = '127.0.0.1'
+    if not 'textfile' in config['Metrics'].keys():
+        config['Metrics']['textfile'] = ''
+
+
 def loadConfigAndDefaults():
     """
     Load up the configuration file.  We utilize a single config file, and for everything that is
@@ -63,6 +79,7 @@ def loadConfigAndDefaults():
     #
     setGeneralDefaults(config)
     setOLEDDefaults(config)
+    setMetricsDefaults(config)
     if not 'CPUFan' in config.keys():
         config['CPUFan'] = {'55.0': '30', '60.0': '55', '65.0': '100'}
     if not 'HDDFan' in config.keys():
@@ -103,6 +120,14 @@ def loadOLEDConfig():
     return config
 
 
+def loadMetricsConfig():
+    """
+    Obtain the Metrics configuration: the port and address to serve them on, and the
+    node_exporter textfile to write them to.
+    """
+    return loadConfigAndDefaults()['Metrics']
+
+
 def loadTempConfig():
     """
     Return the value we are supposed to be using for temperature, either Celcius, or Fahrenheit.
@@ -1,25 +1,18 @@
 import datetime
 import math
 import os
-import time
+from functools import wraps
 from os.path import join
 from sys import argv, stderr
 
-import RPi.GPIO as GPIO
-import smbus2 as smbus
-
-from .config import CONFIG_DIR
+from . import logging as log
+from . import profiler, schedule, timing
+from .config import CONFIG_DIR, loadDebugMode
 from .cli import Args, CliParameters, Cli
+from .hardware import ADDR_RTC, busclient
 
 # Initialize I2C Bus
-rev = GPIO.RPI_REVISION
-if rev == 2 or rev == 3:
-    bus = smbus.SMBus(1)
-else:
-    bus = smbus.SMBus(0)
-
-
-ADDR_RTC = 0x51
+bus = busclient("rtc")
 
 #################
 # Common/Helpers
@@ -31,6 +24,18 @@ RTC_ALARM_BIT = 0x8
 RTC_TIMER_BIT = 0x4
 
 
+def atomic(func):
+    """
+    Hold the bus while func runs, so other clients can't come between its register
+    accesses.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with bus.atomic():
+            return func(*args, **kwargs)
+    return wrapper
+
+
 def numBCDtoDEC(val):
     """
     PCF8563 number system Binary Coded Decimal (BCD)
@@ -46,6 +51,7 @@ def numDECtoBCD(val):
     return (math.floor(val/10) << 4) + (val % 10)
 
 
+@atomic
 def hasRTCEventFlag(flagbit):
     """
     Check if Event Bit is raised
@@ -55,6 +61,7 @@ def hasRTCEventFlag(flagbit):
     return (out & flagbit) != 0
 
 
+@atomic
 def clearRTCEventFlag(flagbit):
     """
     Clear Event Bit if raised
@@ -67,6 +74,7 @@ def clearRTCEventFlag(flagbit):
     return False
 
 
+@atomic
 def setRTCEventFlag(flagbit, enabled):
     """
     Enable Event Flag
@@ -92,7 +100,9 @@ def getNumberSuffix(numval):
     Helper method to add proper suffix to numbers
     """
     onesvalue = numval % 10
-    if onesvalue == 1:
+    if numval % 100 in (11, 12, 13):
+        return "th"
+    elif onesvalue == 1:
         return "st"
     elif onesvalue == 2:
         return "nd"
@@ -101,6 +111,7 @@ def getNumberSuffix(numval):
     return "th"
 
 
+@atomic
 def describeTimer(showsetting):
     """
     Describe Timer Setting
@@ -164,9 +175,45 @@ def describeHourMinute(hour, minute):
     return outstr+ampmstr
 
 
+# Longest list of times spelt out one by one
+MAX_TIMES = 6
+
+
+def describeValues(valuelist, describe=str):
+    """
+    Describe values as a comma separated list, with runs of three or more as first-last
+    """
+    parts = []
+    start = 0
+    while start < len(valuelist):
+        end = start
+        while end + 1 < len(valuelist) and valuelist[end + 1] == valuelist[end] + 1:
+            end = end + 1
+        if end - start >= 2:
+            parts.append(describe(valuelist[start]) + "-" + describe(valuelist[end]))
+        else:
+            parts.extend(describe(value) for value in valuelist[start:end + 1])
+        start = end + 1
+    return ",".join(parts)
+
+
+def describeMinuteStep(minutelist):
+    """
+    Describe minutes like */n or a/n (a < n) as every n minutes, or "" if they aren't
+    """
+    if len(minutelist) < 3:
+        return ""
+    step = minutelist[1] - minutelist[0]
+    if minutelist[0] >= step or minutelist != list(range(minutelist[0], 60, step)):
+        return ""
+    if minutelist[0] == 0:
+        return "every " + str(step) + " minutes"
+    return "every " + str(step) + " minutes from the " + str(minutelist[0]) + getNumberSuffix(minutelist[0]) + " minute"
+
+
 def describeSchedule(monthlist, weekdaylist, datelist, hourlist, minutelist):
     """
-    Describe Schedule Parameter Values
+    Describe Schedule Parameter Values, each list [-1] for any value
     """
     weekdaynamelist = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
     monthnamelist = ["Jan", "Feb", "Mar", "Apr", "May",
@@ -174,85 +221,57 @@ def describeSchedule(monthlist, weekdaylist, datelist, hourlist, minutelist):
 
     curprefix = ""
     hasDate = False
-    hasMonth = False
-    foundvalue = False
     monthdatestr = ""
-    for curmonth in monthlist:
-        for curdate in datelist:
-            if curdate >= 0:
-                hasDate = True
-                if curmonth >= 0:
-                    hasMonth = True
-                    monthdatestr = monthdatestr + "," + \
-                        monthnamelist[curmonth-1]+" " + \
-                        str(curdate) + getNumberSuffix(curdate)
-                else:
-                    monthdatestr = monthdatestr + "," + \
-                        str(curdate) + getNumberSuffix(curdate)
-            else:
-                if curmonth >= 0:
-                    monthdatestr = monthdatestr + \
-                        "," + monthnamelist[curmonth-1]
-
-    if len(monthdatestr) > 0:
-        foundvalue = True
-        # Remove Leading Comma
-        monthdatestr = monthdatestr[1:]
-        if hasMonth == True:
-            curprefix = "Annually:"
+    if datelist[0] >= 0:
+        hasDate = True
+        monthdatestr = describeValues(datelist, lambda date: str(date) + getNumberSuffix(date))
+    if monthlist[0] >= 0:
+        hasDate = True
+        curprefix = "Annually:"
+        monthstr = describeValues(monthlist, lambda month: monthnamelist[month-1])
+        if len(monthdatestr) > 0:
+            monthdatestr = " Every " + monthdatestr + " of " + monthstr
         else:
-            curprefix = "Monthly:"
-            monthdatestr = monthdatestr + " of the Month"
-        monthdatestr = " Every "+monthdatestr
+            monthdatestr = " Every day of " + monthstr
+    elif len(monthdatestr) > 0:
+        curprefix = "Monthly:"
+        monthdatestr = " Every " + monthdatestr + " of the Month"
 
     weekdaystr = ""
-    for curweekday in weekdaylist:
-        if curweekday >= 0:
-            hasDate = True
-            weekdaystr = weekdaystr + "," + weekdaynamelist[curweekday]
-
-    if len(weekdaystr) > 0:
-        foundvalue = True
-        # Remove Leading Comma
-        weekdaystr = weekdaystr[1:]
+    if weekdaylist[0] >= 0:
+        hasDate = True
+        weekdaystr = describeValues(weekdaylist, lambda weekday: weekdaynamelist[weekday])
         if len(curprefix) == 0:
             curprefix = "Weekly:"
             weekdaystr = " on " + weekdaystr
         else:
             weekdaystr = ",on " + weekdaystr
 
-    hasHour = False
-    hasMinute = False
-    hourminstr = ""
-    for curhour in hourlist:
-        for curminute in minutelist:
-            if curhour >= 0:
-                hasHour = True
-                if curminute >= 0:
-                    hasMinute = True
-                hourminstr = hourminstr + "," + \
-                    describeHourMinute(curhour, curminute)
-            elif curminute >= 0:
-                hasMinute = True
-                hourminstr = hourminstr + "," + \
-                    str(curminute) + getNumberSuffix(curminute)
-
-    if len(hourminstr) > 0:
-        foundvalue = True
-        # Remove Leading Comma
-        hourminstr = hourminstr[1:]
-        if hasHour == True:
-            if hasDate == True:
-                hourminstr = "at " + hourminstr
-            else:
-                hourminstr = "Daily: " + hourminstr
-            if hasMinute == False:
-                hourminstr = hourminstr + " every minute"
+    hasHour = hourlist[0] >= 0
+    hasMinute = minutelist[0] >= 0
+    stepstr = describeMinuteStep(minutelist) if hasMinute else ""
+    if hasHour:
+        hourstr = describeValues(hourlist, lambda hour: describeHourMinute(hour, 0))
+        if not hasMinute:
+            hourminstr = hourstr + " every minute"
+        elif len(stepstr) > 0:
+            hourminstr = stepstr + " of " + hourstr
+        elif len(hourlist) * len(minutelist) <= MAX_TIMES:
+            hourminstr = ",".join(describeHourMinute(curhour, curminute)
+                                  for curhour in hourlist for curminute in minutelist)
         else:
-            if hourminstr == "0":
-                hourminstr = "At the start of every hour"
-            else:
-                hourminstr = "Hourly: At " + hourminstr + " minute"
+            hourminstr = describeValues(minutelist) + " minutes past " + hourstr
+        if hasDate == False:
+            hourminstr = "Daily: " + hourminstr
+        elif len(stepstr) == 0:
+            hourminstr = "at " + hourminstr
+    elif len(stepstr) > 0:
+        hourminstr = stepstr[0].upper() + stepstr[1:]
+    elif minutelist == [0]:
+        hourminstr = "At the start of every hour"
+    elif hasMinute:
+        hourminstr = "Hourly: At " + \
+            describeValues(minutelist, lambda minute: str(minute) + getNumberSuffix(minute)) + " minute"
     else:
         hourminstr = "Every minute"
 
@@ -262,6 +281,7 @@ def describeSchedule(monthlist, weekdaylist, datelist, hourlist, minutelist):
     return (curprefix + monthdatestr + weekdaystr + hourminstr).strip()
 
 
+@atomic
 def describeAlarm():
     """
     Describe Alarm Setting
@@ -298,6 +318,7 @@ def describeAlarm():
     return describeSchedule([-1], [weekday], [date], [hour], [minute]) + " Local (RTC Schedule: "+utcschedule+" UTC)"
 
 
+@atomic
 def describeControlRegisters():
     """
     Describe Control Flags
@@ -413,6 +434,7 @@ def disableAlarm(registeraddr):
     bus.write_byte_data(ADDR_RTC, registeraddr, 0x80)
 
 
+@atomic
 def removeRTCAlarm():
     """
     Removes all alarm settings
@@ -425,6 +447,7 @@ def removeRTCAlarm():
     disableAlarm(12)
 
 
+@atomic
 def setRTCAlarm(enableflag, weekday, date, hour, minute):
     """
     Set RTC Alarm (Negative values ignored)
@@ -512,6 +535,7 @@ def clearRTCTimerFlag():
     return clearRTCEventFlag(RTC_TIMER_BIT)
 
 
+@atomic
 def removeRTCTimer():
     # Remove RTC Timer Setting
     setRTCEventFlag(RTC_TIMER_BIT, False)
@@ -521,6 +545,7 @@ def removeRTCTimer():
     bus.write_byte_data(ADDR_RTC, 15, 0)
 
 
+@atomic
 def setRTCTimerInterval(enableflag, value, inSeconds=False):
     # Set RTC Timer Interval
     if value > 255 or value < 1:
@@ -553,6 +578,7 @@ def getLocaltimeOffset():
     return localdatetime - utcdatetime
 
 
+@atomic
 def getRTCdatetime():
     # Returns RTC timestamp as datetime object
 
@@ -596,6 +622,7 @@ def getRTCdatetime():
         return datetime.datetime(2000, 1, 1, 0, 0, 0)
 
 
+@atomic
 def setRTCdatetime(localdatetime):
     # set RTC time using datetime object (Local time)
     # Set local time to UTC
@@ -630,48 +657,12 @@ def syncSystemTime():
 # Config
 #########
 
-def getConfigValue(valuestr):
-    # Load config value as array of integers
-    try:
-        if valuestr == "*":
-            return [-1]
-        tmplist = valuestr.split(",")
-        map_object = map(int, tmplist)
-        return list(map_object)
-    except:
-        return [-1]
-
-
 def newCommandSchedule(curline):
     # Load config line data as array of Command schedule
-    result = []
-    linedata = curline.split(" ")
-    if len(linedata) < 6:
-        return result
-
-    minutelist = getConfigValue(linedata[0])
-    hourlist = getConfigValue(linedata[1])
-    datelist = getConfigValue(linedata[2])
-    # monthlist = getConfigValue(linedata[3])
-    monthlist = [-1]  # Certain edge cases will not be handled properly
-    weekdaylist = getConfigValue(linedata[4])
-
-    cmd = ""
-    ctr = 5
-    while ctr < len(linedata):
-        cmd = cmd + " " + linedata[ctr]
-        ctr = ctr + 1
-    cmd = cmd.strip()
-
-    for curmin in minutelist:
-        for curhour in hourlist:
-            for curdate in datelist:
-                for curmonth in monthlist:
-                    for curweekday in weekdaylist:
-                        result.append({"minute": curmin, "hour": curhour, "date": curdate,
-                                      "month": curmonth, "weekday": curweekday, "cmd": cmd})
-
-    return result
+    commandschedule = schedule.compileschedule(curline)
+    if commandschedule is None:
+        return []
+    return [commandschedule]
 
 
 def saveConfigList(fname, configlist):
@@ -679,17 +670,19 @@ def saveConfigList(fname, configlist):
     f = open(fname, "w")
     f.write("#\n")
     f.write("# Argon RTC Configuration\n")
-    f.write("# - Follows cron general format, but with only * and csv support\n")
+    f.write("# - Follows cron general format: *, lists, ranges (1-5) and steps (*/15)\n")
     f.write("# - Each row follows the following format:\n")
     f.write("#      min hour date month dayOfWeek Command\n")
     f.write("#      e.g. Shutdown daily at 1am\n")
     f.write("#            0 1 * * * off\n")
     f.write("#           Shutdown daily at 1am and 1pm\n")
     f.write("#            0 1,13 * * * off\n")
+    f.write("#           Startup at 7am on weekdays, but not in August\n")
+    f.write("#            0 7 * 1-7,9-12 1-5 on\n")
     f.write("# - Commands are currently on or off only\n")
     f.write("# - Limititations\n")
     f.write("#      Requires MINUTE value\n")
-    f.write("#      Month values are ignored (edge cases not supported)\n")
+    f.write("#      Date and day of week must both match (cron needs either)\n")
     f.write("#\n")
 
     for config in configlist:
@@ -722,11 +715,10 @@ def loadConfigList(fname):
                     continue
                 if tmpline[0] == "#":
                     continue
-                checkdata = tmpline.split(" ")
-                if len(checkdata) > 5:
-                    # Don't include every minute type of schedule
-                    if checkdata[0] != "*":
-                        result.append(tmpline)
+                commandschedule = schedule.compileschedule(tmpline)
+                # Don't include every minute type of schedule
+                if commandschedule is not None and commandschedule.minutes != schedule.ALL_MINUTES:
+                    result.append(tmpline)
         return result
     except:
         return []
@@ -749,19 +741,17 @@ def describeConfigListEntry(configlistitem):
     if len(linedata) < 6:
         return ""
 
-    minutelist = getConfigValue(linedata[0])
-    hourlist = getConfigValue(linedata[1])
-    datelist = getConfigValue(linedata[2])
-    # monthlist = getConfigValue(linedata[3])
-    monthlist = [-1]  # Certain edge cases will not be handled properly
-    weekdaylist = getConfigValue(linedata[4])
-
-    cmd = ""
-    ctr = 5
-    while ctr < len(linedata):
-        cmd = cmd + " " + linedata[ctr]
-        ctr = ctr + 1
-    cmd = cmd.strip().lower()
+    commandschedule = schedule.compileschedule(configlistitem)
+    if commandschedule is None:
+        return ""
+
+    minutelist = schedule.values(commandschedule.minutes, 0, 59)
+    hourlist = schedule.values(commandschedule.hours, 0, 23)
+    datelist = schedule.values(commandschedule.dates, 1, 31)
+    monthlist = schedule.values(commandschedule.months, 1, 12)
+    weekdaylist = schedule.values(commandschedule.weekdays, 0, 6)
+
+    cmd = commandschedule.cmd.lower()
     if cmd == "on":
         cmd = "Startup"
     else:
@@ -786,39 +776,16 @@ def describeConfigList(fname):
 
 def checkDateForCommandSchedule(commandschedule, datetimeobj):
     # Check Command schedule if it should fire for the give time
-    testminute = commandschedule.get("minute", -1)
-    testhour = commandschedule.get("hour", -1)
-    testdate = commandschedule.get("date", -1)
-    testmonth = commandschedule.get("month", -1)
-    testweekday = commandschedule.get("weekday", -1)
-
-    if testminute < 0 or testminute == datetimeobj.minute:
-        if testhour < 0 or testhour == datetimeobj.hour:
-            if testdate < 0 or testdate == datetimeobj.day:
-                if testmonth < 0 or testmonth == datetimeobj.month:
-                    if testweekday < 0:
-                        return True
-                    else:
-                        # python Sunday = 6, RTC Sunday = 0
-                        weekDay = datetimeobj.weekday()
-                        if weekDay == 6:
-                            weekDay = 0
-                        else:
-                            weekDay = weekDay + 1
-                        if testweekday == weekDay:
-                            return True
-    return False
+    return schedule.matches(commandschedule, datetimeobj)
 
 
 def getCommandForTime(commandschedulelist, datetimeobj, checkcmd):
     # Get current command
-    ctr = 0
-    while ctr < len(commandschedulelist):
-        testcmd = commandschedulelist[ctr].get("cmd", "")
+    for commandschedule in commandschedulelist:
+        testcmd = commandschedule.cmd
         if (testcmd.lower() == checkcmd or len(checkcmd) == 0) and len(testcmd) > 0:
-            if checkDateForCommandSchedule(commandschedulelist[ctr], datetimeobj) == True:
+            if schedule.matches(commandschedule, datetimeobj):
                 return testcmd
-        ctr = ctr + 1
     return ""
 
 
@@ -832,208 +799,28 @@ def getLastMonthDate(year, month):
     return testtime.day
 
 
-def incrementCommandScheduleTime(commandschedule, testtime, addmode):
-    # Increment to the next iteration of command schedule
-    testminute = commandschedule.get("minute", -1)
-    testhour = commandschedule.get("hour", -1)
-    testdate = commandschedule.get("date", -1)
-    testmonth = commandschedule.get("month", -1)
-    testweekday = commandschedule.get("weekday", -1)
-
-    if addmode == "minute":
-        testfield = commandschedule.get(addmode, -1)
-        if testfield < 0:
-            if testtime.minute < 59:
-                return testtime + datetime.timedelta(minutes=1)
-            else:
-                return incrementCommandScheduleTime(commandschedule, testtime.replace(minute=0), "hour")
-        else:
-            return incrementCommandScheduleTime(commandschedule, testtime, "hour")
-    elif addmode == "hour":
-        testfield = commandschedule.get(addmode, -1)
-        if testfield < 0:
-            if testtime.hour < 23:
-                return testtime + datetime.timedelta(hours=1)
-            else:
-                return incrementCommandScheduleTime(commandschedule, testtime.replace(hour=0), "date")
-        else:
-            return incrementCommandScheduleTime(commandschedule, testtime, "date")
-    elif addmode == "date":
-        testfield = commandschedule.get(addmode, -1)
-        if testfield < 0:
-            maxmonthdate = getLastMonthDate(testtime.year, testtime.month)
-            if testtime.day < maxmonthdate:
-                return testtime + datetime.timedelta(days=1)
-            else:
-                return incrementCommandScheduleTime(commandschedule, testtime.replace(day=1), "month")
-        else:
-            return incrementCommandScheduleTime(commandschedule, testtime, "month")
-    elif addmode == "month":
-        testfield = commandschedule.get(addmode, -1)
-        if testfield < 0:
-            nextmonth = testtime.month
-            nextyear = testtime.year
-            while True:
-                if nextmonth < 12:
-                    nextmonth = nextmonth + 1
-                else:
-                    nextmonth = 1
-                    nextyear = nextyear + 1
-                maxmonthdate = getLastMonthDate(nextyear, nextmonth)
-                if testtime.day <= maxmonthdate:
-                    return testtime.replace(month=nextmonth, year=nextyear)
-        else:
-            return incrementCommandScheduleTime(commandschedule, testtime, "year")
-    else:
-        # Year
-        if testtime.month == 2 and testtime.day == 29:
-            # Leap day handling
-            nextyear = testtime.year
-            while True:
-                nextyear = nextyear + 1
-                maxmonthdate = getLastMonthDate(nextyear, testtime.month)
-                if testtime.day <= maxmonthdate:
-                    return testtime.replace(year=nextyear)
-        else:
-            return testtime.replace(year=(testtime.year+1))
-
-
-def setNextAlarm(commandschedulelist, prevdatetime):
-    # Set Next Alarm on RTC
+def setNextAlarm(agenda, prevdatetime):
+    # Set Next Alarm on RTC, agenda: schedule.Agenda of the "on" schedules
     curtime = datetime.datetime.now()
     if prevdatetime > curtime:
         return prevdatetime
 
-    # Divisible by 4 for leap day
-    checklimityears = 12
-    foundnextcmd = False
-    nextcommandschedule = {}
-    # To be sure it's later than any schedule
-    nextcommandtime = curtime.replace(year=(curtime.year+checklimityears))
-
-    ctr = 0
-    while ctr < len(commandschedulelist):
-        testcmd = commandschedulelist[ctr].get("cmd", "").lower()
-        if testcmd == "on":
-            invaliddata = False
-            testminute = commandschedulelist[ctr].get("minute", -1)
-            testhour = commandschedulelist[ctr].get("hour", -1)
-            testdate = commandschedulelist[ctr].get("date", -1)
-            testmonth = commandschedulelist[ctr].get("month", -1)
-            testweekday = commandschedulelist[ctr].get("weekday", -1)
-
-            tmpminute = testminute
-            tmphour = testhour
-            tmpdate = testdate
-            tmpmonth = testmonth
-            tmpyear = curtime.year
-
-            if tmpminute < 0:
-                tmpminute = curtime.minute
-
-            if tmphour < 0:
-                tmphour = curtime.hour
-
-            if tmpdate < 0:
-                tmpdate = curtime.day
-
-            if tmpmonth < 0:
-                tmpmonth = curtime.month
-
-            maxmonthdate = getLastMonthDate(tmpyear, tmpmonth)
-            if tmpdate > maxmonthdate:
-                # Invalid month date
-                if testdate < 0:
-                    tmpdate = maxmonthdate
-                else:
-                    # Date is fixed
-                    if testminute < 0:
-                        tmpminute = 0
-                    if testhour < 0:
-                        tmphour = 0
-                    if testmonth < 0 and testdate <= 31:
-                        # Look for next valid month
-                        while tmpdate > maxmonthdate:
-                            if tmpmonth < 12:
-                                tmpmonth = tmpmonth + 1
-                            else:
-                                tmpmonth = 1
-                                tmpyear = tmpyear + 1
-                            maxmonthdate = getLastMonthDate(tmpyear, tmpmonth)
-                    elif tmpdate == 29 and tmpmonth == 2:
-                        # Fixed to leap day
-                        while tmpdate > maxmonthdate:
-                            tmpyear = tmpyear + 1
-                            maxmonthdate = getLastMonthDate(tmpyear, tmpmonth)
-                    else:
-                        invaliddata = True
-            if invaliddata == False:
-                try:
-                    testtime = datetime.datetime(
-                        tmpyear, tmpmonth, tmpdate, tmphour, tmpminute)
-                except:
-                    # Force time diff
-                    testtime = curtime - datetime.timedelta(hours=1)
-                tmptimediff = (curtime - testtime).total_seconds()
-            else:
-                tmptimediff = 0
-
-            if testweekday >= 0:
-                # Day of Week check
-                # python Sunday = 6, RTC Sunday = 0
-                weekDay = testtime.weekday()
-                if weekDay == 6:
-                    weekDay = 0
-                else:
-                    weekDay = weekDay + 1
-
-                if weekDay != testweekday or tmptimediff > 0:
-                    # Resulting 0-ed time will be <= the testtime
-                    if testminute < 0:
-                        testtime = testtime.replace(minute=0)
-                    if testhour < 0:
-                        testtime = testtime.replace(hour=0)
-
-                    dayoffset = testweekday-weekDay
-                    if dayoffset < 0:
-                        dayoffset = dayoffset + 7
-                    elif dayoffset == 0:
-                        dayoffset = 7
-
-                    testtime = testtime + datetime.timedelta(days=dayoffset)
-
-                # Just look for the next valid weekday; Can be optimized
-                while checkDateForCommandSchedule(commandschedulelist[ctr], testtime) == False and (testtime.year - curtime.year) < checklimityears:
-                    testtime = testtime + datetime.timedelta(days=7)
-
-                if (testtime.year - curtime.year) >= checklimityears:
-                    # Too many iterations, abort/ignore
-                    tmptimediff = 0
-                else:
-                    tmptimediff = (curtime - testtime).total_seconds()
-            if tmptimediff > 0:
-                # Find next iteration that's greater than the current time (Day of Week check already handled)
-                while tmptimediff >= 0:
-                    testtime = incrementCommandScheduleTime(
-                        commandschedulelist[ctr], testtime, "minute")
-                    tmptimediff = (curtime - testtime).total_seconds()
-
-            if nextcommandtime > testtime and tmptimediff < 0:
-                nextcommandschedule = commandschedulelist[ctr]
-                nextcommandtime = testtime
-                foundnextcmd = True
-
-        ctr = ctr + 1
-    if foundnextcmd == True:
-        # Schedule Alarm
-        if nextcommandschedule.get("weekday", -1) >= 0 or nextcommandschedule.get("date", -1) > 0:
-            # Set alarm based on hour/minute of next occurrence to factor in timezone changes if any
-            setRTCAlarm(True, nextcommandschedule.get("weekday", -1), nextcommandschedule.get(
-                "date", -1), nextcommandtime.hour, nextcommandtime.minute)
-        else:
-            # no date,weekday involved just shift the hour and minute accordingly
-            setRTCAlarm(True, nextcommandschedule.get("weekday", -1), nextcommandschedule.get(
-                "date", -1), nextcommandschedule.get("hour", -1), nextcommandschedule.get("minute", -1))
+    found = agenda.next(curtime)
+    if found is not None:
+        nextcommandtime, nextcommandschedule = found
+        # Schedule Alarm for the next occurrence, the RTC only takes single values
+        weekday = -1
+        date = -1
+        hour = nextcommandtime.hour
+        if nextcommandschedule.weekdays != schedule.ALL_WEEKDAYS:
+            weekday = schedule.rtcweekday(nextcommandtime)
+        if nextcommandschedule.dates != schedule.ALL_DATES or nextcommandschedule.months != schedule.ALL_MONTHS:
+            # No month alarm, the date will do
+            date = nextcommandtime.day
+        if weekday < 0 and date < 0 and nextcommandschedule.hours == schedule.ALL_HOURS:
+            # no date,weekday or hour involved, every hour at the minute
+            hour = -1
+        setRTCAlarm(True, weekday, date, hour, nextcommandtime.minute)
         return nextcommandtime
     else:
         removeRTCAlarm()
@@ -1062,7 +849,7 @@ def cmd_getrtctime():
 
 
 @main.command("Synchronize Argon's RTC clock with the Pi's system clock.")
-def cmd_getrtctime(_):
+def cmd_setrtctime():
     setRTCdatetime(datetime.datetime.now())
     print("RTC Time:", getRTCdatetime())
 
@@ -1117,30 +904,54 @@ def cmd_removeschedule(args: ScheduleArgs):
         removeConfigEntry(RTC_CONFIGFILE, configidx)
 
 
-@main.command('Run the daemon.')
-def cmd_service():
+async def rtc_loop():
+    """
+    Keeps the RTC alarm set for the next scheduled power on and powers off when an off
+    schedule is due.  Checks once a minute.
+    """
     syncSystemTime()
     commandschedulelist = formCommandScheduleList(
         loadConfigList(RTC_CONFIGFILE))
+    agenda = schedule.Agenda(commandschedulelist, "on")
     nextrtcalarmtime = setNextAlarm(
-        commandschedulelist, datetime.datetime.now())
+        agenda, datetime.datetime.now())
     serviceloop = True
     while serviceloop == True:
-        clearRTCAlarmFlag()
-        clearRTCTimerFlag()
-
-        tmpcurrenttime = datetime.datetime.now()
-        if nextrtcalarmtime <= tmpcurrenttime:
-            # Update RTC Alarm to next iteration
-            nextrtcalarmtime = setNextAlarm(
-                commandschedulelist, nextrtcalarmtime)
-        elif len(getCommandForTime(commandschedulelist, tmpcurrenttime, "off")) > 0:
-            # Shutdown detected, issue command then end service loop
-            os.system("shutdown now -h")
-            serviceloop = False
-            # Don't break to sleep while command executes (prevents service to restart)
-
-        time.sleep(60)
+        with timing.timed("rtc check"):
+            clearRTCAlarmFlag()
+            clearRTCTimerFlag()
+
+            tmpcurrenttime = datetime.datetime.now()
+            if nextrtcalarmtime <= tmpcurrenttime:
+                # Update RTC Alarm to next iteration
+                nextrtcalarmtime = setNextAlarm(
+                    agenda, nextrtcalarmtime)
+            elif len(getCommandForTime(commandschedulelist, tmpcurrenttime, "off")) > 0:
+                # Shutdown detected, issue command then end service loop
+                os.system("shutdown now -h")
+                serviceloop = False
+                # Don't break to sleep while command executes (prevents service to restart)
+
+        await timing.sleep(60)
+
+
+@main.command('Run the daemon.')
+async def cmd_service():
+    from asyncio import create_task
+
+    log.enable(loadDebugMode())
+    log.install("argoneond")
+    profiler.install("argoneond")
+    monitor = create_task(timing.monitor("argoneond"))
+    try:
+        await rtc_loop()
+    finally:
+        monitor.cancel()
+
+
+@main.command('Print how long the running service takes for its tasks.')
+def cmd_timing():
+    print(timing.describe(timing.load(timing.statsfile("argoneond"))))
 
 
 @main.command('Print the current system/RTC times and control registers.')
@@ -0,0 +1,336 @@
+#
+# Bitmap fonts for the OLED from standard BDF and PCF files (optionally gzipped, as
+# most distributions ship them).  A font is rasterised once into an oled.Font glyph
+# atlas with per glyph advances and cached in CACHE_DIR, by the font's path, so later
+# loads only read the atlas as long as the font's mtime and size are unchanged.  If
+# CACHE_DIR can't be written the atlas is just built each time.
+#
+#   font = fontfile.loadfontfile("/usr/share/fonts/X11/misc/5x8.pcf.gz")
+#   oled.writetext("Proportional", 0, 0, font)
+#
+
+import gzip
+import hashlib
+import os
+import struct
+from os.path import abspath, basename, join
+
+from . import logging as log
+from .oled import NUMFONTCHAR, Font
+
+CACHE_DIR = '/var/cache/argoneon'
+
+ATLAS_MAGIC = b"OLEDATL1"
+# magic, source mtime in ns, source size, charht
+ATLAS_HEADER = struct.Struct("<8sQQH")
+
+fontfiles = {}
+
+
+class Glyph(object):
+    """
+    A glyph as the font file describes it: advance, bitmap size, position of the
+    bitmap's top left pixel (top counts up from the row on the baseline, which is 0)
+    and rows of bits, most significant bit leftmost.
+    """
+
+    def __init__(self, advance, width, height, xoffset, top, rows):
+        self.advance = advance
+        self.width = width
+        self.height = height
+        self.xoffset = xoffset
+        self.top = top
+        self.rows = rows
+
+    def pixels(self):
+        for row, bits in enumerate(self.rows):
+            for col in range(self.width):
+                if (bits >> (self.width - 1 - col)) & 1:
+                    yield (self.xoffset + col, self.top - row)
+
+
+def buildatlas(glyphs, ascent, descent, default=None):
+    """
+    Rasterise glyphs, a dict of code to Glyph, into a Font whose cell is ascent+descent
+    rows rounded up to whole pages.  Missing codes use the default glyph if there is
+    one, or have no width.
+    """
+    charht = ascent + descent
+    if charht & 0x7:
+        charht = (charht & 0xF8) + 8
+    numfontrow = charht >> 3
+
+    advances = []
+    columns = []
+    for code in range(NUMFONTCHAR):
+        glyph = glyphs.get(code, glyphs.get(default))
+        if glyph is None:
+            advances.append(0)
+            continue
+        advance = max(0, glyph.advance)
+        cells = [0] * advance
+        for x, y in glyph.pixels():
+            row = ascent - 1 - y
+            if 0 <= x < advance and 0 <= row < charht:
+                cells[x] |= 1 << row
+        advances.append(advance)
+        columns.extend(cells)
+
+    rowstride = len(columns)
+    fontbytes = bytearray(rowstride * numfontrow)
+    for offset, value in enumerate(columns):
+        for fontrow in range(numfontrow):
+            fontbytes[offset + rowstride*fontrow] = (value >> (8*fontrow)) & 0xFF
+    return Font(charht, max(advances), bytes(fontbytes), advances)
+
+
+#
+# BDF, the text format
+#
+
+def parsebdf(data):
+    """
+    Glyphs, ascent, descent and default character code of a BDF font.
+    """
+    glyphs = {}
+    ascent = None
+    descent = None
+    default = None
+    boundingbox = (0, 0, 0, 0)
+    lines = iter(data.decode("latin-1").splitlines())
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 0:
+            continue
+        keyword = fields[0]
+        if keyword == "FONTBOUNDINGBOX":
+            boundingbox = tuple(int(value) for value in fields[1:5])
+        elif keyword == "FONT_ASCENT":
+            ascent = int(fields[1])
+        elif keyword == "FONT_DESCENT":
+            descent = int(fields[1])
+        elif keyword == "DEFAULT_CHAR":
+            default = int(fields[1])
+        elif keyword == "STARTCHAR":
+            code = -1
+            advance = boundingbox[0]
+            width, height, xoffset, yoffset = boundingbox
+            for line in lines:
+                fields = line.split()
+                if len(fields) == 0:
+                    continue
+                keyword = fields[0]
+                if keyword == "ENCODING":
+                    code = int(fields[-1])
+                elif keyword == "DWIDTH":
+                    advance = int(fields[1])
+                elif keyword == "BBX":
+                    width, height, xoffset, yoffset = (int(value) for value in fields[1:5])
+                elif keyword == "BITMAP":
+                    rows = []
+                    for line in lines:
+                        line = line.strip()
+                        if line == "ENDCHAR":
+                            break
+                        # Rows are padded to whole bytes, drop the padding bits
+                        rows.append(int(line, 16) >> (len(line)*4 - width))
+                    if 0 <= code < NUMFONTCHAR:
+                        glyphs[code] = Glyph(advance, width, height, xoffset, yoffset + height - 1, rows)
+                    break
+
+    if ascent is None:
+        ascent = boundingbox[1] + boundingbox[3]
+    if descent is None:
+        descent = -boundingbox[3]
+    return glyphs, ascent, descent, default
+
+
+#
+# PCF, the compiled X11 format
+#
+
+PCF_ACCELERATORS = 1 << 1
+PCF_METRICS = 1 << 2
+PCF_BITMAPS = 1 << 3
+PCF_BDF_ENCODINGS = 1 << 5
+PCF_BDF_ACCELERATORS = 1 << 8
+
+PCF_GLYPH_PAD_MASK = 3
+PCF_BYTE_MASK = 1 << 2
+PCF_BIT_MASK = 1 << 3
+PCF_SCAN_UNIT_MASK = 3 << 4
+PCF_COMPRESSED_METRICS = 0x100
+
+
+class PCFTable(object):
+    """
+    Reads the numbers of one PCF table in the byte order its format asks for.
+    """
+
+    def __init__(self, data, offset):
+        self.data = data
+        self.format = struct.unpack_from("<I", data, offset)[0]
+        self.order = ">" if self.format & PCF_BYTE_MASK else "<"
+        self.offset = offset + 4
+
+    def read(self, fmt):
+        values = struct.unpack_from(self.order + fmt, self.data, self.offset)
+        self.offset = self.offset + struct.calcsize(self.order + fmt)
+        return values
+
+
+def parsepcf(data):
+    """
+    Glyphs, ascent, descent and default character code of a PCF font.
+    """
+    if data[:4] != b"\x01fcp":
+        raise ValueError("not a PCF font")
+    tables = {}
+    count = struct.unpack_from("<I", data, 4)[0]
+    for index in range(count):
+        kind, _, _, offset = struct.unpack_from("<IIII", data, 8 + 16*index)
+        tables[kind] = offset
+
+    # Font ascent and descent
+    table = PCFTable(data, tables.get(PCF_BDF_ACCELERATORS, tables.get(PCF_ACCELERATORS)))
+    table.read("8B")
+    ascent, descent = table.read("ii")
+
+    # Glyph metrics, by glyph index
+    table = PCFTable(data, tables[PCF_METRICS])
+    metrics = []
+    if table.format & PCF_COMPRESSED_METRICS:
+        for _ in range(table.read("H")[0]):
+            metrics.append(tuple(value - 0x80 for value in table.read("5B")))
+    else:
+        for _ in range(table.read("I")[0]):
+            metrics.append(table.read("5hH")[:5])
+
+    # Glyph bitmaps, by glyph index
+    table = PCFTable(data, tables[PCF_BITMAPS])
+    numglyphs = table.read("I")[0]
+    offsets = table.read("%dI" % numglyphs)
+    table.read("4I")
+    bitmapstart = table.offset
+    pad = 1 << (table.format & PCF_GLYPH_PAD_MASK)
+    unit = 1 << ((table.format & PCF_SCAN_UNIT_MASK) >> 4)
+    msbit = table.format & PCF_BIT_MASK
+    swap = bool(table.format & PCF_BYTE_MASK) != bool(msbit)
+
+    # Character codes to glyph index
+    table = PCFTable(data, tables[PCF_BDF_ENCODINGS])
+    mincol, maxcol, minrow, maxrow, default = table.read("4hH")
+    columns = maxcol - mincol + 1
+    indices = table.read("%dH" % (columns * (maxrow - minrow + 1)))
+
+    glyphs = {}
+    for code in range(NUMFONTCHAR):
+        # Single byte codes are in row 0 of two byte fonts
+        if minrow > 0 or code < mincol or code > maxcol:
+            continue
+        index = indices[(0 - minrow)*columns + code - mincol]
+        if index == 0xFFFF or index >= numglyphs:
+            continue
+        leftbearing, rightbearing, advance, glyphascent, glyphdescent = metrics[index]
+        width = rightbearing - leftbearing
+        height = glyphascent + glyphdescent
+        stride = (((width + 7) >> 3) + pad - 1) // pad * pad
+        start = bitmapstart + offsets[index]
+        rows = []
+        for row in range(height):
+            rowbytes = bytearray(data[start + stride*row:start + stride*(row + 1)])
+            if not msbit:
+                rowbytes = bytearray(int("{:08b}".format(value)[::-1], 2) for value in rowbytes)
+            if swap and unit > 1:
+                for first in range(0, len(rowbytes), unit):
+                    rowbytes[first:first+unit] = rowbytes[first:first+unit][::-1]
+            bits = int.from_bytes(bytes(rowbytes), "big")
+            rows.append(bits >> (len(rowbytes)*8 - width))
+        glyphs[code] = Glyph(advance, width, height, leftbearing, glyphascent - 1, rows)
+
+    if default == 0xFFFF:
+        default = None
+    return glyphs, ascent, descent, default
+
+
+#
+# Atlas cache
+#
+
+def atlasfile(filename):
+    """
+    The cache file of a font, its name plus a hash of its full path, as fonts of the
+    same name in different directories differ.
+    """
+    name = basename(filename)
+    for extension in (".gz", ".bdf", ".pcf"):
+        if name.endswith(extension):
+            name = name[:-len(extension)]
+    key = hashlib.sha1(abspath(filename).encode()).hexdigest()[:16]
+    return join(CACHE_DIR, "%s-%s.atlas" % (name, key))
+
+
+def readatlas(cachefile, stat):
+    with open(cachefile, "rb") as file:
+        data = file.read()
+    magic, mtime, size, charht = ATLAS_HEADER.unpack_from(data)
+    if magic != ATLAS_MAGIC or mtime != stat.st_mtime_ns or size != stat.st_size:
+        return None
+    offset = ATLAS_HEADER.size
+    advances = list(data[offset:offset+NUMFONTCHAR])
+    fontbytes = data[offset+NUMFONTCHAR:]
+    return Font(charht, max(advances), fontbytes, advances)
+
+
+def writeatlas(cachefile, stat, font):
+    from tempfile import mkstemp
+
+    data = (ATLAS_HEADER.pack(ATLAS_MAGIC, stat.st_mtime_ns, stat.st_size, font.charht) +
+            bytes(font.advances) + bytes(font.fontbytes))
+    os.makedirs(CACHE_DIR, mode=0o755, exist_ok=True)
+    # A new file, nothing already at the name is followed
+    fd, tmpname = mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, cachefile)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def loadfontfile(filename):
+    """
+    Return the Font for a BDF or PCF file, possibly gzipped.  The rasterised atlas is
+    cached on disk and used for as long as the font file is unchanged.
+    """
+    font = fontfiles.get(filename)
+    if font is not None:
+        return font
+
+    stat = os.stat(filename)
+    cachefile = atlasfile(filename)
+    try:
+        font = readatlas(cachefile, stat)
+    except (OSError, struct.error):
+        font = None
+
+    if font is None:
+        opener = gzip.open if filename.endswith(".gz") else open
+        with opener(filename, "rb") as file:
+            data = file.read()
+        if data[:4] == b"\x01fcp":
+            glyphs, ascent, descent, default = parsepcf(data)
+        else:
+            glyphs, ascent, descent, default = parsebdf(data)
+        font = buildatlas(glyphs, ascent, descent, default)
+        if max(font.advances) > 255:
+            raise ValueError("glyphs too wide for an atlas")
+        try:
+            writeatlas(cachefile, stat, font)
+        except OSError:
+            log.debug("Can't cache font atlas %s", cachefile)
+
+    fontfiles[filename] = font
+    return font
@@ -0,0 +1,248 @@
+#
+# Access to the hardware shared by the Argon daemons.
+#
+# Everything in a process talks to the I2C bus through a BusArbiter.  Each part of a
+# daemon gets its own BusClient from busclient(), which looks like an smbus2.SMBus.
+# Transactions are serialised, and when the bus comes free the waiting client with
+# the highest priority goes next, so a fan write waits for one OLED block at most
+# rather than a whole frame.  Register sequences that must not be split go in a
+# "with client.atomic():" block.
+#
+# Nothing is opened or set up on import: the bus is opened by the first transaction
+# and RPi.GPIO is imported by the first gpio() call, so the modules using them can be
+# imported anywhere, Argon board or not.
+#
+
+import time
+from contextlib import contextmanager
+from heapq import heappop, heappush
+from threading import Condition, Lock, get_ident
+
+from . import timing
+
+ADDR_FAN = 0x1a
+ADDR_RTC = 0x51
+ADDR_OLED = 0x3c
+
+# Features an Argon board may have, by the I2C address that answers for them
+FEATURES = {
+    "fan": ADDR_FAN,
+    "rtc": ADDR_RTC,
+    "oled": ADDR_OLED,
+}
+
+# Bus priorities of the clients, lower goes first
+PRIORITIES = {
+    "fan": 0,
+    "rtc": 1,
+    "oled": 2,
+}
+PRIORITY_OTHER = 3
+
+_arbiter = None
+_gpio = None
+
+
+def gpio():
+    """
+    The RPi.GPIO module, set up for BCM pin numbers.  Imported on first use.
+    """
+    global _gpio
+    if _gpio is None:
+        import RPi.GPIO as GPIO
+        GPIO.setwarnings(False)
+        GPIO.setmode(GPIO.BCM)
+        _gpio = GPIO
+    return _gpio
+
+
+def openbus():
+    """
+    Open the I2C bus the Argon board is attached to: bus 1, or bus 0 on the earliest
+    Raspberry Pi revision.
+    """
+    import smbus2 as smbus
+
+    rev = gpio().RPI_REVISION
+    if rev == 2 or rev == 3:
+        return smbus.SMBus(1)
+    return smbus.SMBus(0)
+
+
+class BusArbiter(object):
+    """
+    Hands a bus to one thread at a time, highest priority (lowest number) first and
+    first come first served among equals.  The owner may acquire it again.  Without a
+    bus, the I2C bus is opened when the first transaction needs it.
+    """
+
+    def __init__(self, bus=None):
+        self.bus = bus
+        self.clients = {}
+        self._cond = Condition()
+        self._owner = None
+        self._depth = 0
+        self._waiting = []
+        self._sequence = 0
+
+    def client(self, name, priority=PRIORITY_OTHER):
+        with self._cond:
+            if name not in self.clients:
+                self.clients[name] = BusClient(self, name, priority)
+            return self.clients[name]
+
+    def acquire(self, priority):
+        me = get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth = self._depth + 1
+                return
+            ticket = (priority, self._sequence)
+            self._sequence = self._sequence + 1
+            heappush(self._waiting, ticket)
+            while self._owner is not None or self._waiting[0] != ticket:
+                self._cond.wait()
+            heappop(self._waiting)
+            self._owner = me
+            self._depth = 1
+
+    def release(self):
+        with self._cond:
+            self._depth = self._depth - 1
+            if self._depth == 0:
+                self._owner = None
+                self._cond.notify_all()
+
+    def device(self):
+        with self._cond:
+            if self.bus is None:
+                self.bus = openbus()
+            return self.bus
+
+    def stats(self):
+        return {name: client.stats() for name, client in list(self.clients.items())}
+
+
+class BusClient(object):
+    """
+    One client of a BusArbiter, with the smbus2 calls the daemons use.  Counts its
+    transactions, the bytes they moved, the time spent waiting for the bus and the time
+    spent using it.
+    """
+
+    def __init__(self, arbiter, name, priority):
+        self.arbiter = arbiter
+        self.name = name
+        self.priority = priority
+        self._lock = Lock()
+        self.transactions = 0
+        self.bytes = 0
+        self.waittime = 0
+        self.maxwait = 0
+        self.bustime = 0
+
+    @contextmanager
+    def atomic(self):
+        """
+        Keep the bus for the transactions in the with block.
+        """
+        self.arbiter.acquire(self.priority)
+        try:
+            yield self
+        finally:
+            self.arbiter.release()
+
+    def transact(self, nbytes, call, *args):
+        start = time.perf_counter()
+        self.arbiter.acquire(self.priority)
+        granted = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            done = time.perf_counter()
+            self.arbiter.release()
+            with self._lock:
+                self.transactions = self.transactions + 1
+                self.bytes = self.bytes + nbytes
+                self.waittime = self.waittime + granted - start
+                self.maxwait = max(self.maxwait, granted - start)
+                self.bustime = self.bustime + done - granted
+            timing.observe("i2c " + self.name, done - start)
+
+    def stats(self):
+        """
+        Transaction and byte counts, and wait and bus times in milliseconds.
+        """
+        with self._lock:
+            return {"transactions": self.transactions, "bytes": self.bytes,
+                    "wait_ms": round(1000*self.waittime, 3), "maxwait_ms": round(1000*self.maxwait, 3),
+                    "bus_ms": round(1000*self.bustime, 3)}
+
+    #
+    # smbus2 interface, byte counts include the register byte
+    #
+
+    def write_quick(self, addr):
+        return self.transact(0, self.arbiter.device().write_quick, addr)
+
+    def read_byte(self, addr):
+        return self.transact(1, self.arbiter.device().read_byte, addr)
+
+    def write_byte(self, addr, value):
+        return self.transact(1, self.arbiter.device().write_byte, addr, value)
+
+    def read_byte_data(self, addr, register):
+        return self.transact(2, self.arbiter.device().read_byte_data, addr, register)
+
+    def write_byte_data(self, addr, register, value):
+        return self.transact(2, self.arbiter.device().write_byte_data, addr, register, value)
+
+    def write_i2c_block_data(self, addr, register, data):
+        return self.transact(1 + len(data), self.arbiter.device().write_i2c_block_data, addr, register, data)
+
+
+def arbiter():
+    """
+    The arbiter of the I2C bus, one per process.
+    """
+    global _arbiter
+    if _arbiter is None:
+        _arbiter = BusArbiter()
+    return _arbiter
+
+
+def busclient(name):
+    """
+    The BusClient called name, with the priority PRIORITIES gives it.
+    """
+    return arbiter().client(name, PRIORITIES.get(name, PRIORITY_OTHER))
+
+
+def busstats():
+    if _arbiter is None:
+        return {}
+    return _arbiter.stats()
+
+
+def probe(bus, addr):
+    """
+    Whether a device answers at addr.  Like i2cdetect, reads from the EEPROM range
+    (which holds the RTC) and sends a quick write elsewhere.
+    """
+    try:
+        if 0x50 <= addr <= 0x5f:
+            bus.read_byte(addr)
+        else:
+            bus.write_quick(addr)
+        return True
+    except OSError:
+        return False
+
+
+def features(bus=None):
+    """
+    The names of the FEATURES found on the bus.
+    """
+    if bus is None:
+        bus = busclient("probe")
+    return {name for name, addr in FEATURES.items() if probe(bus, addr)}
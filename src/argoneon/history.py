@@ -0,0 +1,128 @@
+#
+# Recent samples of the metrics the OLED screens graph.  sample_loop() takes a cheap
+# sample (one /proc/stat read, the CPU thermal zone and the /sys/block counters) every
+# SAMPLE_INTERVAL seconds and keeps the last WINDOW seconds of each series in memory,
+# so the screens can draw trends without collecting anything themselves.
+#
+
+import os
+import time
+from asyncio import Event
+from collections import deque
+
+from . import logging as log
+from . import collectors, sysinfo, timing
+
+SAMPLE_INTERVAL = 5
+WINDOW = 300
+
+# Virtual block devices, their I/O is already counted on the devices beneath them
+VIRTUAL_DEVICES = ("loop", "ram", "zram", "md", "dm-")
+
+series = {}
+_awake = Event()
+_awake.set()
+# CPU counters, disk sectors and time of the last sample, None to start over
+_previous = None
+
+
+class Series(object):
+    """
+    Ring buffer of the newest maxlen samples, oldest first.
+    """
+
+    def __init__(self, maxlen=WINDOW // SAMPLE_INTERVAL):
+        self.samples = deque(maxlen=maxlen)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def values(self):
+        return list(self.samples)
+
+    def __len__(self):
+        return len(self.samples)
+
+
+def record(name, value):
+    if name not in series:
+        series[name] = Series()
+    series[name].add(value)
+
+
+def get(name):
+    """
+    The samples of series name, oldest first.  Empty if there are none yet.
+    """
+    if name not in series:
+        return []
+    return series[name].values()
+
+
+def pause():
+    """
+    Stop sampling, e.g. while the screensaver is on.
+    """
+    _awake.clear()
+
+
+def resume():
+    """
+    Start sampling again.  The first sample after the pause only sets the baseline,
+    its rates would be averaged over the whole pause.
+    """
+    global _previous
+    _previous = None
+    _awake.set()
+
+
+def disk_sectors():
+    """
+    Sectors read plus written so far on all physical block devices.
+    """
+    total = 0
+    for disk in os.listdir('/sys/block'):
+        if disk.startswith(VIRTUAL_DEVICES):
+            continue
+        try:
+            usage = sysinfo.disk_usage_detail(disk)
+            total = total + usage['readsector'] + usage['writesector']
+        except Exception:
+            pass
+    return total
+
+
+def snapshot():
+    """
+    CPU counters, CPU temperature and disk sectors, as sample_loop() needs them.
+    """
+    return sysinfo.get_cpu_usage_snapshot()["cpu"], sysinfo.get_cpu_temp(), disk_sectors()
+
+
+async def sample_loop():
+    """
+    Record "cpu" (total usage %), "temp" (CPU temperature in C) and "disk" (KB/s read
+    and written) every SAMPLE_INTERVAL seconds while not paused.  The reads run on the
+    collector pool.  Runs forever.
+    """
+    global _previous
+    while True:
+        await _awake.wait()
+        try:
+            cpu, temp, sectors = await collectors.collect("history", snapshot)
+            now = time.monotonic()
+            if _previous is not None:
+                prevcpu, prevsectors, prevtime = _previous
+                if cpu["total"] > prevcpu["total"]:
+                    total = cpu["total"] - prevcpu["total"]
+                    idle = cpu["idle"] - prevcpu["idle"]
+                    record("cpu", int(100*(total-idle)/total))
+                # Sectors are 512 bytes
+                record("disk", max(0, sectors - prevsectors)/2/(now - prevtime))
+            _previous = (cpu, sectors, now)
+
+            if temp > 0:
+                record("temp", temp)
+        except Exception:
+            log.error("Error sampling metric history")
+        await timing.sleep(SAMPLE_INTERVAL)
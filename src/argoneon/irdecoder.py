@@ -2,8 +2,6 @@
 
 # Standard Headers
 import sys
-import smbus2 as smbus
-import RPi.GPIO as GPIO
 
 # For GPIO
 from datetime import datetime
@@ -14,6 +12,7 @@ import time
 
 # Check if Lirc Lib is installed
 import importlib
+import importlib.util
 haslirclib = False
 try:
 	lirclib = importlib.util.find_spec("lirc")
@@ -29,11 +28,12 @@ except:
 if haslirclib:
 	import lirc
 
+from .hardware import gpio, openbus
+
 #########################
-# Use GPIO
+# Use GPIO, set up by main()
 irreceiver_pin = 23     # IR Receiver Pin
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(irreceiver_pin, GPIO.IN,  pull_up_down=GPIO.PUD_DOWN)
+GPIO = None
 
 def getGPIOPulseData():
 	# Counter
@@ -271,6 +271,10 @@ def bytecompare(a, b):
 
 
 def main():
+	global GPIO
+	GPIO = gpio()
+	GPIO.setup(irreceiver_pin, GPIO.IN,  pull_up_down=GPIO.PUD_DOWN)
+
 	# Main Flow
 	mode = "custom"
 	if len(sys.argv) > 1:
@@ -420,11 +424,7 @@ def main():
 		#print("Writing " + getbytestring(powerdata))
 		print("Updating Device...")
 
-		rev = GPIO.RPI_REVISION
-		if rev == 2 or rev == 3:
-			bus = smbus.SMBus(1)
-		else:
-			bus = smbus.SMBus(0)
+		bus = openbus()
 
 		bus.write_i2c_block_data(address, command, powerdata)
 		bus.close()
@@ -1,15 +1,164 @@
+#
+# Logging for the daemons.  enable() sends INFO and up (DEBUG and up with debug = Y)
+# to stdout, i.e. journald, each message at most RATE_LIMIT times per RATE_PERIOD
+# seconds.  Every record from DEBUG up is also kept, unformatted, in a ring of the
+# last RING_SIZE, which dump() writes out on demand, so the debug detail of the last
+# few minutes is there after the fact without writing it all to the SD card.  Dict,
+# list and set arguments are copied into the ring so later changes to them don't show.
+#
+# Messages are formatted only when written.  Arguments that are costly to compute
+# can be wrapped in lazy(), which calls them at that point too:
+#
+#   log.debug('bus %s', log.lazy(busstats))
+#
+
 import logging
+from collections import deque
+from copy import copy
 from sys import stdout
+from time import monotonic
 
 FORMAT_STRING = '%(asctime)s %(process)d [%(levelname)s] %(message)s'
 DATE_FORMAT = '%b %d %y %H:%M:%S'
 
+RATE_LIMIT = 10
+RATE_PERIOD = 60
+RING_SIZE = 1000
+# Arguments the ring copies
+CONTAINERS = (dict, list, set)
+
+_stream = None
+
+
+class lazy(object):
+    """
+    A log argument that is func(*args), computed when the message is formatted: when
+    it is written to stdout, or for a record only in the ring, when the ring is dumped,
+    so it shows the values of then.
+    """
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+    def __repr__(self):
+        return repr(self.func(*self.args))
+
+
+class RateLimit(logging.Filter):
+    """
+    Passes at most limit records of each message per period seconds.  The first one
+    after a period in which some were held back says how many.
+    """
+
+    def __init__(self, limit=RATE_LIMIT, period=RATE_PERIOD, clock=monotonic):
+        super().__init__()
+        self.limit = limit
+        self.period = period
+        self.clock = clock
+        self.windows = {}
+
+    def filter(self, record):
+        now = self.clock()
+        key = (record.levelno, record.msg)
+        start, count, suppressed = self.windows.get(key, (now, 0, 0))
+        if now - start >= self.period:
+            start, count = now, 0
+        if count >= self.limit:
+            self.windows[key] = (start, count, suppressed + 1)
+            return False
+        self.windows[key] = (start, count + 1, 0)
+        record.suppressed = suppressed
+        return True
+
+
+class Formatter(logging.Formatter):
+    def format(self, record):
+        text = super().format(record)
+        if getattr(record, 'suppressed', 0):
+            text = '%s (%d more suppressed)' % (text, record.suppressed)
+        return text
+
+
+class Ring(logging.Handler):
+    """
+    Keeps the last size records as they are, to be formatted if they are dumped, with
+    shallow copies of their container arguments.
+    """
+
+    def __init__(self, size=RING_SIZE):
+        super().__init__(logging.DEBUG)
+        self.records = deque(maxlen=size)
+
+    def emit(self, record):
+        args = record.args
+        if isinstance(args, dict):
+            record.args = copy(args)
+        elif args and any(isinstance(arg, CONTAINERS) for arg in args):
+            record.args = tuple(copy(arg) if isinstance(arg, CONTAINERS) else arg for arg in args)
+        self.records.append(record)
+
+
+ring = Ring()
+
 
 def enable(enableDebug: bool = False):
-    logging.basicConfig(stream=stdout,
-                        level=logging.DEBUG,
-                        format=FORMAT_STRING,
-                        datefmt=DATE_FORMAT)
+    """
+    Log to stdout from DEBUG up if enableDebug, else from INFO up, rate limited, and
+    keep everything from DEBUG up in the ring.  Calling it again replaces the setup.
+    """
+    global _stream
+    # Nothing logged needs the caller's file and line or the thread, skip finding them
+    # for every record (see Optimization in the logging documentation)
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logMultiprocessing = False
+    root = logging.getLogger()
+    if _stream is not None:
+        root.removeHandler(_stream)
+    _stream = logging.StreamHandler(stdout)
+    _stream.setLevel(logging.DEBUG if enableDebug else logging.INFO)
+    _stream.setFormatter(Formatter(FORMAT_STRING, DATE_FORMAT))
+    _stream.addFilter(RateLimit())
+    root.addHandler(_stream)
+    if ring not in root.handlers:
+        root.addHandler(ring)
+    root.setLevel(logging.DEBUG)
+
+
+def dump(file=stdout):
+    """
+    Write the records in the ring to file, oldest first.
+    """
+    formatter = logging.Formatter(FORMAT_STRING, DATE_FORMAT)
+    for record in list(ring.records):
+        file.write(formatter.format(record) + '\n')
+
+
+def dumpname(daemon):
+    return '%s-log.txt' % daemon
+
+
+def install(daemon):
+    """
+    Make SIGUSR2 dump the ring to dumpname(daemon) in /run/argoneon.  Must be called
+    from the running event loop.
+    """
+    from asyncio import get_running_loop
+    from signal import SIGUSR2
+
+    from . import runfiles
+
+    def write():
+        try:
+            info('Recent log records written to %s', runfiles.write(dumpname(daemon), dump))
+        except OSError as err:
+            error('Error writing %s: %s', runfiles.path(dumpname(daemon)), err)
+
+    get_running_loop().add_signal_handler(SIGUSR2, write)
 
 
 def debug(message, *args): logging.debug(message, *args)
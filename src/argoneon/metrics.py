@@ -0,0 +1,327 @@
+#
+# Prometheus metrics of the daemons.  The values are cached: the fan loop records the
+# temperatures and fan duty it reads anyway, refresh_loop() reads the disk, network
+# and RAID figures on the collector pool on its own schedule, and the timing
+# histograms and collector, bus and OLED counts are kept all along.  A scrape (or a write
+# of the node_exporter textfile) only formats the cache, it never collects anything.
+#
+# Enabled in the [Metrics] section of eon.conf:
+#
+#   [Metrics]
+#   port = 9877                                 # http://127.0.0.1:9877/metrics
+#   address = 127.0.0.1
+#   textfile = /var/lib/node_exporter/argon.prom
+#
+
+import os
+import time
+
+from . import logging as log
+from . import collectors, history, oled, sysinfo, timing
+from .hardware import busstats
+from .version import ARGON_VERSION
+
+REFRESH_INTERVAL = 15
+RAID_INTERVAL = 60
+RAID_TIMEOUT = 30
+REQUEST_TIMEOUT = 5
+
+# Name, type and help of each metric, in the order they are exported
+METRICS = (
+    ("argon_info", "gauge", "Version of the Argon daemon."),
+    ("argon_cpu_temperature_celsius", "gauge", "CPU temperature."),
+    ("argon_hdd_temperature_celsius", "gauge", "Temperature of the hottest disk, as the fan control sees it."),
+    ("argon_fan_duty_percent", "gauge", "Fan speed set last."),
+    ("argon_disk_read_bytes_total", "counter", "Bytes read from a physical disk."),
+    ("argon_disk_written_bytes_total", "counter", "Bytes written to a physical disk."),
+    ("argon_disk_read_bytes_per_second", "gauge", "Read rate of a disk over the last refresh interval."),
+    ("argon_disk_write_bytes_per_second", "gauge", "Write rate of a disk over the last refresh interval."),
+    ("argon_network_receive_bytes_total", "counter", "Bytes received on a network interface."),
+    ("argon_network_transmit_bytes_total", "counter", "Bytes sent on a network interface."),
+    ("argon_network_receive_bytes_per_second", "gauge", "Receive rate of an interface over the last refresh interval."),
+    ("argon_network_transmit_bytes_per_second", "gauge", "Transmit rate of an interface over the last refresh interval."),
+    ("argon_raid_state", "gauge", "State of a RAID array as mdadm reports it, always 1."),
+    ("argon_raid_degraded", "gauge", "Whether a RAID array is degraded."),
+    ("argon_raid_devices", "gauge", "Devices of a RAID array."),
+    ("argon_raid_active_devices", "gauge", "Active devices of a RAID array."),
+    ("argon_raid_failed_devices", "gauge", "Failed devices of a RAID array."),
+    ("argon_raid_spare_devices", "gauge", "Spare devices of a RAID array."),
+    ("argon_metrics_refresh_timestamp_seconds", "gauge", "When the cached disk, network and RAID figures were read."),
+)
+
+values = {}
+
+
+def record(name, value, **labels):
+    """
+    Cache one value of metric name.
+    """
+    values.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+
+def replace(name, family):
+    """
+    Cache all values of metric name, a dict of label dicts (as tuples of pairs) to
+    values, dropping the ones no longer there.
+    """
+    values[name] = family
+
+
+#
+# Exposition
+#
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def sample(name, labels, value):
+    if labels:
+        return '%s{%s} %s' % (name, ','.join('%s="%s"' % (key, escape(val)) for key, val in labels), value)
+    return '%s %s' % (name, value)
+
+
+def histogramlines():
+    lines = ["# HELP argon_task_duration_seconds Duration of the daemon's tasks, see argononed timing.",
+             "# TYPE argon_task_duration_seconds histogram"]
+    for task, snap in sorted(timing.snapshot().items()):
+        task = (("task", task),)
+        cumulative = 0
+        for bound, count in zip(timing.BOUNDS + ("+Inf",), snap["buckets"]):
+            cumulative = cumulative + count
+            lines.append(sample("argon_task_duration_seconds_bucket", task + (("le", bound),), cumulative))
+        lines.append(sample("argon_task_duration_seconds_sum", task, snap["sum"]))
+        lines.append(sample("argon_task_duration_seconds_count", task, snap["count"]))
+    return lines
+
+
+def internallines():
+    lines = []
+    pool = collectors.pool.stats()
+    for key, kind in (("completed", "counter"), ("failed", "counter"), ("timeouts", "counter"),
+                      ("shared", "counter"), ("queued", "gauge"), ("running", "gauge")):
+        name = "argon_collector_%s%s" % (key, "_total" if kind == "counter" else "")
+        lines.append("# TYPE %s %s" % (name, kind))
+        lines.append(sample(name, (), pool[key]))
+    frames = oled.worker.stats()
+    for key in ("submitted", "transmitted", "dropped", "skipped"):
+        name = "argon_oled_frames_%s_total" % key
+        lines.append("# TYPE %s counter" % name)
+        lines.append(sample(name, (), frames[key]))
+    cache = oled.textcache.stats()
+    for key, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"),
+                      ("entries", "gauge"), ("bytes", "gauge")):
+        name = "argon_oled_text_cache_%s%s" % (key, "_total" if kind == "counter" else "")
+        lines.append("# TYPE %s %s" % (name, kind))
+        lines.append(sample(name, (), cache[key]))
+    bus = busstats()
+    for key, name, scale in (("transactions", "argon_i2c_transactions_total", 1),
+                             ("bytes", "argon_i2c_bytes_total", 1),
+                             ("wait_ms", "argon_i2c_wait_seconds_total", 0.001),
+                             ("bus_ms", "argon_i2c_busy_seconds_total", 0.001)):
+        lines.append("# TYPE %s counter" % name)
+        for client, stats in sorted(bus.items()):
+            lines.append(sample(name, (("client", client),), stats[key] * scale))
+    return lines
+
+
+def render():
+    """
+    The cached metrics in the Prometheus text format.
+    """
+    lines = []
+    for name, kind, description in METRICS:
+        family = values.get(name)
+        if not family:
+            continue
+        lines.append("# HELP %s %s" % (name, description))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for labels, value in sorted(family.items()):
+            lines.append(sample(name, labels, value))
+    lines.extend(histogramlines())
+    lines.extend(internallines())
+    return "\n".join(lines) + "\n"
+
+
+#
+# Collection, on the collector pool
+#
+
+def counters():
+    """
+    CPU temperature, and bytes so far by physical disk and by network interface.
+    """
+    disks = {}
+    for disk in os.listdir('/sys/block'):
+        if disk.startswith(history.VIRTUAL_DEVICES):
+            continue
+        try:
+            usage = sysinfo.disk_usage_detail(disk)
+            # Sectors are 512 bytes
+            disks[disk] = (512 * usage['readsector'], 512 * usage['writesector'])
+        except Exception:
+            pass
+
+    interfaces = {}
+    with open('/proc/net/dev') as file:
+        for line in file.readlines()[2:]:
+            name, fields = line.split(':', 1)
+            name = name.strip()
+            fields = fields.split()
+            if name != 'lo':
+                interfaces[name] = (int(fields[0]), int(fields[8]))
+    return sysinfo.get_cpu_temp(), disks, interfaces
+
+
+def raidstate():
+    """
+    sysinfo.get_raid_detail() of each array in /proc/mdstat.
+    """
+    if not os.path.exists('/proc/mdstat'):
+        return {}
+    return {raid['title']: raid['info'] for raid in sysinfo.list_raid()['raidlist']}
+
+
+def recordbytes(label, totals, previous, elapsed, names):
+    """
+    Cache the two byte counts of each entry of totals, {name: (first, second)}, and
+    their rates since previous, as the metrics names: first and second total, first
+    and second rate.
+    """
+    for index in (0, 1):
+        replace(names[index], {((label, name),): pair[index] for name, pair in totals.items()})
+        if previous is not None and elapsed > 0:
+            replace(names[index + 2], {((label, name),): max(0, pair[index] - previous[name][index]) / elapsed
+                                       for name, pair in totals.items() if name in previous})
+
+
+def recordcounters(snapshot, previous, elapsed):
+    temp, disks, interfaces = snapshot
+    if temp > 0:
+        record("argon_cpu_temperature_celsius", temp)
+    recordbytes("disk", disks, previous and previous[1], elapsed,
+                ("argon_disk_read_bytes_total", "argon_disk_written_bytes_total",
+                 "argon_disk_read_bytes_per_second", "argon_disk_write_bytes_per_second"))
+    recordbytes("interface", interfaces, previous and previous[2], elapsed,
+                ("argon_network_receive_bytes_total", "argon_network_transmit_bytes_total",
+                 "argon_network_receive_bytes_per_second", "argon_network_transmit_bytes_per_second"))
+    record("argon_metrics_refresh_timestamp_seconds", time.time())
+
+
+def recordraid(arrays):
+    for name in ("argon_raid_state", "argon_raid_degraded", "argon_raid_devices", "argon_raid_active_devices",
+                 "argon_raid_failed_devices", "argon_raid_spare_devices"):
+        replace(name, {})
+    for array, info in arrays.items():
+        record("argon_raid_state", 1, array=array, state=info["state"])
+        record("argon_raid_degraded", int("degraded" in info["state"]), array=array)
+        record("argon_raid_devices", info["devices"], array=array)
+        record("argon_raid_active_devices", info["active"], array=array)
+        record("argon_raid_failed_devices", info["failed"], array=array)
+        record("argon_raid_spare_devices", info["spare"], array=array)
+
+
+async def refresh_loop(textfile=None):
+    """
+    Refresh the disk, network and CPU figures every REFRESH_INTERVAL seconds and the
+    RAID state every RAID_INTERVAL seconds, writing textfile after each refresh if
+    given.  Runs forever.
+    """
+    from asyncio import TimeoutError
+
+    record("argon_info", 1, version=ARGON_VERSION)
+    previous = None
+    prevtime = 0
+    raidtime = None
+    while True:
+        try:
+            snapshot = await collectors.collect("metrics", counters)
+            now = time.monotonic()
+            recordcounters(snapshot, previous, now - prevtime)
+            previous, prevtime = snapshot, now
+            if raidtime is None or now - raidtime >= RAID_INTERVAL:
+                raidtime = now
+                recordraid(await collectors.collect("raid state", raidstate, timeout=RAID_TIMEOUT))
+        except TimeoutError:
+            pass
+        except Exception:
+            log.error("Error refreshing metrics")
+        if textfile:
+            try:
+                writetextfile(textfile)
+            except OSError:
+                log.error("Error writing metrics to %s", textfile)
+        await timing.sleep(REFRESH_INTERVAL)
+
+
+#
+# Export
+#
+
+def writetextfile(filename):
+    """
+    Write the metrics for the node_exporter textfile collector, which must never see
+    a half written file.
+    """
+    with open(filename + ".tmp", "w") as file:
+        file.write(render())
+    os.replace(filename + ".tmp", filename)
+
+
+async def handle(reader, writer):
+    """
+    Answer one HTTP request, GET /metrics, from the cache.
+    """
+    from asyncio import TimeoutError, wait_for
+
+    try:
+        request = await wait_for(reader.readline(), REQUEST_TIMEOUT)
+        while (await wait_for(reader.readline(), REQUEST_TIMEOUT)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] in (b"GET", b"HEAD") and parts[1].split(b"?")[0] in (b"/", b"/metrics"):
+            with timing.timed("metrics scrape"):
+                body = render().encode()
+            status = "200 OK"
+            contenttype = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"Not found\n"
+            status = "404 Not Found"
+            contenttype = "text/plain"
+        header = "HTTP/1.0 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % (
+            status, contenttype, len(body))
+        writer.write(header.encode())
+        if parts[:1] != [b"HEAD"]:
+            writer.write(body)
+        await writer.drain()
+    except (OSError, TimeoutError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(port, address="127.0.0.1"):
+    """
+    Serve the metrics on address:port until cancelled.
+    """
+    from asyncio import start_server
+
+    server = await start_server(handle, address, port)
+    log.info("Serving metrics on http://%s:%s/metrics", address, port)
+    async with server:
+        await server.serve_forever()
+
+
+def tasks(config):
+    """
+    The coroutines exporting the metrics as the [Metrics] config section asks, none
+    if it asks for neither a port nor a textfile.
+    """
+    port = int(config.get('port', '0') or 0)
+    textfile = config.get('textfile', '').strip()
+    if port <= 0 and not textfile:
+        return []
+    coroutines = [refresh_loop(textfile or None)]
+    if port > 0:
+        coroutines.append(serve(port, config.get('address', '127.0.0.1')))
+    return coroutines
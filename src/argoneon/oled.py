@@ -1,15 +1,17 @@
+from collections import OrderedDict
 from os.path import dirname, join
+from threading import Condition, Thread, current_thread
+from typing import TYPE_CHECKING
 
-import RPi.GPIO as GPIO
-import smbus2 as smbus
+from . import logging as log
+from . import timing
+from .hardware import busclient
 
-# Initialize I2C Bus
-rev = GPIO.RPI_REVISION
-if rev == 2 or rev == 3:
-    bus = smbus.SMBus(1)
-else:
-    bus = smbus.SMBus(0)
+if TYPE_CHECKING:
+    from asyncio import Future
 
+# I2C bus client, or a stand-in such as virtualoled.VirtualPanel.  Opened on first use.
+bus = None
 
 WD = 128
 HT = 64
@@ -22,6 +24,24 @@ BUFFERSIZE = ((WD*HT) >> 3)
 imagebuffer = [0] * BUFFERSIZE
 
 
+def setbackend(panel):
+    """
+    Send all panel traffic to panel instead of the I2C bus.  A backend implements the
+    smbus2 calls used here: write_byte_data() and write_i2c_block_data().  It may also
+    implement flushed(), called after every complete flushimage().
+    """
+    global bus
+    bus = panel
+    worker.forget()
+
+
+def backend():
+    global bus
+    if bus is None:
+        bus = busclient("oled")
+    return bus
+
+
 def getmaxY():
     return HT
 
@@ -100,16 +120,24 @@ def fill(value):
     flushimage()
 
 
-def flushimage(hidescreen=True):
+def flushimage(hidescreen=True, frame=None):
+    """
+    Send the image buffer (or frame) to the panel.  Returns False if any block failed.
+    """
+    # The display RAM can't be written while the controller scrolls it
+    stopscroll()
+
     if hidescreen == True:
         # Reset/Hide screen
         power(False)
 
+    sent = True
     xctr = 0
     while xctr < WD:
         yctr = 0
         while yctr < HT:
-            flushblock(xctr, yctr)
+            if not flushblock(xctr, yctr, frame):
+                sent = False
             yctr = yctr + 8
         xctr = xctr + 32
 
@@ -117,11 +145,19 @@ def flushimage(hidescreen=True):
         # Display
         power(True)
 
+    flushed = getattr(bus, "flushed", None)
+    if flushed is not None:
+        flushed()
+    return sent
+
 
-def flushblock(xoffset, yoffset):
+def flushblock(xoffset, yoffset, frame=None):
+    if frame is None:
+        frame = imagebuffer
     yoffset = yoffset >> 3
     blocksize = 32
     try:
+        bus = backend()
         # Set COM-H Addressing
         bus.write_byte_data(ADDR_OLED, 0, 0x20)
         bus.write_byte_data(ADDR_OLED, 0, 0x1)
@@ -142,9 +178,10 @@ def flushblock(xoffset, yoffset):
         bufferoffset = WD*yoffset + xoffset
         # Write Out Buffer
         bus.write_i2c_block_data(ADDR_OLED, SLAVEADDRESS,
-                                 imagebuffer[bufferoffset:(bufferoffset+blocksize)])
+                                 frame[bufferoffset:(bufferoffset+blocksize)])
     except:
-        return
+        return False
+    return True
 
 
 def drawfilledrectangle(x, y, wd, ht, mode=0):
@@ -184,19 +221,171 @@ def drawfilledrectangle(x, y, wd, ht, mode=0):
             curx = curx + 1
 
 
+#
+# Graphs.  A graph column is drawn as one integer bit mask over all HT rows, written
+# into the image buffer a page byte at a time, so a column costs HT/8 writes however
+# tall it is.
+#
+
+def blitcolumn(x, y, ht, top, bottom):
+    """
+    Light rows top to bottom of column x and clear the other rows from y to y+ht-1.
+    """
+    box = ((1 << (y+ht)) - 1) ^ ((1 << y) - 1)
+    lit = 0
+    if top <= bottom:
+        lit = (((1 << (bottom+1)) - 1) ^ ((1 << top) - 1)) & box
+    offset = x + WD*(y >> 3)
+    shift = y & 0xF8
+    while shift < y+ht:
+        mask = (box >> shift) & 0xFF
+        imagebuffer[offset] = (imagebuffer[offset] & ~mask) | ((lit >> shift) & 0xFF)
+        offset = offset + WD
+        shift = shift + 8
+
+
+def graphrows(values, ht, minval, maxval):
+    """
+    Scale values to rows above the bottom of an ht tall graph, 0 to ht-1.
+    """
+    span = maxval - minval
+    if span <= 0:
+        span = 1
+    rows = []
+    for value in values:
+        scaled = (value - minval)/span
+        rows.append(int(round(min(max(scaled, 0), 1)*(ht-1))))
+    return rows
+
+
+def drawcolumns(values, x, y, wd, ht, minval=0, maxval=100):
+    """
+    Column graph of the newest wd values, newest on the right, in the box at x, y.
+    """
+    values = values[-wd:]
+    rows = graphrows(values, ht, minval, maxval)
+    bottom = y + ht - 1
+    curx = x + wd - len(rows)
+    for col in range(x, curx):
+        blitcolumn(col, y, ht, 1, 0)
+    for row in rows:
+        blitcolumn(curx, y, ht, bottom - row, bottom)
+        curx = curx + 1
+
+
+def drawsparkline(values, x, y, wd, ht, minval=0, maxval=100):
+    """
+    Line graph of the newest wd values, newest on the right, in the box at x, y.
+    Each point is joined to the previous one by a vertical run.
+    """
+    values = values[-wd:]
+    rows = graphrows(values, ht, minval, maxval)
+    bottom = y + ht - 1
+    curx = x + wd - len(rows)
+    for col in range(x, curx):
+        blitcolumn(col, y, ht, 1, 0)
+    prevrow = None
+    for row in rows:
+        cury = bottom - row
+        if prevrow is None:
+            prevrow = cury
+        blitcolumn(curx, y, ht, min(cury, prevrow), max(cury, prevrow))
+        prevrow = cury
+        curx = curx + 1
+
+
 def writetextaligned(textdata, x, y, boxwidth, alignmode, charwd=6, mode=0):
+    font = loadfont(charwd)
+    if font is None:
+        return
+
     leftoffset = 0
     if alignmode == 1:
         # Centered
-        leftoffset = (boxwidth-len(textdata)*charwd) >> 1
+        leftoffset = (boxwidth-font.textwidth(textdata)) >> 1
     elif alignmode == 2:
         # Right aligned
-        leftoffset = (boxwidth-len(textdata)*charwd)
+        leftoffset = (boxwidth-font.textwidth(textdata))
 
     writetext(textdata, x+leftoffset, y, charwd, mode)
 
 
-def writetext(textdata, x, y, charwd=6, mode=0):
+class Font(object):
+    """
+    A glyph atlas of NUMFONTCHAR glyphs.  fontbytes holds numfontrow page rows of
+    rowstride column bytes each, least significant bit on top, and glyph code takes
+    advances[code] columns from offsets[code] in every row.  The fixed width
+    oled/fontHxW.bin files are stored exactly like this with equal advances;
+    fontfile.loadfontfile() builds proportional atlases from BDF and PCF fonts.
+    charwd is the widest advance.
+    """
+
+    def __init__(self, charht, charwd, fontbytes, advances=None):
+        if advances is None:
+            advances = [charwd] * NUMFONTCHAR
+        self.charht = charht
+        self.charwd = max(advances)
+        self.numfontrow = charht >> 3
+        self.fontbytes = fontbytes
+        self.advances = advances
+        self.offsets = []
+        offset = 0
+        for advance in advances:
+            self.offsets.append(offset)
+            offset = offset + advance
+        self.rowstride = offset
+        self.shifted = {}
+
+    def textwidth(self, textdata):
+        """
+        Width of textdata in pixels.
+        """
+        advances = self.advances
+        width = 0
+        for ch in textdata:
+            width = width + advances[ord(ch) & 0xFF]
+        return width
+
+    def shiftmasks(self, shift):
+        """
+        Page masks covered by one glyph column drawn shift rows below a page boundary.
+        """
+        cellmask = ((1 << self.charht) - 1) << shift
+        return tuple((cellmask >> (8*page)) & 0xFF for page in range(self.numfontrow + 1))
+
+    def shiftedglyph(self, code, shift):
+        """
+        Columns of glyph code moved down by shift rows, as tuples of numfontrow+1 page
+        bytes.  Built the first time a glyph is drawn at that offset, then reused.
+        """
+        glyphs = self.shifted.get(shift)
+        if glyphs is None:
+            glyphs = self.shifted[shift] = {}
+        columns = glyphs.get(code)
+        if columns is None:
+            columns = []
+            fontoffset = self.offsets[code]
+            for fontcol in range(self.advances[code]):
+                value = 0
+                for fontrow in range(self.numfontrow):
+                    value |= self.fontbytes[fontoffset + fontcol + self.rowstride*fontrow] << (8*fontrow)
+                value <<= shift
+                columns.append(tuple((value >> (8*page)) & 0xFF for page in range(self.numfontrow + 1)))
+            glyphs[code] = columns
+        return columns
+
+
+fonts = {}
+
+
+def loadfont(charwd=6):
+    """
+    Return the Font for the given character width, falling back to the smallest font.
+    Fonts are read from disk once and kept.  A Font is returned as it is, so a loaded
+    font can be passed wherever a character width is expected.
+    """
+    if isinstance(charwd, Font):
+        return charwd
     if charwd < 6:
         charwd = 6
 
@@ -204,72 +393,171 @@ def writetext(textdata, x, y, charwd=6, mode=0):
     if charht & 0x7:
         charht = (charht & 0xF8) + 8
 
-    try:
-        file = open(join(dirname(__file__), "oled/font" +
-                    str(charht)+"x"+str(charwd)+".bin"), "rb")
-        fontbytes = list(file.read())
-        file.close()
-    except FileNotFoundError:
+    for fontht, fontwd in ((charht, charwd), (8, 6)):
+        font = fonts.get((fontht, fontwd))
+        if font is not None:
+            return font
         try:
-            # Default to smallest
-            file = open(join(dirname(__file__), "oled/font8x6.bin"), "rb")
-            fontbytes = list(file.read())
+            file = open(join(dirname(__file__), "oled/font" +
+                        str(fontht)+"x"+str(fontwd)+".bin"), "rb")
+            fontbytes = file.read()
             file.close()
         except FileNotFoundError:
-            return
-
-    if ((y & 0x7)) == 0:
-        # Use optimized loading
-        fastwritetext(textdata, x, y, charht, charwd, fontbytes, mode)
-        return
+            continue
+        font = fonts[(fontht, fontwd)] = Font(fontht, fontwd, fontbytes)
+        return font
+    return None
 
-    numfontrow = charht >> 3
-    ctr = 0
-    while ctr < len(textdata):
-        fontoffset = ord(textdata[ctr])*charwd
-        fontcol = 0
-        while fontcol < charwd and x < WD:
-            fontrow = 0
-            row = y
-            while fontrow < numfontrow and row < HT and x >= 0:
-                curbit = 0x80
-                curbyte = (fontbytes[fontoffset + fontcol +
-                           (NUMFONTCHAR*charwd*fontrow)])
-                subrow = 0
-                while subrow < 8 and row < HT:
-                    value = 0
-                    if (curbyte & curbit) != 0:
-                        value = 1
-                    writebuffer(x, row, value, mode)
-                    curbit = curbit >> 1
-                    row = row + 1
-                    subrow = subrow + 1
-                fontrow = fontrow + 1
-            fontcol = fontcol + 1
-            x = x + 1
-        ctr = ctr + 1
 
+def writetext(textdata, x, y, charwd=6, mode=0):
+    font = loadfont(charwd)
+    if font is None:
+        return
 
-def fastwritetext(textdata, x, y, charht, charwd, fontbytes, mode=0):
+    if ((y & 0x7)) == 0:
+        # Page aligned, draw the cached rendering
+        key = (textdata, font, x)
+        entry = textcache.get(key)
+        if entry is None:
+            entry = rendertext(textdata, x, font)
+            textcache.put(key, entry)
+        blittext(entry, y, mode)
+        return
 
-    numfontrow = charht >> 3
-    ctr = 0
-    while ctr < len(textdata):
-        fontoffset = ord(textdata[ctr])*charwd
-        fontcol = 0
-        while fontcol < charwd and x < WD:
-            fontrow = 0
-            row = y & 0xF8
-            while fontrow < numfontrow and row < HT and x >= 0:
-                curbyte = (fontbytes[fontoffset + fontcol +
-                           (NUMFONTCHAR*charwd*fontrow)])
-                writebyterow(x, row, curbyte, mode)
-                fontrow = fontrow + 1
-                row = row + 8
-            fontcol = fontcol + 1
+    shiftwritetext(textdata, x, y, font, mode)
+
+
+class TextCache(object):
+    """
+    LRU cache of rendered text keyed by (text, font, left edge), the left edge being
+    where writetextaligned() put the text in its box.  Entries hold the clipped column
+    bytes of each page row.  budget bounds the total number of cached column bytes.
+    """
+
+    def __init__(self, budget=16384):
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses = self.misses + 1
+            return None
+        self.hits = self.hits + 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        entrysize = sum(len(row) for row in entry[1])
+        if entrysize > self.budget:
+            return
+        self.entries[key] = entry
+        self.size = self.size + entrysize
+        self.trim()
+
+    def resize(self, budget):
+        self.budget = budget
+        self.trim()
+
+    def trim(self):
+        while self.size > self.budget:
+            _, stale = self.entries.popitem(last=False)
+            self.size = self.size - sum(len(row) for row in stale[1])
+            self.evictions = self.evictions + 1
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.entries), "bytes": self.size, "budget": self.budget}
+
+
+textcache = TextCache()
+
+
+def rendertext(textdata, x, font):
+    """
+    Render text starting at column x into one bytes object per page row, clipped to
+    the screen width.  Returns (startx, rows).
+    """
+    rows = [bytearray() for _ in range(font.numfontrow)]
+    fontbytes = font.fontbytes
+    rowstride = font.rowstride
+    textwidth = 0
+    for ch in textdata:
+        code = ord(ch) & 0xFF
+        fontoffset = font.offsets[code]
+        advance = font.advances[code]
+        for fontrow in range(font.numfontrow):
+            start = fontoffset + rowstride*fontrow
+            rows[fontrow] += fontbytes[start:start+advance]
+        textwidth = textwidth + advance
+
+    skip = 0
+    if x < 0:
+        skip = -x
+        x = 0
+    width = max(0, min(textwidth - skip, WD - x))
+    return (x, tuple(bytes(row[skip:skip+width]) for row in rows))
+
+
+def blittext(entry, y, mode=0):
+    """
+    Copy a rendertext() result to page aligned row y, one slice per page in mode 0.
+    """
+    startx, rows = entry
+    page = y >> 3
+    for row in rows:
+        if page >= (HT >> 3):
+            break
+        bufferoffset = WD*page + startx
+        if mode == 0:
+            imagebuffer[bufferoffset:bufferoffset+len(row)] = row
+        else:
+            for bytevalue in row:
+                if mode == 1:
+                    imagebuffer[bufferoffset] = bytevalue ^ imagebuffer[bufferoffset]
+                else:
+                    imagebuffer[bufferoffset] = bytevalue | imagebuffer[bufferoffset]
+                bufferoffset = bufferoffset + 1
+        page = page + 1
+
+
+def shiftwritetext(textdata, x, y, font, mode=0):
+    """
+    Draw text that does not start on a page boundary.  Each glyph column is split
+    over numfontrow+1 pages with precomputed bytes and masks, so drawing is one
+    AND/OR per page instead of one writebuffer() call per pixel.
+    """
+    shift = y & 0x7
+    masks = font.shiftmasks(shift)
+    pagecount = min(len(masks), (HT >> 3) - (y >> 3))
+    pageoffset = WD*(y >> 3)
+    for ch in textdata:
+        if x >= WD:
+            break
+        for column in font.shiftedglyph(ord(ch) & 0xFF, shift):
+            if x >= WD:
+                break
+            if x >= 0:
+                bufferoffset = pageoffset + x
+                page = 0
+                while page < pagecount:
+                    if mode == 0:
+                        imagebuffer[bufferoffset] = imagebuffer[bufferoffset] & (0xFF ^ masks[page]) | column[page]
+                    elif mode == 1:
+                        imagebuffer[bufferoffset] = imagebuffer[bufferoffset] ^ column[page]
+                    else:
+                        imagebuffer[bufferoffset] = imagebuffer[bufferoffset] | column[page]
+                    bufferoffset = bufferoffset + WD
+                    page = page + 1
             x = x + 1
-        ctr = ctr + 1
-    return
 
 
 def power(turnon=True):
@@ -277,17 +565,97 @@ def power(turnon=True):
     if turnon == True:
         cmd = cmd | 1
     try:
-        bus.write_byte_data(ADDR_OLED, 0, cmd)
+        backend().write_byte_data(ADDR_OLED, 0, cmd)
     except:
         return
 
 
+#
+# Hardware scrolling.  The controller scrolls whole page rows by itself once set up, so
+# an animation costs a handful of command bytes instead of a frame per step.  Scrolling
+# always covers the full width of the pages, and the display RAM must be rewritten
+# after it is stopped.
+#
+
+SCROLL_RIGHT = 0x26
+SCROLL_LEFT = 0x27
+SCROLL_VERTICAL_RIGHT = 0x29
+SCROLL_VERTICAL_LEFT = 0x2A
+SCROLL_AREA = 0xA3
+SCROLL_STOP = 0x2E
+SCROLL_START = 0x2F
+
+# Scroll step interval codes, in frames per step
+SCROLL_FRAMES = {2: 0x7, 3: 0x4, 4: 0x5, 5: 0x0, 25: 0x6, 64: 0x1, 128: 0x2, 256: 0x3}
+
+scrolling = False
+
+
+def scrollcommands(startpage, endpage, left=True, frames=5, vertical=0):
+    """
+    Command bytes that scroll pages startpage..endpage one column every frames frames
+    (2, 3, 4, 5, 25, 64, 128 or 256), and also up by vertical rows per step if given.
+    Send them with sendcommands() or attach them to a frame with submitframe().
+    """
+    interval = SCROLL_FRAMES.get(frames, 0x0)
+    if vertical:
+        cmd = [SCROLL_VERTICAL_LEFT if left else SCROLL_VERTICAL_RIGHT,
+               0x00, startpage & 0x7, interval, endpage & 0x7, vertical & 0x3F]
+    else:
+        cmd = [SCROLL_LEFT if left else SCROLL_RIGHT,
+               0x00, startpage & 0x7, interval, endpage & 0x7, 0x00, 0xFF]
+    return cmd + [SCROLL_START]
+
+
+def scrollareacommands(toprows, rows):
+    """
+    Command bytes that limit vertical scrolling to rows rows below toprows fixed rows.
+    """
+    return [SCROLL_AREA, toprows & 0x3F, rows & 0x7F]
+
+
+def sendcommands(commands):
+    global scrolling
+    try:
+        bus = backend()
+        for cmd in commands:
+            bus.write_byte_data(ADDR_OLED, 0, cmd)
+            if cmd == SCROLL_START:
+                scrolling = True
+            elif cmd == SCROLL_STOP:
+                scrolling = False
+    except:
+        return
+
+
+def stopscroll():
+    """
+    Stop any hardware scrolling.  The scrolled display RAM needs to be rewritten.
+    """
+    if scrolling:
+        sendcommands([SCROLL_STOP])
+
+
+def marquee(textdata, y, charwd=6, frames=5):
+    """
+    Draw textdata from the left edge of page aligned row y and return the commands that
+    scroll its pages to the left.  Everything else drawn on those pages scrolls along.
+    """
+    font = loadfont(charwd)
+    if font is None:
+        return None
+    writetext(textdata, 0, y, font)
+    startpage = y >> 3
+    endpage = min(startpage + font.numfontrow, HT >> 3) - 1
+    return scrollcommands(startpage, endpage, True, frames)
+
+
 def inverse(enable=True):
     cmd = 0xA6
     if enable == True:
         cmd = cmd | 1
     try:
-        bus.write_byte_data(ADDR_OLED, 0, cmd)
+        backend().write_byte_data(ADDR_OLED, 0, cmd)
     except:
         return
 
@@ -297,13 +665,14 @@ def fullwhite(enable=True):
     if enable == True:
         cmd = cmd | 1
     try:
-        bus.write_byte_data(ADDR_OLED, 0, cmd)
+        backend().write_byte_data(ADDR_OLED, 0, cmd)
     except:
         return
 
 
 def reset():
     try:
+        bus = backend()
         # Set COM-H Addressing
         bus.write_byte_data(ADDR_OLED, 0, 0x20)
         bus.write_byte_data(ADDR_OLED, 0, 0x1)
@@ -328,3 +697,194 @@ def reset():
         bus.write_byte_data(ADDR_OLED, 0, 0x40)
     except:
         return
+
+
+#
+# Output worker.  Frame transfers run on a dedicated thread so a full flush (or a
+# bus error) never stalls the asyncio loop that renders the frames.  The mailbox
+# holds a single job: submitting a new frame replaces one that has not been sent.
+# A frame identical to the one on the panel, animation included, is not sent again.
+#
+
+class _OutputJob(object):
+    def __init__(self, frame, hidescreen, blank, animation=None):
+        from asyncio import get_running_loop
+
+        self.frame = frame
+        self.hidescreen = hidescreen
+        self.blank = blank
+        self.animation = animation
+        self.loop = get_running_loop()
+        self.future = self.loop.create_future()
+
+    def same(self, other):
+        """
+        True if sending this job would leave the panel as other left it.
+        """
+        return (other is not None and not self.blank and not other.blank and
+                self.animation == other.animation and self.frame == other.frame)
+
+    def run(self):
+        """
+        Returns True if the panel now shows the frame.
+        """
+        if self.blank:
+            # Same sequence as fill(0), reset(), power(False)
+            flushimage(True, self.frame)
+            reset()
+            power(False)
+            return False
+        power(True)
+        sent = flushimage(self.hidescreen, self.frame)
+        reset()
+        if self.animation:
+            sendcommands(self.animation)
+        return sent
+
+    def resolve(self, sent):
+        def setresult():
+            if not self.future.done():
+                self.future.set_result(sent)
+        try:
+            self.loop.call_soon_threadsafe(setresult)
+        except RuntimeError:
+            # Loop already closed, nobody is waiting anymore
+            pass
+
+
+class OutputWorker(object):
+    """
+    Owns the OLED output thread and its single slot "latest frame wins" mailbox.
+    """
+
+    def __init__(self):
+        self._cond = Condition()
+        self._pending = None
+        self._running = False
+        self._thread = None
+        self._onpanel = None
+        self.submitted = 0
+        self.transmitted = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._running = True
+            self._thread = Thread(target=self._run, name='oled-output', daemon=True)
+            self._thread.start()
+
+    def post(self, job):
+        self.start()
+        with self._cond:
+            stale = self._pending
+            self._pending = job
+            self.submitted = self.submitted + 1
+            if stale is not None:
+                self.dropped = self.dropped + 1
+            self._cond.notify()
+        if stale is not None:
+            stale.resolve(False)
+
+    def stop(self):
+        """
+        Send whatever is still in the mailbox, then end the output thread.  Blocks.
+        """
+        with self._cond:
+            thread = self._thread
+            self._running = False
+            self._cond.notify()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._thread = None
+        # The caller drives the panel directly from here on
+        self.forget()
+
+    def forget(self):
+        """
+        Send the next frame even if it matches the last one sent.
+        """
+        with self._cond:
+            self._onpanel = None
+
+    def stats(self):
+        with self._cond:
+            return {"submitted": self.submitted, "transmitted": self.transmitted,
+                    "dropped": self.dropped, "skipped": self.skipped}
+
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            # Should it die, the next post() starts another
+            with self._cond:
+                if self._thread is current_thread():
+                    self._thread = None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._running:
+                    self._cond.wait()
+                job = self._pending
+                self._pending = None
+                if job is None:
+                    return
+                skip = job.same(self._onpanel)
+                if skip:
+                    self.skipped = self.skipped + 1
+            if skip:
+                job.resolve(True)
+                continue
+            ran = False
+            try:
+                with timing.timed("oled flush"):
+                    ran = job.run()
+            except Exception as error:
+                log.error("OLED output failed: %s", error)
+            finally:
+                with self._cond:
+                    self.transmitted = self.transmitted + 1
+                    self._onpanel = job if ran else None
+                job.resolve(ran)
+
+
+worker = OutputWorker()
+
+
+def submitframe(hidescreen=True, animation=None, frame=None) -> "Future":
+    """
+    Hand a snapshot of the image buffer (or frame, a snapshot taken earlier) to the
+    output thread and return at once.  The returned future resolves to True once the
+    frame is on the panel (nothing is sent if it already was), or False if a newer frame
+    replaced it first or sending it failed.  animation is a list of command bytes, e.g. from marquee(), sent
+    after the frame.  Must be called from the event loop.
+    """
+    if frame is None:
+        frame = list(imagebuffer)
+    job = _OutputJob(frame, hidescreen, False, animation)
+    worker.post(job)
+    return job.future
+
+
+def submitblank() -> "Future":
+    """
+    Blank and power off the panel from the output thread (screen saver).  The returned
+    future resolves to False once that is done, as no frame is on the panel.
+    """
+    job = _OutputJob([0] * BUFFERSIZE, True, True)
+    worker.post(job)
+    return job.future
+
+
+async def stopoutput():
+    """
+    Wait for the output thread to send its last frame and exit, so the caller can
+    talk to the panel directly again.
+    """
+    from asyncio import to_thread
+
+    await to_thread(worker.stop)
@@ -7,6 +7,7 @@
 # Power button events are sent as a pulse signal to BCM Pin 4 (BOARD P7).
 # A pulse width of 20-30ms indicates reboot request (double-tap).
 # A pulse width of 40-50ms indicates shutdown request (hold and release after 3 secs).
+# A pulse width of 60-70ms switches the OLED screen.  See button.py.
 #
 # Additional comments are found in each function below.
 #
@@ -16,95 +17,77 @@
 #  * recalbox: Runs as service via /etc/init.d/
 #
 
-import queue
 import time
-from asyncio import (AbstractEventLoop, CancelledError, Future, Queue,
-                     create_task, gather, get_running_loop, sleep)
 from os.path import join
-from signal import SIGINT, SIGTERM
-from threading import Event, Thread
-from typing import Coroutine
-
-import RPi.GPIO as GPIO
-import smbus2 as smbus
+from typing import TYPE_CHECKING, Coroutine, NamedTuple, Optional
 
 from . import logging as log
-from . import oled, sysinfo
+from . import button, sysinfo, timing
 from .cli import Cli
 from .config import (CONFIG_DIR, loadCPUFanConfig, loadDebugMode,
-                     loadHDDFanConfig, loadOLEDConfig, loadTempConfig)
+                     loadHDDFanConfig, loadMetricsConfig, loadOLEDConfig)
+from .hardware import ADDR_FAN, busclient, busstats, gpio
 from .version import ARGON_VERSION
 
-# Initialize I2C Bus
-rev = GPIO.RPI_REVISION
-if rev == 2 or rev == 3:
-    bus = smbus.SMBus(1)
-else:
-    bus = smbus.SMBus(0)
+if TYPE_CHECKING:
+    from asyncio import Queue
+
+# asyncio and the modules only the service uses (collectors, history, metrics,
+# profiler, screens) are imported where they are used, so the quick commands
+# don't load them.
+
+# I2C Bus, opened by the first transaction
+bus = busclient("fan")
 
 CONFIG_FILE = join(CONFIG_DIR, 'eon.conf')
 OLED_ENABLED = False
 
 try:
-    import datetime
-
     from . import oled
     OLED_ENABLED = True
 except Exception as e:
     pass
 
-#
-# Enable debug logging if requested
-#
-log.enable(loadDebugMode())
-
-ADDR_FAN = 0x1a
 PIN_SHUTDOWN = 4
 
-GPIO.setwarnings(False)
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(PIN_SHUTDOWN, GPIO.IN,  pull_up_down=GPIO.PUD_DOWN)
-
 
-def pulse_loop(pulses: Queue, loop: AbstractEventLoop):
+async def shutdown_check(writeq: "Queue", pins=None, clock=time.monotonic_ns):
     """
-    pulse_loop emits pulse times in centiseconds on a queue. Runs forever.
+    This function is the task that monitors activity in our shutdown pin
+    The pulse width is measured by a button.PulseDecoder on the GPIO callback thread,
+    and the corresponding shell command will be issued.  pins defaults to RPi.GPIO.
     """
-    while True:
-        pulsetime = 1
-        GPIO.wait_for_edge(PIN_SHUTDOWN, GPIO.RISING)
-        time.sleep(0.01)
-        while GPIO.input(PIN_SHUTDOWN) == GPIO.HIGH:
-            time.sleep(0.01)
-            pulsetime += 1
-        loop.call_soon_threadsafe(pulses.put_nowait, pulsetime)
+    from asyncio import Queue, get_running_loop
 
+    if pins is None:
+        pins = gpio()
+    pins.setup(PIN_SHUTDOWN, pins.IN, pull_up_down=pins.PUD_DOWN)
 
-async def shutdown_check(writeq: Queue):
-    """
-    This function is the thread that monitors activity in our shutdown pin
-    The pulse width is measured, and the corresponding shell command will be issued
-    """
     loop = get_running_loop()
-    pulses = Queue(1)
-    Thread(target=pulse_loop, args=(pulses, loop), daemon=True).start()
+    events = Queue()
+
+    def deliver(event, widthns):
+        loop.call_soon_threadsafe(events.put_nowait, event)
 
+    decoder = button.PulseDecoder(pins, PIN_SHUTDOWN, deliver, clock)
+    decoder.start()
     try:
         while True:
-            log.debug('shutdown_check: get pulse time')
-            pulsetime = await pulses.get()
-            log.debug('shutdown_check: got pulse time %d', pulsetime)
-            if pulsetime >= 2 and pulsetime <= 3:
+            log.debug('shutdown_check: get button event')
+            event = await events.get()
+            log.debug('shutdown_check: got button event %s', event)
+            if event == button.REBOOT:
                 await writeq.put("OLEDSTOP")
                 log.debug('os.system("reboot")')
                 break
-            elif pulsetime >= 4 and pulsetime <= 5:
+            elif event == button.SHUTDOWN:
                 await writeq.put("OLEDSTOP")
                 log.debug('os.system("shutdown now -h")')
                 break
-            elif pulsetime >= 6 and pulsetime <= 7:
+            elif event == button.SWITCH:
                 await writeq.put("OLEDSWITCH")
     finally:
+        decoder.stop()
         log.debug('shutdown_check finally')
 
 
@@ -144,6 +127,8 @@ async def setFanSpeed(overrideSpeed: int = None, instantaneous: bool = True):
     an instantaneous change.  Some hardware does not like the sudden change, it wants the
     speed set to 100% THEN changed to the new value.  Not really sure why this is.
     """
+    from asyncio import TimeoutError, sleep
+
     prevspeed = sysinfo.get_current_fan_speed()
     if not prevspeed:
         prevspeed = 0
@@ -152,7 +137,19 @@ async def setFanSpeed(overrideSpeed: int = None, instantaneous: bool = True):
     if overrideSpeed is not None:
         newspeed = overrideSpeed
     else:
-        newspeed = max([get_fanspeed(sysinfo.get_cpu_temp(), loadCPUFanConfig()), get_fanspeed(sysinfo.get_max_hdd_temp(), loadHDDFanConfig())
+        from . import collectors, metrics
+
+        try:
+            # Timed apart from the pauses below, which are deliberate
+            with timing.timed("fan temperatures"):
+                cputemp = await collectors.collect("cpu temp", sysinfo.get_cpu_temp)
+                hddtemp = await collectors.collect("hdd temp", sysinfo.get_max_hdd_temp, timeout=sysinfo.HDDTEMP_TIMEOUT)
+        except TimeoutError:
+            # Keep the fan as it is until the temperatures can be read again
+            return prevspeed
+        metrics.record("argon_cpu_temperature_celsius", cputemp)
+        metrics.record("argon_hdd_temperature_celsius", hddtemp)
+        newspeed = max([get_fanspeed(cputemp, loadCPUFanConfig()), get_fanspeed(hddtemp, loadHDDFanConfig())
                         ]
                        )
         if newspeed < prevspeed and not instantaneous:
@@ -181,13 +178,15 @@ async def temp_check():
     Main thread for processing the temperature check functonality.  We just try and set the fan speed once
     a minute.  However we do want to start with the fan *OFF*.
     """
-    await setFanOff()
+    from . import metrics
+
+    metrics.record("argon_fan_duty_percent", await setFanOff())
     try:
         while True:
-            await setFanSpeed(instantaneous=False)
-            await sleep(60)
+            metrics.record("argon_fan_duty_percent", await setFanSpeed(instantaneous=False))
+            await timing.sleep(60)
     except Exception as e:
-        log.debug('temp_check exception', e)
+        log.debug('temp_check exception %s', e)
         raise e
     finally:
         log.debug('temp_check finally')
@@ -197,45 +196,127 @@ async def temp_check():
 #
 
 
-async def display_loop(readq: Queue):
+async def display_loop(readq: "Queue"):
+    from asyncio import create_task
+
+    from . import history
+
+    # Metric history for the graphs on the screens
+    sampling = create_task(history.sample_loop())
     try:
         await _display_loop(readq)
     except Exception as e:
-        log.debug('display_loop exception', e)
+        log.debug('display_loop exception %s', e)
         raise e
     finally:
         log.debug('display_loop finally')
+        sampling.cancel()
+        await oled.stopoutput()
         oled.fill(0)
         oled.reset()
         oled.power(False)
 
 
-async def _display_loop(readq: Queue):
-    weekdaynamelist = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-    monthlist = ["JAN", "FEB", "MAR", "APR", "MAY",
-                 "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
-    oledscreenwidth = oled.getmaxX()
+class Messages(object):
+    """
+    Reads the display loop's queue with a get() that stays pending between waits, so
+    the queue can be waited on together with timers and other tasks without losing a
+    message.
+    """
+
+    def __init__(self, readq: "Queue"):
+        self.readq = readq
+        self.getter = None
+
+    async def get(self, timeout=None, *tasks):
+        """
+        The next message, or "" if timeout seconds passed or one of tasks finished first.
+        """
+        from asyncio import FIRST_COMPLETED, create_task, wait
+
+        if self.getter is None:
+            self.getter = create_task(self.readq.get())
+        done, _ = await wait({self.getter, *tasks}, timeout=timeout, return_when=FIRST_COMPLETED)
+        if self.getter not in done:
+            return ""
+        qdata = self.getter.result()
+        self.getter = None
+        return qdata
+
+    async def complete(self, task):
+        """
+        Wait for task to finish.  Returns False, cancelling task, if OLEDSTOP arrives
+        first.  Switch requests meanwhile are dropped, a switch is under way already.
+        """
+        while not task.done():
+            if await self.get(None, task) == "OLEDSTOP":
+                task.cancel()
+                return False
+        return True
+
+    def close(self):
+        if self.getter is not None:
+            self.getter.cancel()
+
+
+class PreparedScreen(NamedTuple):
+    """
+    A page drawn ahead of time: frame is an image buffer snapshot, or None if the
+    screen is to be drawn when it is due.
+    """
+    screenid: int
+    pages: list
+    frame: Optional[list]
+    animation: Optional[list]
+
 
-    fontwdSml = 6    # Maps to 6x8
-    fontwdReg = 8    # Maps to 8x16
-    stdleftoffset = 54
+async def prepare_screen(screenenabled, screendata, screenid, pages, advance=True, background=False):
+    """
+    Draw the page that follows: the first of pages, else the first page of the next
+    screen after screenid (or screenid itself if not advance) that has anything to show.
+    Collectors run on the collector pool.  In the background, screens that are not
+    prefetched are left undrawn.  Returns None if no screen has anything to show.
+    """
+    from asyncio import TimeoutError
 
-    temperature = "C"
-    temperature = loadTempConfig()
+    from . import collectors, screens
+
+    tries = 0
+    while True:
+        if len(pages) == 0:
+            if tries >= len(screenenabled):
+                return None
+            tries = tries + 1
+            if advance:
+                screenid = (screenid + 1) % len(screenenabled)
+            advance = True
+            name = screenenabled[screenid]
+            if background and not screens.registry[name].prefetch:
+                return PreparedScreen(screenid, [], None, None)
+            try:
+                pages = await collectors.collect("%s screen" % name, screendata.pages, name,
+                                                 timeout=screens.registry[name].timeout)
+            except TimeoutError:
+                pages = []
+            continue
+
+        name = screenenabled[screenid]
+        try:
+            with timing.timed("render " + name):
+                animation = screens.draw(name, pages[0])
+            return PreparedScreen(screenid, pages[1:], list(oled.imagebuffer), animation)
+        except Exception:
+            log.error("Error processing information for %s display", name.upper())
+            # Next page due to error/no data
+            pages = []
 
-    print("Temperature config is " + temperature)
-    screensavermode = False
-    screensaversec = 120
-    screensaverctr = 0
 
+async def _display_loop(readq: "Queue"):
+    from . import screens
+
+    screensaversec = 120
     screenenabled = ["clock", "ip"]
-    prevscreen = ""
-    curscreen = ""
-    screenid = 0
     screenjogtime = 0
-    screenjogflag = 0  # start with screenid 0
-    cpuusagelist = []
-    curlist = []
 
     tmpconfig = loadOLEDConfig()
 
@@ -245,399 +326,147 @@ async def _display_loop(readq: Queue):
         screenjogtime = int(tmpconfig["screenduration"])
     if "screenlist" in tmpconfig:
         screenenabled = tmpconfig["screenlist"].replace("\"", "").split(" ")
+    if "screenmodules" in tmpconfig:
+        screens.loadmodules(tmpconfig["screenmodules"].split())
+    if "smallfont" in tmpconfig or "regularfont" in tmpconfig:
+        screens.loadfonts(tmpconfig.get("smallfont"), tmpconfig.get("regularfont"))
 
     if "enabled" in tmpconfig:
         if tmpconfig["enabled"] == "N":
             screenenabled = []
 
-    #
-    # Setup some variables to help calculate bandwidth
-    #
-    timespan = 1
-    prevData = sysinfo.disk_usage()
-    prevTime = time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+    for name in screenenabled:
+        if name not in screens.registry:
+            log.error("Unknown OLED screen %s", name)
+    screenenabled = [name for name in screenenabled if name in screens.registry]
+    if len(screenenabled) == 0:
+        return
+
+    screendata = screens.ScreenData()
+    messages = Messages(readq)
+    try:
+        await _show_screens(screenenabled, screendata, messages, screenjogtime, screensaversec)
+    finally:
+        messages.close()
+
+
+async def _show_screens(screenenabled, screendata, messages, screenjogtime, screensaversec):
+    from asyncio import create_task
 
-    while len(screenenabled) > 0:
-        if len(curlist) == 0 and screenjogflag == 1:
+    from . import collectors, history, screens
+
+    screensavermode = False
+    screensaverstart = time.monotonic()
+    prevscreen = ""
+    curscreen = ""
+    screenid = 0
+    screenjogflag = 0  # start with screenid 0
+    curpages = []
+
+    async def prepare(screenid, pages, advance=True):
+        task = create_task(prepare_screen(screenenabled, screendata, screenid, pages, advance))
+        if not await messages.complete(task):
+            return False, None
+        return True, task.result()
+
+    running, prepared = await prepare(screenid, [], advance=False)
+
+    while running:
+        if prepared is None:
+            # Nothing to show, try again later
+            if await messages.get(1) == "OLEDSTOP":
+                return
+            running, prepared = await prepare(screenid, [], advance=False)
+            continue
+        if prepared.frame is None:
+            running, prepared = await prepare(prepared.screenid, [], advance=False)
+            continue
+
+        if len(curpages) == 0 and screenjogflag == 1:
             # Reset Screen Saver
             screensavermode = False
-            screensaverctr = 0
-
-            # Update screen info
-            screenid = screenid + 1
-            if screenid >= len(screenenabled):
-                screenid = 0
-        prevscreen = curscreen
+            screensaverstart = time.monotonic()
+            if prepared.screenid <= screenid:
+                log.debug('OLED text cache %s, output %s, collectors %s, bus %s',
+                          log.lazy(oled.textcache.stats), log.lazy(oled.worker.stats),
+                          log.lazy(collectors.pool.stats), log.lazy(busstats))
+
+        screenid = prepared.screenid
+        curpages = prepared.pages
         curscreen = screenenabled[screenid]
 
-        print(curscreen)
+        log.debug('Showing %s', curscreen)
         if screenjogtime == 0:
             # Resets jogflag (if switched manually)
             screenjogflag = 0
         else:
             screenjogflag = 1
 
-        needsUpdate = False
-        if curscreen == "cpu":
-            # CPU Usage
-            if len(curlist) == 0:
-                try:
-                    if len(cpuusagelist) == 0:
-                        cpuusagelist = sysinfo.list_cpu_usage()
-                    curlist = cpuusagelist
-                except:
-                    log.error("Error processing information for CPU display")
-                    curlist = []
-            if len(curlist) > 0:
-                oled.loadbg("bgcpu")
-
-                # Display List
-                yoffset = 0
-                tmpmax = 4
-                while tmpmax > 0 and len(curlist) > 0:
-                    curline = ""
-                    tmpitem = curlist.pop(0)
-                    curline = tmpitem["title"]+": "+str(tmpitem["value"])+"%"
-                    oled.writetext(curline, stdleftoffset, yoffset, fontwdSml)
-                    oled.drawfilledrectangle(
-                        stdleftoffset, yoffset+12, int((oledscreenwidth-stdleftoffset-4)*tmpitem["value"]/100), 2)
-                    tmpmax = tmpmax - 1
-                    yoffset = yoffset + 16
-
-                needsUpdate = True
-            else:
-                # Next page due to error/no data
-                screenjogflag = 1
-        elif curscreen == "storage":
-            # Storage Info
-            if len(curlist) == 0:
-                try:
-                    tmpobj = sysinfo.list_hdd_usage()
-                    for curdev in tmpobj:
-                        curlist.append({"title": curdev, "value": sysinfo.kb_str(
-                            tmpobj[curdev]['total']), "usage": int(tmpobj[curdev]['percent'])})
-                except:
-                    log.error("Error processing information for STORAGE display")
-                    curlist = []
-            if len(curlist) > 0:
-                oled.loadbg("bgstorage")
-
-                yoffset = 16
-                tmpmax = 3
-                while tmpmax > 0 and len(curlist) > 0:
-                    tmpitem = curlist.pop(0)
-                    # Right column first, safer to overwrite white space
-                    oled.writetextaligned(
-                        tmpitem["value"], 77, yoffset, oledscreenwidth-77, 2, fontwdSml)
-                    oled.writetextaligned(
-                        str(tmpitem["usage"])+"%", 50, yoffset, 74-50, 2, fontwdSml)
-                    tmpname = tmpitem["title"]
-                    if len(tmpname) > 8:
-                        tmpname = tmpname[0:8]
-                    oled.writetext(tmpname, 0, yoffset, fontwdSml)
-
-                    tmpmax = tmpmax - 1
-                    yoffset = yoffset + 16
-                needsUpdate = True
-            else:
-                # Next page due to error/no data
-                screenjogflag = 1
-
-        elif curscreen == "bandwidth":
-            # Bandwidth info
-            if len(curlist) == 0:
-                try:
-                    diskdata = sysinfo.disk_usage()
-                    for istop in diskdata:
-                        for istart in prevData:
-                            if istop['disk'] == istart['disk']:
-                                istart['readsector'] = istop['readsector'] - \
-                                    istart['readsector']
-                                istart['writesector'] = istop['writesector'] - \
-                                    istart['writesector']
-                    curlist = prevData
-                    prevData = diskdata
-                    stoptime = time.clock_gettime_ns(time.CLOCK_MONOTONIC)
-                    timespan = (stoptime - prevTime)/1000000000
-                    prevTime = stoptime
-                except:
-                    log.error("Error processing data for BANDWIDTH display")
-                    curlist = []
-            if len(curlist) > 0:
-
-                oled.clearbuffer()
-                oled.writetextaligned(
-                    "BANDWIDTH", 0, 0, oledscreenwidth, 1, fontwdSml)
-                oled.writetextaligned(
-                    "Write", 77, 16, oledscreenwidth-77, 2, fontwdSml)
-                oled.writetextaligned(
-                    "Read",  50, 16, 74-50,              2, fontwdSml)
-                oled.writetext("Device", 0, 16, fontwdSml)
-
-                itemcount = 2
-                yoffset = 32
-                while itemcount > 0 and len(curlist) > 0:
-                    item = curlist.pop(0)
-                    bandwidth = int((item['writesector']/2)/timespan)
-                    oled.writetextaligned(sysinfo.kb_str(
-                        bandwidth), 77, yoffset, oledscreenwidth-77, 2, fontwdSml)
-                    bandwidth = int((item['readsector']/2)/timespan)
-                    oled.writetextaligned(sysinfo.kb_str(
-                        bandwidth), 50, yoffset, 74-50, 2, fontwdSml)
-                    oled.writetext(item['disk'], 0, yoffset, fontwdSml)
-                    itemcount = itemcount - 1
-                    yoffset = yoffset + 16
-
-                needsUpdate = True
-            else:
-                # Next Page due to error/no data
-                screenjogFlag = 1
-
-        elif curscreen == "raid":
-            # Raid Info
-            if len(curlist) == 0:
-                try:
-                    tmpobj = sysinfo.list_raid()
-                    curlist = tmpobj['raidlist']
-                except:
-                    log.error("Error processing display of RAID information.")
-                    curlist = []
-            if len(curlist) > 0:
-                oled.loadbg("bgraid")
-                tmpitem = curlist.pop(0)
-                oled.writetextaligned(
-                    tmpitem["title"], 0, 0, stdleftoffset, 1, fontwdSml)
-                oled.writetextaligned(
-                    tmpitem["value"], 0, 8, stdleftoffset, 1, fontwdSml)
-                oled.writetextaligned(sysinfo.kb_str(
-                    tmpitem["info"]["size"]), 0, 56, stdleftoffset, 1, fontwdSml)
-                rebuild = tmpitem['info']['resync']
-                statusList = tmpitem['info']['state'].split(", ")
-                if len(statusList) == 1:
-                    status = statusList[0]
-                if len(statusList) == 2:
-                    status = statusList[1]
-                if len(statusList) >= 3:
-                    status = statusList[2]
-                status = status.capitalize()
-                oled.writetext(status, stdleftoffset, 8, fontwdSml)
-                if len(rebuild) > 0:
-                    percent = rebuild.split(" ")
-                    if status.lower() == "checking":
-                        label = "Progess: "
-                    else:
-                        label = "Rebuild: "
-                    oled.writetext(
-                        label + percent[0], stdleftoffset, 16, fontwdSml)
-                oled.writetext("Active:"+str(int(tmpitem["info"]["active"]))+"/"+str(
-                    int(tmpitem["info"]["devices"])), stdleftoffset, 32, fontwdSml)
-                oled.writetext("Working:"+str(int(tmpitem["info"]["working"]))+"/"+str(
-                    int(tmpitem["info"]["devices"])), stdleftoffset, 40, fontwdSml)
-                oled.writetext("Failed:"+str(int(tmpitem["info"]["failed"]))+"/"+str(
-                    int(tmpitem["info"]["devices"])), stdleftoffset, 48, fontwdSml)
-                needsUpdate = True
-            else:
-                # Next page due to error/no data
-                screenjogflag = 1
-
-        elif curscreen == "ram":
-            # RAM
-            try:
-                oled.loadbg("bgram")
-                tmpraminfo = sysinfo.get_ram()
-                oled.writetextaligned(
-                    tmpraminfo[0], stdleftoffset, 8, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-                oled.writetextaligned(
-                    "of", stdleftoffset, 24, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-                oled.writetextaligned(
-                    tmpraminfo[1], stdleftoffset, 40, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-                needsUpdate = True
-            except:
-                log.error("Error processing information for RAM display")
-                needsUpdate = False
-                # Next page due to error/no data
-                screenjogflag = 1
-        elif curscreen == "temp":
-            # Temp
-            try:
-                oled.loadbg("bgtemp")
-                hddtempctr = 0
-                maxcval = 0
-                mincval = 200
-
-                # Get min/max of hdd temp
-                hddtempobj = sysinfo.get_hdd_temp()
-                for curdev in hddtempobj:
-                    if hddtempobj[curdev] < mincval:
-                        mincval = hddtempobj[curdev]
-                    if hddtempobj[curdev] > maxcval:
-                        maxcval = hddtempobj[curdev]
-                    hddtempctr = hddtempctr + 1
-
-                cpucval = sysinfo.get_cpu_temp()
-                if hddtempctr > 0:
-                    alltempobj = {"cpu": cpucval,
-                                  "hdd min": mincval, "hdd max": maxcval}
-                    # Update max C val to CPU Temp if necessary
-                    if maxcval < cpucval:
-                        maxcval = cpucval
-
-                    displayrowht = 8
-                    displayrow = 8
-                    for curdev in alltempobj:
-                        if temperature == "C":
-                            # Celsius
-                            tmpstr = str(alltempobj[curdev])
-                            if len(tmpstr) > 4:
-                                tmpstr = tmpstr[0:4]
-                        else:
-                            # Fahrenheit
-                            tmpstr = str(32+9*(alltempobj[curdev])/5)
-                            if len(tmpstr) > 5:
-                                tmpstr = tmpstr[0:5]
-                        if len(curdev) <= 3:
-                            oled.writetext(curdev.upper(
-                            )+": " + tmpstr + chr(167) + temperature, stdleftoffset, displayrow, fontwdSml)
-
-                        else:
-                            oled.writetext(curdev.upper()+":",
-                                           stdleftoffset, displayrow, fontwdSml)
-
-                            oled.writetext("     " + tmpstr + chr(167) + temperature,
-                                           stdleftoffset, displayrow+displayrowht, fontwdSml)
-                        displayrow = displayrow + displayrowht*2
-                else:
-                    maxcval = cpucval
-                    if temperature == "C":
-                        # Celsius
-                        tmpstr = str(cpucval)
-                        if len(tmpstr) > 4:
-                            tmpstr = tmpstr[0:4]
-                    else:
-                        # Fahrenheit
-                        tmpstr = str(32+9*(cpucval)/5)
-                        if len(tmpstr) > 5:
-                            tmpstr = tmpstr[0:5]
-
-                    oled.writetextaligned(
-                        tmpstr + chr(167) + temperature, stdleftoffset, 24, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-
-                # Temperature Bar: 40C is min, 80C is max
-                maxht = 21
-                barht = int(maxht*(maxcval-40)/40)
-                if barht > maxht:
-                    barht = maxht
-                elif barht < 1:
-                    barht = 1
-                oled.drawfilledrectangle(24, 20+(maxht-barht), 3, barht, 2)
-
-                needsUpdate = True
-            except:
-                log.error("Error processing temerature information for TEMP display")
-                needsUpdate = False
-                # Next page due to error/no data
-                screenjogflag = 1
-        elif curscreen == "ip":
-            # IP Address
-            try:
-                if len(curlist) == 0:
-                    curlist = sysinfo.get_ip_list()
-            except:
-                log.error("Error processing information for IP display")
-                curlist = []
-
-            if len(curlist) > 0:
-                item = curlist.pop(0)
-                oled.loadbg("bgip")
-                oled.writetextaligned(
-                    item[0], 0, 0, oledscreenwidth, 1, fontwdReg)
-                oled.writetextaligned(
-                    item[1], 0, 16, oledscreenwidth, 1, fontwdReg)
-                needsUpdate = True
-            else:
-                needsUpdate = False
-                # Next page due to error/no data
-                screenjogflag = 1
-        else:
-            try:
-                oled.loadbg("bgtime")
-                # Date and Time HH:MM
-                curtime = datetime.datetime.now()
-
-                # Month/Day
-                outstr = str(curtime.day).strip()
-                if len(outstr) < 2:
-                    outstr = " "+outstr
-                outstr = monthlist[curtime.month-1]+outstr
-                oled.writetextaligned(
-                    outstr, stdleftoffset, 8, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-
-                # Day of Week
-                oled.writetextaligned(weekdaynamelist[curtime.weekday(
-                )], stdleftoffset, 24, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-
-                # Time
-                outstr = str(curtime.minute).strip()
-                if len(outstr) < 2:
-                    outstr = "0"+outstr
-                outstr = str(curtime.hour)+":"+outstr
-                if len(outstr) < 5:
-                    outstr = "0"+outstr
-                oled.writetextaligned(
-                    outstr, stdleftoffset, 40, oledscreenwidth-stdleftoffset, 1, fontwdReg)
-
-                needsUpdate = True
-            except:
-                log.error("Error processing information of TIME display")
-                needsUpdate = False
-                # Next page due to error/no data
-                screenjogflag = 1
-
-        if needsUpdate == True:
-            if screensavermode == False:
-                # Update screen if not screen saver mode
-                oled.power(True)
-                oled.flushimage(prevscreen != curscreen)
-                oled.reset()
-
-            timeoutcounter = 0
-            while timeoutcounter < screenjogtime or screenjogtime == 0:
-                qdata = ""
-                if not readq.empty():
-                    qdata = await readq.get()
+        if screensavermode == False:
+            # Update screen if not screen saver mode; the output thread sends it
+            oled.submitframe(prevscreen != curscreen, prepared.animation, prepared.frame)
+        prevscreen = curscreen
+
+        # Get the next page ready while this one is shown, so switching is instant
+        nexttask = create_task(prepare_screen(
+            screenenabled, screendata, screenid, curpages, background=True))
+        try:
+            # Sleep until a button press or the next deadline: the end of the screen
+            # duration, the screensaver, or the data refresh every minute
+            waking = False
+            dwellstart = time.monotonic()
+            while True:
+                now = time.monotonic()
+                deadlines = []
+                if screensavermode == False:
+                    if screenjogtime > 0:
+                        if now >= dwellstart + screenjogtime:
+                            break
+                        deadlines.append(dwellstart + screenjogtime)
+                    if now >= screensaverstart + screensaversec:
+                        screensavermode = True
+                        oled.submitblank()
+                        history.pause()
+                        # The panel is off, sleep until a button press
+                        continue
+                    if now >= dwellstart + 60:
+                        # Refresh data every minute, unless screensaver got triggered
+                        screenjogflag = 0
+                        break
+                    deadlines.append(screensaverstart + screensaversec)
+                    deadlines.append(dwellstart + 60)
+
+                timeout = None
+                if len(deadlines) > 0:
+                    timeout = max(0, min(deadlines) - now)
+                qdata = await messages.get(timeout)
 
                 if qdata == "OLEDSWITCH":
                     # Trigger screen switch
                     screenjogflag = 1
                     # Reset Screen Saver
+                    waking = screensavermode
                     screensavermode = False
-                    screensaverctr = 0
-
+                    screensaverstart = time.monotonic()
+                    if waking:
+                        history.resume()
+                        screens.bandwidthsampler.reset()
                     break
                 elif qdata == "OLEDSTOP":
-                    # End OLED Thread
-                    display_defaultimg()
+                    # End OLED Thread, display_loop blanks the screen
                     return
-                else:
-                    screensaverctr = screensaverctr + 1
-                    if screensaversec <= screensaverctr and screensavermode == False:
-                        screensavermode = True
-                        oled.fill(0)
-                        oled.reset()
-                        oled.power(False)
-
-                    if timeoutcounter == 0:
-                        # Use 1 sec sleep get CPU usage
-                        cpuusagelist = sysinfo.list_cpu_usage(1)
-                    else:
-                        await sleep(1)
-
-                    timeoutcounter = timeoutcounter + 1
-                    if timeoutcounter >= 60 and screensavermode == False:
-                        # Refresh data every minute, unless screensaver got triggered
-                        screenjogflag = 0
-                        break
-    display_defaultimg()
+
+            if not await messages.complete(nexttask):
+                return
+            prepared = nexttask.result()
+            if waking:
+                # Whatever was prepared before the screensaver is stale by now
+                running, prepared = await prepare(screenid, [])
+            elif screenjogflag == 0 and len(curpages) == 0:
+                # Refresh: this screen again rather than the next one
+                running, prepared = await prepare(screenid, [], advance=False)
+        finally:
+            nexttask.cancel()
 
 
 def display_defaultimg():
@@ -653,28 +482,34 @@ main = Cli('Operates the fan and billboard display on the Argon EON and Argon ON
 
 
 @main.command('Turn off the power.')
-def cmd_shutdown():
+async def cmd_shutdown():
     # Signal poweroff
+    log.enable(loadDebugMode())
     log.info("SHUTDOWN requested via shutdown of command of argononed service")
-    setFanOff()
+    await setFanOff()
     bus.write_byte(ADDR_FAN, 0xFF)
 
 
 @main.command('Turn off the fan.')
-def cmd_fanoff():
+async def cmd_fanoff():
     # Turn off fan
-    setFanOff()
+    log.enable(loadDebugMode())
+    await setFanOff()
     log.info("FANOFF requested via fanoff command of the argononed service")
     if OLED_ENABLED:
         display_defaultimg()
 
 
-@main.command('Run the a daemon that controls the fan and the ambient display.')
-async def cmd_service():
+async def service(fan: bool = True, display: bool = OLED_ENABLED, *others: Coroutine):
     """
-    Starts the power button and temperature monitor threads
+    Runs the power button monitor and, alongside it, the fan control, the display and
+    any other tasks, until the button asks for a reboot or shutdown or SIGINT/SIGTERM
+    arrives.  The others are cancelled then.
     """
-    log.info("argononed service version %s starting.", ARGON_VERSION)
+    from asyncio import CancelledError, Queue, create_task, gather, get_running_loop, sleep
+    from signal import SIGINT, SIGTERM
+
+    from . import collectors
 
     async def drain_queue(q: Queue):
         while True:
@@ -684,8 +519,9 @@ async def cmd_service():
     ipcq = Queue(1)
     shutdown_task = create_task(shutdown_check(ipcq))
     other_tasks = gather(
-        temp_check(),
-        display_loop(ipcq) if OLED_ENABLED else drain_queue(ipcq)
+        temp_check() if fan else sleep(0),
+        display_loop(ipcq) if display else drain_queue(ipcq),
+        *others
     )
     for sig in (SIGINT, SIGTERM):
         loop.add_signal_handler(sig, shutdown_task.cancel)
@@ -702,5 +538,25 @@ async def cmd_service():
     except CancelledError:
         pass
 
-    GPIO.cleanup()
+    collectors.pool.shutdown()
+    gpio().cleanup()
+
+
+@main.command('Print how long the running service takes for its tasks.')
+def cmd_timing():
+    print(timing.describe(timing.load(timing.statsfile("argononed"))))
+
+
+@main.command('Run the a daemon that controls the fan and the ambient display.')
+async def cmd_service():
+    """
+    Starts the power button and temperature monitor threads
+    """
+    from . import metrics, profiler
+
+    log.enable(loadDebugMode())
+    log.info("argononed service version %s starting.", ARGON_VERSION)
+    log.install("argononed")
+    profiler.install("argononed")
+    await service(True, OLED_ENABLED, timing.monitor("argononed"), *metrics.tasks(loadMetricsConfig()))
     log.debug('cmd_service return')
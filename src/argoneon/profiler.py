@@ -0,0 +1,137 @@
+#
+# On demand profiling of a running daemon.  install() makes SIGUSR1 start a session
+# of DURATION seconds (another SIGUSR1 ends it early) in which
+#
+#  * a sampler thread records the stacks of every thread (the event loop, collectors,
+#    OLED output) every INTERVAL seconds, written as collapsed stacks for
+#    flamegraph.pl or speedscope to /run/argoneon/<daemon>-<time>.folded, and
+#  * cProfile profiles the event loop thread, written as a pstats dump to
+#    /run/argoneon/<daemon>-<time>.pstats.
+#
+# The daemon goes on with its work meanwhile, just a little slower.
+#
+#   systemctl kill -s USR1 argond
+#   flamegraph.pl /run/argoneon/argond-20230116-120000.folded > argond.svg
+#   python -m pstats /run/argoneon/argond-20230116-120000.pstats
+#
+
+import marshal
+import os
+import sys
+import time
+from collections import Counter
+from threading import Event, Thread, enumerate as threads, get_ident
+
+from . import logging as log
+from . import runfiles
+
+DURATION = 30
+INTERVAL = 0.01
+
+_session = None
+
+
+def collapse(threadname, frame):
+    """
+    A stack as one collapsed-stack line: thread;outermost;...;innermost.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append("%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+    names.append(threadname)
+    names.reverse()
+    return ";".join(names)
+
+
+class Sampler(object):
+    """
+    Counts the stacks of all other threads, sampled every interval seconds on a thread
+    of its own.
+    """
+
+    def __init__(self, interval=INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threads()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self.stacks[collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples = self.samples + 1
+
+    def write(self, file):
+        for stack, count in self.stacks.most_common():
+            file.write("%s %d\n" % (stack, count))
+
+
+async def profile(daemon, seconds=DURATION, stop=None):
+    """
+    Profile the process for seconds, or until stop is set, then write the collapsed
+    stacks and the pstats dump to /run/argoneon.  Returns the file names without
+    extension.
+    """
+    import cProfile
+    from asyncio import Event, TimeoutError, wait_for
+
+    if stop is None:
+        stop = Event()
+    name = "%s-%s" % (daemon, time.strftime("%Y%m%d-%H%M%S"))
+    base = runfiles.path(name)
+    sampler = Sampler()
+    profiler = cProfile.Profile()
+    log.info("Profiling for %ss", seconds)
+    sampler.start()
+    profiler.enable()
+    try:
+        await wait_for(stop.wait(), seconds)
+    except TimeoutError:
+        pass
+    finally:
+        profiler.disable()
+        sampler.stop()
+        profiler.create_stats()
+        try:
+            runfiles.write(name + ".folded", sampler.write)
+            # As Profile.dump_stats() writes it
+            runfiles.write(name + ".pstats", lambda file: marshal.dump(profiler.stats, file), binary=True)
+            log.info("Profile of %s samples written to %s.folded and %s.pstats", sampler.samples, base, base)
+        except OSError as error:
+            log.error("Error writing profile %s: %s", base, error)
+    return base
+
+
+def install(daemon, seconds=DURATION):
+    """
+    Make SIGUSR1 start profiling the running event loop's process for seconds, or end
+    the profiling under way.
+    """
+    from asyncio import Event, get_running_loop
+    from signal import SIGUSR1
+
+    loop = get_running_loop()
+
+    def toggle():
+        global _session
+        if _session is not None and not _session[0].done():
+            _session[1].set()
+            return
+        stop = Event()
+        _session = (loop.create_task(profile(daemon, seconds, stop)), stop)
+
+    loop.add_signal_handler(SIGUSR1, toggle)
@@ -0,0 +1,35 @@
+#
+# Files the daemons leave for their commands and the user: timing stats, log dumps
+# and profiles.  They live in RUN_DIR, on tmpfs so rewriting them costs the SD card
+# nothing, in a directory only root can write to.  Each is written to a new file made
+# with O_EXCL and renamed over the old one, so a reader never sees half a file and
+# nothing put in the way, a symlink say, is ever followed.
+#
+
+import os
+
+RUN_DIR = '/run/argoneon'
+
+
+def path(name):
+    return os.path.join(RUN_DIR, name)
+
+
+def write(name, writer, binary=False):
+    """
+    Replace file name in RUN_DIR with what writer(file) writes to it.  Returns its
+    path.  Raises OSError if it can't.
+    """
+    from tempfile import mkstemp
+
+    os.makedirs(RUN_DIR, mode=0o755, exist_ok=True)
+    fd, tmpname = mkstemp(dir=RUN_DIR, prefix='.' + name + '.')
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as file:
+            writer(file)
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, path(name))
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+    return path(name)
@@ -0,0 +1,209 @@
+#
+# The RTC schedules of rtc.conf.  Each line, "minute hour date month weekday command"
+# like crontab, is compiled into a Schedule holding a bit mask of the allowed values
+# of each field, so whether it fires at a given minute takes a few bit tests.  The
+# fields take *, numbers, ranges a-b and steps */n or a-b/n, comma separated.
+#
+# nextfire() works like cron: it jumps to the next allowed month, then date, weekday,
+# hour and minute, each found with a bit operation on the field's mask, instead of
+# stepping through the calendar.  Agenda keeps the next fire time of each schedule of
+# a command on a heap, so only the schedules that have fired are looked at again.
+#
+# A schedule fires when all its fields match, date and weekday included (cron fires
+# when either does).  Weekdays count from Sunday = 0, like the RTC; 7 is Sunday too.
+#
+
+import datetime
+from heapq import heapify, heappop, heappush
+from typing import NamedTuple
+
+# Lowest and highest value of each field
+FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+ALL_MINUTES = (1 << 60) - 1
+ALL_HOURS = (1 << 24) - 1
+ALL_DATES = (1 << 32) - 2
+ALL_MONTHS = (1 << 13) - 2
+ALL_WEEKDAYS = 0x7f
+
+# Every date falls on every weekday within 28 years, leap days included
+SEARCH_YEARS = 28
+
+# Days of each month in a common year, by month number
+DAYS = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+class Schedule(NamedTuple):
+    minutes: int
+    hours: int
+    dates: int
+    months: int
+    weekdays: int
+    cmd: str
+
+
+def compilefield(text, low, high):
+    """
+    The mask of the values a field allows.  Raises ValueError if it is not valid.
+    """
+    mask = 0
+    for part in text.split(","):
+        rangetext, slash, steptext = part.partition("/")
+        step = int(steptext) if slash else 1
+        if rangetext == "*":
+            first, last = low, high
+        elif "-" in rangetext:
+            first, last = (int(value) for value in rangetext.split("-", 1))
+        else:
+            first = int(rangetext)
+            # n/step runs from n to the end, like cron
+            last = high if slash else first
+        if step < 1 or first < low or last > high or first > last:
+            raise ValueError("Invalid schedule field %s" % part)
+        for value in range(first, last + 1, step):
+            mask = mask | 1 << value
+    return mask
+
+
+def compileschedule(line):
+    """
+    The Schedule of an rtc.conf line, or None if it is not valid.
+    """
+    data = line.split()
+    if len(data) < 6:
+        return None
+    try:
+        minutes, hours, dates, months, weekdays = (compilefield(text, low, high)
+                                                   for text, (low, high) in zip(data, FIELDS))
+    except ValueError:
+        return None
+    # Sunday is 0 and 7
+    weekdays = (weekdays | weekdays >> 7) & ALL_WEEKDAYS
+    return Schedule(minutes, hours, dates, months, weekdays, " ".join(data[5:]))
+
+
+def values(mask, low, high):
+    """
+    The values of a mask, or [-1] if it allows all from low to high.
+    """
+    if mask == (1 << (high + 1)) - (1 << low):
+        return [-1]
+    return [value for value in range(low, high + 1) if mask >> value & 1]
+
+
+def rtcweekday(when):
+    # python Sunday = 6, RTC Sunday = 0
+    return (when.weekday() + 1) % 7
+
+
+def matches(schedule, when):
+    """
+    Whether schedule fires at the minute of when.
+    """
+    minutes, hours, dates, months, weekdays = schedule[:5]
+    if minutes >> when.minute & hours >> when.hour & dates >> when.day & months >> when.month & 1 == 0:
+        return False
+    return weekdays == ALL_WEEKDAYS or weekdays >> rtcweekday(when) & 1 == 1
+
+
+def nextbit(mask, value):
+    """
+    The lowest set bit of mask from value up, or None.
+    """
+    rest = mask >> value
+    if rest == 0:
+        return None
+    return value + (rest & -rest).bit_length() - 1
+
+
+def monthdays(year, month):
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return DAYS[month]
+
+
+def nextfire(schedule, after):
+    """
+    The first whole minute later than after at which schedule fires, or None if it
+    does not within SEARCH_YEARS.
+    """
+    minutes, hours, dates, months, weekdays = schedule[:5]
+    if weekdays == 0:
+        return None
+    # The loop carries minute 60 over into the next hour, and so on
+    year, month, day, hour, minute = after.year, after.month, after.day, after.hour, after.minute + 1
+    lastyear = year + SEARCH_YEARS
+    while year <= lastyear:
+        nextmonth = nextbit(months, month)
+        if nextmonth is None:
+            year, month, day, hour, minute = year + 1, 1, 1, 0, 0
+            continue
+        if nextmonth != month:
+            month, day, hour, minute = nextmonth, 1, 0, 0
+
+        nextday = nextbit(dates, day)
+        if nextday is None or nextday > monthdays(year, month):
+            year, month, day, hour, minute = year + (month == 12), month % 12 + 1, 1, 0, 0
+            continue
+        if nextday != day:
+            day, hour, minute = nextday, 0, 0
+
+        if weekdays != ALL_WEEKDAYS:
+            weekday = rtcweekday(datetime.date(year, month, day))
+            # Days to the next allowed weekday, the mask repeated for the week after
+            ahead = nextbit(weekdays | weekdays << 7, weekday) - weekday
+            if ahead > 0:
+                day, hour, minute = day + ahead, 0, 0
+                continue
+
+        nexthour = nextbit(hours, hour)
+        if nexthour is None:
+            day, hour, minute = day + 1, 0, 0
+            continue
+        if nexthour != hour:
+            hour, minute = nexthour, 0
+
+        nextminute = nextbit(minutes, minute)
+        if nextminute is None:
+            hour, minute = hour + 1, 0
+            continue
+        return datetime.datetime(year, month, day, hour, nextminute)
+    return None
+
+
+class Agenda(object):
+    """
+    The schedules of one command ("on" or "off") on a heap by their next fire time.
+    """
+
+    def __init__(self, commandschedulelist, cmd):
+        self.schedules = [schedule for schedule in commandschedulelist if schedule.cmd.lower() == cmd]
+        self.heap = []
+        self.after = None
+
+    def reset(self, after):
+        self.heap = []
+        for index, schedule in enumerate(self.schedules):
+            when = nextfire(schedule, after)
+            if when is not None:
+                self.heap.append((when, index))
+        heapify(self.heap)
+        self.after = after
+
+    def next(self, after):
+        """
+        The first fire time later than after and its schedule, or None if none of the
+        schedules fires again.
+        """
+        if self.after is None or after < self.after:
+            # First call, or the clock went back
+            self.reset(after)
+        while len(self.heap) > 0 and self.heap[0][0] <= after:
+            index = heappop(self.heap)[1]
+            when = nextfire(self.schedules[index], after)
+            if when is not None:
+                heappush(self.heap, (when, index))
+        self.after = after
+        if len(self.heap) == 0:
+            return None
+        return self.heap[0][0], self.schedules[self.heap[0][1]]
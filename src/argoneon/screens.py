@@ -0,0 +1,514 @@
+#
+# The OLED screens.  Each screen is registered with the screen decorator, which ties
+# its draw function to the collector that gathers its data, how long that data stays
+# valid and how it is split into pages.  The draw functions only draw one page into the
+# oled image buffer, so the screens can be rendered without the daemon (see
+# virtualoled).  Modules named in the screenmodules setting of the [OLED] section are
+# imported by the display loop and can register screens of their own.
+#
+
+import datetime
+import time
+from importlib import import_module
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from . import history
+from . import logging as log
+from . import collectors, fontfile, oled, sysinfo
+from .config import loadTempConfig
+
+WEEKDAYNAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MONTHNAMES = ["JAN", "FEB", "MAR", "APR", "MAY",
+              "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+fontwdSml = 6    # Maps to 6x8, or a loaded font (see loadfonts)
+fontwdReg = 8    # Maps to 8x16
+stdleftoffset = 54
+
+# Items drawn per page by the list screens
+CPU_PAGESIZE = 4
+STORAGE_PAGESIZE = 3
+BANDWIDTH_PAGESIZE = 2
+
+
+#
+# Screen registry
+#
+
+class Screen(NamedTuple):
+    """
+    collect() gathers the data, it may block and may raise.  The data is reused for
+    lifetime seconds.  paginate(data) splits it into pages, an empty list skips the
+    screen, and draw(page) draws one page, optionally returning oled scroll commands.
+    A prefetch screen may be collected and drawn while the previous screen is still
+    shown; screens that would look stale by then (the clock) are drawn when due.
+    Collecting gives up after timeout seconds.
+    """
+    name: str
+    collect: Callable[[], Any]
+    draw: Callable[[Any], Optional[List[int]]]
+    lifetime: float
+    paginate: Callable[[Any], List[Any]]
+    prefetch: bool
+    timeout: float
+
+
+registry = {}
+
+
+def whole(data):
+    """
+    The data is a single page.
+    """
+    return [data]
+
+
+def each(data):
+    """
+    One page per item.
+    """
+    return list(data)
+
+
+def chunks(pagesize):
+    """
+    Pages of up to pagesize items.
+    """
+    def paginate(data):
+        return [data[i:i+pagesize] for i in range(0, len(data), pagesize)]
+    return paginate
+
+
+def screen(name, collect, lifetime=0, paginate=whole, prefetch=True, timeout=collectors.TIMEOUT):
+    """
+    Decorator registering a draw function as the screen name in screenlist.
+    """
+    def decorator(draw):
+        registry[name] = Screen(name, collect, draw, lifetime, paginate, prefetch, timeout)
+        return draw
+    return decorator
+
+
+def loadfonts(smallfont=None, regularfont=None):
+    """
+    Draw the screens with BDF/PCF font files instead of the built in 6x8 and 8x16
+    fonts.  The fonts should be no taller than the ones they replace.
+    """
+    global fontwdSml, fontwdReg
+    try:
+        if smallfont:
+            fontwdSml = fontfile.loadfontfile(smallfont)
+        if regularfont:
+            fontwdReg = fontfile.loadfontfile(regularfont)
+    except Exception:
+        log.error("Error loading OLED fonts %s %s", smallfont, regularfont)
+
+
+def loadmodules(modulenames):
+    """
+    Import the modules that register custom screens.
+    """
+    for modulename in modulenames:
+        try:
+            import_module(modulename)
+        except Exception:
+            log.error("Error loading OLED screen module %s", modulename)
+
+
+class ScreenData(object):
+    """
+    Collected data of each screen, kept until its lifetime runs out.
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def pages(self, name):
+        """
+        The pages of screen name, collecting its data if there is none or it expired.
+        Collector errors are logged and give no pages.
+        """
+        entry = registry[name]
+        now = time.monotonic()
+        cached = self.cache.get(name)
+        if cached is not None and now < cached[0]:
+            data = cached[1]
+        else:
+            try:
+                data = entry.collect()
+            except Exception:
+                log.error("Error collecting information for %s display", name.upper())
+                return []
+            self.cache[name] = (now + entry.lifetime, data)
+        return entry.paginate(data)
+
+    def invalidate(self, name=None):
+        if name is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(name, None)
+
+
+def draw(name, page):
+    """
+    Draw one page of screen name, returning its scroll commands.
+    """
+    return registry[name].draw(page)
+
+
+#
+# Screens
+#
+
+def collectcpu():
+    return {"cores": sysinfo.list_cpu_usage(), "history": history.get("cpu")}
+
+
+def cpupages(data):
+    """
+    Pages of cores, then the usage history if there is any yet.
+    """
+    pages = [("cores", items) for items in chunks(CPU_PAGESIZE)(data["cores"])]
+    if len(data["history"]) > 1:
+        pages.append(("history", data["history"]))
+    return pages
+
+
+@screen("cpu", collectcpu, paginate=cpupages)
+def drawcpupage(page):
+    kind, data = page
+    if kind == "history":
+        drawcpuhistory(data)
+    else:
+        drawcpu(data)
+
+
+def drawcpu(items):
+    """
+    items: up to CPU_PAGESIZE {"title", "value"} entries from sysinfo.list_cpu_usage()
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgcpu")
+
+    yoffset = 0
+    for tmpitem in items:
+        curline = tmpitem["title"]+": "+str(tmpitem["value"])+"%"
+        oled.writetext(curline, stdleftoffset, yoffset, fontwdSml)
+        oled.drawfilledrectangle(
+            stdleftoffset, yoffset+12, int((oledscreenwidth-stdleftoffset-4)*tmpitem["value"]/100), 2)
+        yoffset = yoffset + 16
+
+
+def drawcpuhistory(values):
+    """
+    values: total CPU usage samples from history, oldest first
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgcpu")
+    oled.writetext("cpu: "+str(values[-1])+"%", stdleftoffset, 0, fontwdSml)
+    oled.drawcolumns(values, stdleftoffset, 16, oledscreenwidth-stdleftoffset, 48)
+
+
+def collectstorage():
+    tmpobj = sysinfo.list_hdd_usage()
+    return [{"title": curdev, "value": sysinfo.kb_str(tmpobj[curdev]['total']),
+             "usage": int(tmpobj[curdev]['percent'])} for curdev in tmpobj]
+
+
+@screen("storage", collectstorage, lifetime=60, paginate=chunks(STORAGE_PAGESIZE))
+def drawstorage(items):
+    """
+    items: up to STORAGE_PAGESIZE {"title", "value", "usage"} entries
+
+    Names longer than 8 characters are cut short on their row and written in full on
+    the empty row below it.  The first of those rows scrolls as a marquee (the panel can
+    scroll only one range of rows), and its scroll commands are returned.
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgstorage")
+    animation = None
+
+    yoffset = 16
+    for tmpitem in items:
+        # Right column first, safer to overwrite white space
+        oled.writetextaligned(
+            tmpitem["value"], 77, yoffset, oledscreenwidth-77, 2, fontwdSml)
+        oled.writetextaligned(
+            str(tmpitem["usage"])+"%", 50, yoffset, 74-50, 2, fontwdSml)
+        tmpname = tmpitem["title"]
+        if len(tmpname) > 8:
+            if animation is None:
+                animation = oled.marquee(tmpname + "  ", yoffset+8, fontwdSml)
+            else:
+                oled.writetext(tmpname, 0, yoffset+8, fontwdSml)
+            tmpname = tmpname[0:8]
+        oled.writetext(tmpname, 0, yoffset, fontwdSml)
+        yoffset = yoffset + 16
+    return animation
+
+
+class BandwidthSampler(object):
+    """
+    Disk throughput since the previous call.  The first call has nothing to compare
+    with, so it samples over sleepsec seconds like sysinfo.list_cpu_usage().
+    """
+
+    def __init__(self, sleepsec=1):
+        self.sleepsec = sleepsec
+        self.prevdata = None
+        self.prevtime = 0
+
+    def sample(self):
+        self.prevdata = {item['disk']: item for item in sysinfo.disk_usage()}
+        self.prevtime = time.monotonic()
+
+    def reset(self):
+        """
+        Forget the previous call, e.g. after the screensaver, so the next one doesn't
+        average over the time the panel was off.
+        """
+        self.prevdata = None
+
+    def __call__(self):
+        if self.prevdata is None:
+            self.sample()
+            time.sleep(self.sleepsec)
+        prevdata, prevtime = self.prevdata, self.prevtime
+        self.sample()
+        timespan = self.prevtime - prevtime
+        outputlist = []
+        for disk, item in self.prevdata.items():
+            if disk in prevdata:
+                # Sectors are 512 bytes
+                outputlist.append({"disk": disk,
+                                   "read": int((item['readsector'] - prevdata[disk]['readsector'])/2/timespan),
+                                   "write": int((item['writesector'] - prevdata[disk]['writesector'])/2/timespan)})
+        return outputlist
+
+
+bandwidthsampler = BandwidthSampler()
+
+
+def collectbandwidth():
+    trend = history.get("disk")
+    return [(items, trend) for items in chunks(BANDWIDTH_PAGESIZE)(bandwidthsampler())]
+
+
+@screen("bandwidth", collectbandwidth, paginate=each)
+def drawbandwidthpage(page):
+    drawbandwidth(*page)
+
+
+def drawbandwidth(items, trend=()):
+    """
+    items: up to BANDWIDTH_PAGESIZE {"disk", "read", "write"} rates in KB/s, trend:
+    total disk throughput samples from history, oldest first
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.clearbuffer()
+    oled.writetextaligned(
+        "BANDWIDTH", 0, 0, oledscreenwidth, 1, fontwdSml)
+    if len(trend) > 1:
+        oled.drawsparkline(trend, 0, 8, oledscreenwidth, 7, 0, max(max(trend), 1))
+    oled.writetextaligned(
+        "Write", 77, 16, oledscreenwidth-77, 2, fontwdSml)
+    oled.writetextaligned(
+        "Read",  50, 16, 74-50,              2, fontwdSml)
+    oled.writetext("Device", 0, 16, fontwdSml)
+
+    yoffset = 32
+    for item in items:
+        oled.writetextaligned(sysinfo.kb_str(
+            item['write']), 77, yoffset, oledscreenwidth-77, 2, fontwdSml)
+        oled.writetextaligned(sysinfo.kb_str(
+            item['read']), 50, yoffset, 74-50, 2, fontwdSml)
+        oled.writetext(item['disk'], 0, yoffset, fontwdSml)
+        yoffset = yoffset + 16
+
+
+def collectraid():
+    return sysinfo.list_raid()['raidlist']
+
+
+@screen("raid", collectraid, lifetime=30, paginate=each)
+def drawraid(tmpitem):
+    """
+    tmpitem: one entry of sysinfo.list_raid()['raidlist']
+    """
+    oled.loadbg("bgraid")
+    oled.writetextaligned(
+        tmpitem["title"], 0, 0, stdleftoffset, 1, fontwdSml)
+    oled.writetextaligned(
+        tmpitem["value"], 0, 8, stdleftoffset, 1, fontwdSml)
+    oled.writetextaligned(sysinfo.kb_str(
+        tmpitem["info"]["size"]), 0, 56, stdleftoffset, 1, fontwdSml)
+    rebuild = tmpitem['info']['resync']
+    statusList = tmpitem['info']['state'].split(", ")
+    if len(statusList) == 1:
+        status = statusList[0]
+    if len(statusList) == 2:
+        status = statusList[1]
+    if len(statusList) >= 3:
+        status = statusList[2]
+    status = status.capitalize()
+    oled.writetext(status, stdleftoffset, 8, fontwdSml)
+    if len(rebuild) > 0:
+        percent = rebuild.split(" ")
+        if status.lower() == "checking":
+            label = "Progess: "
+        else:
+            label = "Rebuild: "
+        oled.writetext(
+            label + percent[0], stdleftoffset, 16, fontwdSml)
+    oled.writetext("Active:"+str(int(tmpitem["info"]["active"]))+"/"+str(
+        int(tmpitem["info"]["devices"])), stdleftoffset, 32, fontwdSml)
+    oled.writetext("Working:"+str(int(tmpitem["info"]["working"]))+"/"+str(
+        int(tmpitem["info"]["devices"])), stdleftoffset, 40, fontwdSml)
+    oled.writetext("Failed:"+str(int(tmpitem["info"]["failed"]))+"/"+str(
+        int(tmpitem["info"]["devices"])), stdleftoffset, 48, fontwdSml)
+
+
+@screen("ram", sysinfo.get_ram, lifetime=5)
+def drawram(tmpraminfo):
+    """
+    tmpraminfo: [free percentage, total] from sysinfo.get_ram()
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgram")
+    oled.writetextaligned(
+        tmpraminfo[0], stdleftoffset, 8, oledscreenwidth-stdleftoffset, 1, fontwdReg)
+    oled.writetextaligned(
+        "of", stdleftoffset, 24, oledscreenwidth-stdleftoffset, 1, fontwdReg)
+    oled.writetextaligned(
+        tmpraminfo[1], stdleftoffset, 40, oledscreenwidth-stdleftoffset, 1, fontwdReg)
+
+
+def formattemp(value, temperature):
+    if temperature == "C":
+        # Celsius
+        tmpstr = str(value)
+        if len(tmpstr) > 4:
+            tmpstr = tmpstr[0:4]
+    else:
+        # Fahrenheit
+        tmpstr = str(32+9*(value)/5)
+        if len(tmpstr) > 5:
+            tmpstr = tmpstr[0:5]
+    return tmpstr
+
+
+def collecttemp():
+    return {"cpu": sysinfo.get_cpu_temp(), "hdd": sysinfo.get_hdd_temp(), "unit": loadTempConfig(),
+            "history": history.get("temp")}
+
+
+# smartctl reads the disk temperatures, as for the fan
+@screen("temp", collecttemp, lifetime=30, timeout=sysinfo.HDDTEMP_TIMEOUT)
+def drawtemp(tempinfo):
+    """
+    tempinfo: {"cpu": CPU temperature, "hdd": sysinfo.get_hdd_temp(), "unit": "C" or "F",
+    "history": CPU temperature samples, optional}
+    """
+    cpucval = tempinfo["cpu"]
+    hddtempobj = tempinfo["hdd"]
+    temperature = tempinfo["unit"]
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgtemp")
+    hddtempctr = 0
+    maxcval = 0
+    mincval = 200
+
+    # Get min/max of hdd temp
+    for curdev in hddtempobj:
+        if hddtempobj[curdev] < mincval:
+            mincval = hddtempobj[curdev]
+        if hddtempobj[curdev] > maxcval:
+            maxcval = hddtempobj[curdev]
+        hddtempctr = hddtempctr + 1
+
+    if hddtempctr > 0:
+        alltempobj = {"cpu": cpucval,
+                      "hdd min": mincval, "hdd max": maxcval}
+        # Update max C val to CPU Temp if necessary
+        if maxcval < cpucval:
+            maxcval = cpucval
+
+        displayrowht = 8
+        displayrow = 8
+        for curdev in alltempobj:
+            tmpstr = formattemp(alltempobj[curdev], temperature)
+            if len(curdev) <= 3:
+                oled.writetext(curdev.upper(
+                )+": " + tmpstr + chr(167) + temperature, stdleftoffset, displayrow, fontwdSml)
+
+            else:
+                oled.writetext(curdev.upper()+":",
+                               stdleftoffset, displayrow, fontwdSml)
+
+                oled.writetext("     " + tmpstr + chr(167) + temperature,
+                               stdleftoffset, displayrow+displayrowht, fontwdSml)
+            displayrow = displayrow + displayrowht*2
+    else:
+        maxcval = cpucval
+        tmpstr = formattemp(cpucval, temperature)
+
+        oled.writetextaligned(
+            tmpstr + chr(167) + temperature, stdleftoffset, 24, oledscreenwidth-stdleftoffset, 1, fontwdReg)
+
+    # Temperature Bar: 40C is min, 80C is max
+    maxht = 21
+    barht = int(maxht*(maxcval-40)/40)
+    if barht > maxht:
+        barht = maxht
+    elif barht < 1:
+        barht = 1
+    oled.drawfilledrectangle(24, 20+(maxht-barht), 3, barht, 2)
+
+    # CPU temperature trend, same scale as the bar
+    trend = tempinfo.get("history", [])
+    if len(trend) > 1:
+        oled.drawsparkline(trend, stdleftoffset, 56, oledscreenwidth-stdleftoffset, 8, 40, 80)
+
+
+@screen("ip", sysinfo.get_ip_list, lifetime=60, paginate=each)
+def drawip(item):
+    """
+    item: (interface, address) from sysinfo.get_ip_list()
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgip")
+    oled.writetextaligned(
+        item[0], 0, 0, oledscreenwidth, 1, fontwdReg)
+    oled.writetextaligned(
+        item[1], 0, 16, oledscreenwidth, 1, fontwdReg)
+
+
+@screen("clock", datetime.datetime.now, prefetch=False)
+def drawclock(curtime):
+    """
+    curtime: datetime to show
+    """
+    oledscreenwidth = oled.getmaxX()
+    oled.loadbg("bgtime")
+
+    # Month/Day
+    outstr = str(curtime.day).strip()
+    if len(outstr) < 2:
+        outstr = " "+outstr
+    outstr = MONTHNAMES[curtime.month-1]+outstr
+    oled.writetextaligned(
+        outstr, stdleftoffset, 8, oledscreenwidth-stdleftoffset, 1, fontwdReg)
+
+    # Day of Week
+    oled.writetextaligned(WEEKDAYNAMES[curtime.weekday(
+    )], stdleftoffset, 24, oledscreenwidth-stdleftoffset, 1, fontwdReg)
+
+    # Time
+    outstr = str(curtime.minute).strip()
+    if len(outstr) < 2:
+        outstr = "0"+outstr
+    outstr = str(curtime.hour)+":"+outstr
+    if len(outstr) < 5:
+        outstr = "0"+outstr
+    oled.writetextaligned(
+        outstr, stdleftoffset, 40, oledscreenwidth-stdleftoffset, 1, fontwdReg)
@@ -3,11 +3,19 @@ import os
 import sys
 import time
 
-from . import sysinfo
-from .config import loadCPUFanConfig, loadHDDFanConfig
 from .version import ARGON_VERSION
 
 
+def sysinfo():
+    """
+    The sysinfo module, imported on first use: it pulls in psutil and the config parser,
+    which quick sections like --version don't need.
+    """
+    from . import sysinfo
+
+    return sysinfo
+
+
 def printTable(myDict, colList=None, title: str = None):
     """ Pretty print a list of dictionarys (myDict) as a dynamically sized table.
     If column names (colList) aren't specified, they will show in random order.
@@ -51,10 +59,10 @@ def show_storage():
     """ Display the storage devices in the system.  These not, devices involved
     in a RAID array are NOT displayed, however the RAID device is.
     """
-    devices = sysinfo.list_hdd_usage()
+    devices = sysinfo().list_hdd_usage()
     lst = []
     for dev in devices:
-        lst.append({"Device": dev, "Total": sysinfo.kb_str(devices[dev]['total']), "Used": sysinfo.kb_str(devices[dev]['used']), "Pct": f"{devices[dev]['percent']}%"
+        lst.append({"Device": dev, "Total": sysinfo().kb_str(devices[dev]['total']), "Used": sysinfo().kb_str(devices[dev]['used']), "Pct": f"{devices[dev]['percent']}%"
                     }
                    )
     printTable(lst, ["Device", "Total", "Used", "Pct"], title="Storage Usage:")
@@ -65,7 +73,7 @@ def show_raid():
     If software RAID is setup, report on the status of the RAID sets.  If there is
     no RAID setup, inform the user.
     """
-    raidList = sysinfo.list_raid()['raidlist']
+    raidList = sysinfo().list_raid()['raidlist']
     lst = []
     rebuildExists = False
     keys = ['Device', 'Type', 'Size', 'State']
@@ -79,7 +87,7 @@ def show_raid():
             state = stateArray[2]
         else:
             state = None
-        raidDict = {'Device': item['title'], 'Type': item['info']['raidtype'].upper(), 'Size': sysinfo.kb_str(item['info']['size']), 'State': state.capitalize(), 'Rebuild': None
+        raidDict = {'Device': item['title'], 'Type': item['info']['raidtype'].upper(), 'Size': sysinfo().kb_str(item['info']['size']), 'State': state.capitalize(), 'Rebuild': None
                     }
         if len(item['info']['resync']) > 0:
             rebuildExists = True
@@ -101,7 +109,7 @@ def show_cpuUtilization():
     snapshot, and tools such as htop etc work much better.
     """
     lst = [{'CPU': d['title'], "%": d["value"]}
-           for d in sysinfo.list_cpu_usage()]
+           for d in sysinfo().list_cpu_usage()]
     printTable(lst, ['CPU', '%'], title='CPU Utilization')
 
 
@@ -109,9 +117,9 @@ def show_cpuTemperature():
     """
     Display the current CPU temperature
     """
-    rawTemp = sysinfo.get_cpu_temp()
-    ctemp = sysinfo.truncate_float(rawTemp, 2)
-    ftemp = sysinfo.convert_c_to_f(rawTemp, 2)
+    rawTemp = sysinfo().get_cpu_temp()
+    ctemp = sysinfo().truncate_float(rawTemp, 2)
+    ftemp = sysinfo().convert_c_to_f(rawTemp, 2)
     printTable({"C": ctemp, "F": ftemp}, title="CPU Temperature:")
 
 
@@ -121,7 +129,7 @@ def show_ipaddresses():
     exception of any bridge types setup for containers
     """
     lst = [{"Interface": item[0], 'IP':item[1]}
-           for item in sysinfo.get_ip_list()]
+           for item in sysinfo().get_ip_list()]
     printTable(lst, title="IP Addresses:")
 
 
@@ -131,12 +139,12 @@ def show_hddTemperature():
     this includes the temperature for any NVME device, so you may need to modify your
     fan triggers
     """
-    hddTemp = sysinfo.get_hdd_temp()
+    hddTemp = sysinfo().get_hdd_temp()
     lst = []
     for item in hddTemp:
         rawTemp = hddTemp[item]
-        ctemp = sysinfo.truncate_float(rawTemp, 1)
-        ftemp = sysinfo.convert_c_to_f(rawTemp, 1)
+        ctemp = sysinfo().truncate_float(rawTemp, 1)
+        ftemp = sysinfo().convert_c_to_f(rawTemp, 1)
         lst.append({'Device': item, "C": ctemp, "F": ftemp})
     printTable(lst, title="Storage Temperature:")
 
@@ -145,7 +153,7 @@ def show_fanspeed():
     """
     Display the current fan speed percentage.
     """
-    printTable({"Speed %": sysinfo.get_current_fan_speed()},
+    printTable({"Speed %": sysinfo().get_current_fan_speed()},
                ['Speed %'], title='Fan Speed')
 
 
@@ -154,9 +162,9 @@ def show_hddutilization():
     Display the current disk device utilization, this is basically useless, use dstat.
     """
     start = time.clock_gettime_ns(time.CLOCK_MONOTONIC)
-    usage1 = sysinfo.disk_usage()
+    usage1 = sysinfo().disk_usage()
     time.sleep(1)
-    usage2 = sysinfo.disk_usage()
+    usage2 = sysinfo().disk_usage()
     stop = time.clock_gettime_ns(time.CLOCK_MONOTONIC)
 
     for istop in usage2:
@@ -171,8 +179,8 @@ def show_hddutilization():
     for item in usage1:
         readbw = (item['readsector']/2)/span
         writebw = (item['writesector']/2)/span
-        lst.append({'Device': item['disk'], "Read/Sec": sysinfo.kb_str(
-            int(readbw)), "Write/Sec": sysinfo.kb_str(int(writebw))})
+        lst.append({'Device': item['disk'], "Read/Sec": sysinfo().kb_str(
+            int(readbw)), "Write/Sec": sysinfo().kb_str(int(writebw))})
     printTable(lst, title='Storage Utilization:')
 
 
@@ -194,7 +202,7 @@ def show_memory():
     """
     Display currnent memory utilization
     """
-    memory = sysinfo.get_ram()
+    memory = sysinfo().get_ram()
     printTable({"Total": memory[1], "Free": memory[0]}, title="Memory:")
 
 
@@ -244,12 +252,14 @@ def show_config():
     Create a table of the HDD and CPU temperatures, and then add in all of the marked fan
     speeds for the given temps.  We also highlight the thing that is forcing the current fanspeed.
     """
+    from .config import loadCPUFanConfig, loadHDDFanConfig
+
     hddtemplst = loadHDDFanConfig()
     cputemplst = loadCPUFanConfig()
 
-    actualcpu = sysinfo.get_cpu_temp()
-    actualhdd = sysinfo.get_max_hdd_temp()
-    fanspeed = sysinfo.get_current_fan_speed()
+    actualcpu = sysinfo().get_cpu_temp()
+    actualhdd = sysinfo().get_max_hdd_temp()
+    fanspeed = sysinfo().get_current_fan_speed()
     keys = {}
     hdd = {'Temperature': 'HDD fanspeed'}
     cpu = {'Temperature': 'CPU fanspeed'}
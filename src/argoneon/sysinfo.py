@@ -2,13 +2,17 @@
 # Misc methods to retrieve system information.
 #
 
+# psutil, socket and pathlib are imported by the functions that need them, so that
+# argonstatus -v or --fan don't pay for them
+
 import os
 import time
-import socket
-import psutil
-from pathlib import Path
 
-fanspeed = Path('/tmp/fanspeed.txt')
+fanspeed = '/tmp/fanspeed.txt'
+
+# Seconds to wait for the disk temperatures: smartctl wakes the disks up one after
+# the other, give it time
+HDDTEMP_TIMEOUT = 30
 
 
 def check_permission():
@@ -26,7 +30,8 @@ def get_current_fan_speed():
     (apparently) from the device when we set the speed.
     """
     try:
-        return int(float(fanspeed.read_text()))
+        with open(fanspeed) as file:
+            return int(float(file.read()))
     except FileNotFoundError:
         return None
     except ValueError:
@@ -37,7 +42,8 @@ def record_current_fan_speed(theSpeed):
     """ Record the current fanspeed for external applications to use.
     """
     try:
-        fanspeed.write_text(str(theSpeed))
+        with open(fanspeed, 'w') as file:
+            file.write(str(theSpeed))
     except:
         ...
 
@@ -246,6 +252,8 @@ def get_hdd_temp():
 
 
 def get_ip():
+    import socket
+
     ipaddr = ""
     st = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
@@ -260,6 +268,8 @@ def get_ip():
 
 
 def get_ip_addresses(family):
+    import psutil
+
     for interface, snics in psutil.net_if_addrs().items():
         if interface != "lo" and not interface.startswith("br"):
             for snic in snics:
@@ -268,6 +278,8 @@ def get_ip_addresses(family):
 
 
 def get_ip_list():
+    import socket
+
     iplist = []
     iplist = list(get_ip_addresses(socket.AF_INET))
 
@@ -494,6 +506,7 @@ def disk_usage_detail(disk, mapper: str = None):
     else:
         this = disk
 
+    from pathlib import Path
     tmp = Path('/sys/block', this, 'stat').read_text()
     tmp.replace('\t', ' ')
     tmp = tmp.strip()
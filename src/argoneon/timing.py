@@ -0,0 +1,175 @@
+#
+# Latency histograms for the daemons.  Anything can record how long something took
+# with observe() or a "with timed(name):" block, from any thread; that costs a lock
+# and a bisect, cheap enough to leave on.  The daemons' periodic tasks sleep with
+# sleep() here, which records how late the loop woke them up (the time it was
+# blocked) without waking the daemon any more often than it does anyway.  monitor()
+# writes all the histograms to a stats file in /run/argoneon now and then, which the
+# daemon's "timing" command prints.
+#
+#   with timing.timed("render clock"):
+#       screens.draw("clock", now)
+#
+
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+
+from . import logging as log
+from . import runfiles
+
+# Bucket upper bounds in seconds, about 2.5x apart from 100us to 10s, plus one for
+# everything slower
+BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+          0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+WRITE_INTERVAL = 60
+
+histograms = {}
+_lock = Lock()
+
+
+class Histogram(object):
+    """
+    Counts of durations by BOUNDS bucket, with their count, sum and maximum.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(BOUNDS, seconds)] += 1
+        self.count = self.count + 1
+        self.total = self.total + seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.total, "max": self.max, "buckets": list(self.buckets)}
+
+
+def observe(name, seconds):
+    with _lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        histograms[name].observe(seconds)
+
+
+@contextmanager
+def timed(name):
+    """
+    Record how long the with block took, whether or not it raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot():
+    """
+    All histograms as plain data, by name.
+    """
+    with _lock:
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+
+def quantile(snap, q):
+    """
+    Upper bound of the bucket holding the q quantile of a histogram snapshot, or its
+    maximum if that is lower.
+    """
+    rank = q * snap["count"]
+    seen = 0
+    for index, count in enumerate(snap["buckets"]):
+        seen = seen + count
+        if count > 0 and seen >= rank:
+            if index < len(BOUNDS):
+                return min(BOUNDS[index], snap["max"])
+            break
+    return snap["max"]
+
+
+#
+# Stats file
+#
+
+def statsname(daemon):
+    return daemon + '-timing.json'
+
+
+def statsfile(daemon):
+    return runfiles.path(statsname(daemon))
+
+
+def write(daemon, histograms):
+    data = {"time": time.time(), "histograms": histograms}
+    runfiles.write(statsname(daemon), lambda file: json.dump(data, file))
+
+
+def update(daemon, written):
+    """
+    Write the stats file of daemon if the histograms changed since written, the ones
+    written last.  Returns the ones written now.
+    """
+    histograms = snapshot()
+    if histograms == written:
+        return written
+    try:
+        write(daemon, histograms)
+    except OSError as error:
+        log.error("Error writing %s: %s", statsfile(daemon), error)
+        return written
+    return histograms
+
+
+def load(filename):
+    with open(filename) as file:
+        return json.load(file)
+
+
+def describe(data):
+    """
+    The histograms of a stats file as a table, times in milliseconds.
+    """
+    lines = ["%-28s %8s %9s %9s %9s %9s %9s" % ("", "count", "mean", "p50", "p90", "p99", "max")]
+    for name, snap in sorted(data["histograms"].items()):
+        if snap["count"] == 0:
+            continue
+        lines.append("%-28s %8d %9.2f %9.2f %9.2f %9.2f %9.2f" % (
+            name, snap["count"], 1000*snap["sum"]/snap["count"], 1000*quantile(snap, 0.5),
+            1000*quantile(snap, 0.9), 1000*quantile(snap, 0.99), 1000*snap["max"]))
+    lines.append("as of %s" % time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(data["time"])))
+    return "\n".join(lines)
+
+
+async def sleep(seconds):
+    """
+    asyncio.sleep(), recording how much later than asked the event loop woke it up
+    as "loop lag".
+    """
+    from asyncio import sleep
+
+    start = time.monotonic()
+    await sleep(seconds)
+    observe("loop lag", max(0, time.monotonic() - start - seconds))
+
+
+async def monitor(daemon):
+    """
+    Write the stats file of daemon every WRITE_INTERVAL seconds if the histograms
+    changed, and once more when cancelled.  Runs forever.
+    """
+    written = None
+    try:
+        while True:
+            await sleep(WRITE_INTERVAL)
+            written = update(daemon, written)
+    finally:
+        update(daemon, written)
@@ -0,0 +1,124 @@
+#
+# A virtual GPIO header for exercising the power button path without an Argon board.
+#
+# ReplayGPIO offers the parts of the RPi.GPIO interface the daemons use and replays
+# recorded edge timings on a pin, calling the event detect callbacks the way RPi.GPIO
+# does.  It keeps its own clock, so a decoder given ReplayGPIO.monotonic_ns as its clock
+# sees exactly the replayed widths:
+#
+#   gpio = ReplayGPIO()
+#   decoder = button.PulseDecoder(gpio, 4, print, clock=gpio.monotonic_ns)
+#   decoder.start()
+#   gpio.replay(4, [(0, 1), (45000000, 0)])    # a 45ms pulse, a shutdown request
+#
+
+import time
+from threading import Thread
+
+BCM = 11
+BOARD = 10
+IN = 1
+OUT = 0
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+LOW = 0
+HIGH = 1
+RISING = 31
+FALLING = 32
+BOTH = 33
+RPI_REVISION = 3
+
+
+class ReplayGPIO(object):
+    """
+    Pins start LOW.  replay() sets pin levels at the given offsets in nanoseconds and
+    runs the callbacks registered for the edges that causes.
+    """
+
+    BCM = BCM
+    BOARD = BOARD
+    IN = IN
+    OUT = OUT
+    PUD_OFF = PUD_OFF
+    PUD_DOWN = PUD_DOWN
+    PUD_UP = PUD_UP
+    LOW = LOW
+    HIGH = HIGH
+    RISING = RISING
+    FALLING = FALLING
+    BOTH = BOTH
+    RPI_REVISION = RPI_REVISION
+
+    def __init__(self):
+        self.levels = {}
+        self.callbacks = {}
+        self.now = 0
+
+    #
+    # RPi.GPIO interface
+    #
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=LOW):
+        self.levels[pin] = HIGH if pull_up_down == PUD_UP else LOW
+
+    def input(self, pin):
+        return self.levels.get(pin, LOW)
+
+    def output(self, pin, level):
+        self.levels[pin] = level
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = (edge, [] if callback is None else [callback])
+
+    def add_event_callback(self, pin, callback):
+        self.callbacks[pin][1].append(callback)
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self, pin=None):
+        if pin is None:
+            self.callbacks.clear()
+        else:
+            self.callbacks.pop(pin, None)
+
+    #
+    # Replay
+    #
+
+    def monotonic_ns(self):
+        return self.now
+
+    def replay(self, pin, edges, realtime=False):
+        """
+        Replay edges, a list of (offset in ns, level), on pin.  Offsets count from the
+        current virtual time.  With realtime the replay also sleeps between the edges.
+        """
+        start = self.now
+        for offset, level in edges:
+            if realtime:
+                time.sleep(max(0, start + offset - self.now) / 1e9)
+            self.now = start + offset
+            previous = self.levels.get(pin, LOW)
+            self.levels[pin] = level
+            if level == previous or pin not in self.callbacks:
+                continue
+            edge, callbacks = self.callbacks[pin]
+            if edge == BOTH or edge == (RISING if level == HIGH else FALLING):
+                for callback in list(callbacks):
+                    callback(pin)
+
+    def replaythread(self, pin, edges):
+        """
+        Replay edges in real time on a thread of its own, as RPi.GPIO runs callbacks.
+        """
+        thread = Thread(target=self.replay, args=(pin, edges, True), daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,265 @@
+#
+# A virtual SSD1306 panel for rendering the OLED screens without an Argon board.
+#
+# VirtualPanel stands in for the I2C bus in oled.setbackend().  It decodes the command
+# and data stream the way the controller does, keeps a model of the display RAM and
+# logs a frame every time oled.flushimage() completes.  Frames can be read back as
+# pixel arrays or written out as PBM/PNG images.
+#
+
+import struct
+import time
+import zlib
+from collections import deque
+from os import makedirs
+from os.path import join
+from typing import List, NamedTuple
+
+WD = 128
+HT = 64
+PAGES = HT >> 3
+ADDR_OLED = 0x3c
+
+# Number of argument bytes that follow each multi byte command
+COMMAND_ARGS = {
+    0x20: 1,    # Memory addressing mode
+    0x21: 2,    # Column range
+    0x22: 2,    # Page range
+    0x26: 6,    # Right horizontal scroll
+    0x27: 6,    # Left horizontal scroll
+    0x29: 5,    # Vertical and right horizontal scroll
+    0x2A: 5,    # Vertical and left horizontal scroll
+    0x81: 1,    # Contrast
+    0x8D: 1,    # Charge pump
+    0xA3: 2,    # Vertical scroll area
+    0xA8: 1,    # Multiplex ratio
+    0xD3: 1,    # Display offset
+    0xD5: 1,    # Clock divide
+    0xD9: 1,    # Pre-charge period
+    0xDA: 1,    # COM pins
+    0xDB: 1,    # VCOMH level
+}
+
+ADDRESSING_HORIZONTAL = 0
+ADDRESSING_VERTICAL = 1
+ADDRESSING_PAGE = 2
+
+
+class Frame(NamedTuple):
+    """
+    What the panel showed after a flush: display RAM plus the display state flags.
+    """
+    timestamp: float
+    ram: bytes
+    poweron: bool
+    inverse: bool
+    allon: bool
+
+    def pixel(self, x, y):
+        if not self.poweron:
+            return 0
+        if self.allon:
+            return 1
+        value = (self.ram[WD*(y >> 3) + x] >> (y & 7)) & 1
+        if self.inverse:
+            value = value ^ 1
+        return value
+
+    def pixels(self) -> List[List[int]]:
+        """
+        The frame as HT rows of WD pixels, 1 for lit.
+        """
+        return [[self.pixel(x, y) for x in range(WD)] for y in range(HT)]
+
+    def packedrows(self, lit=1):
+        """
+        One bytes object per row, 8 pixels per byte, leftmost pixel in the high bit.
+        Lit pixels are written as the lit bit value.
+        """
+        rows = []
+        for y in range(HT):
+            row = bytearray(WD >> 3)
+            for x in range(WD):
+                if self.pixel(x, y) == lit:
+                    row[x >> 3] |= 0x80 >> (x & 7)
+            rows.append(bytes(row))
+        return rows
+
+    def pbm(self) -> bytes:
+        # PBM uses 1 for black, so the unlit pixels are the set bits
+        return b"P4\n%d %d\n" % (WD, HT) + b"".join(self.packedrows(lit=0))
+
+    def png(self) -> bytes:
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        # 1 bit greyscale, lit pixels are white
+        header = struct.pack(">IIBBBBB", WD, HT, 1, 0, 0, 0, 0)
+        raw = b"".join(b"\x00" + row for row in self.packedrows(lit=1))
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) +
+                chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+    def save(self, filename):
+        """
+        Write the frame as PNG, or as PBM if the file name ends in .pbm.
+        """
+        with open(filename, "wb") as file:
+            if filename.endswith(".pbm"):
+                file.write(self.pbm())
+            else:
+                file.write(self.png())
+
+
+class VirtualPanel(object):
+    """
+    Models the OLED controller behind an smbus2 compatible interface.  frames keeps the
+    last maxframes frames.  If outdir is given every frame is also saved there as
+    frame-NNNNN.png (or .pbm with imageformat="pbm").
+    """
+
+    def __init__(self, maxframes=256, outdir=None, imageformat="png"):
+        self.ram = bytearray(WD*PAGES)
+        self.frames = deque(maxlen=maxframes)
+        self.framecount = 0
+        self.outdir = outdir
+        self.imageformat = imageformat
+        if outdir is not None:
+            makedirs(outdir, exist_ok=True)
+
+        self.poweron = False
+        self.inverse = False
+        self.allon = False
+        self.startline = 0
+        self.addressing = ADDRESSING_PAGE
+        self.colstart = 0
+        self.colend = WD-1
+        self.pagestart = 0
+        self.pageend = PAGES-1
+        self.col = 0
+        self.page = 0
+
+        # Last scroll set up (the full command) and whether it is running
+        self.scroll = None
+        self.scrollarea = (0, HT)
+        self.scrolling = False
+
+        self._command = []
+
+        # I2C traffic seen, bytes count the register byte and the payload
+        self.transactions = 0
+        self.bytes = 0
+
+    #
+    # smbus2 interface
+    #
+
+    def write_byte_data(self, addr, register, value):
+        self.transactions = self.transactions + 1
+        self.bytes = self.bytes + 2
+        if addr != ADDR_OLED:
+            return
+        if register & 0x40:
+            self.data([value])
+        else:
+            self.command(value)
+
+    def write_i2c_block_data(self, addr, register, data):
+        self.transactions = self.transactions + 1
+        self.bytes = self.bytes + 1 + len(data)
+        if addr != ADDR_OLED:
+            return
+        if register & 0x40:
+            self.data(data)
+        else:
+            for value in data:
+                self.command(value)
+
+    def write_byte(self, addr, value):
+        self.transactions = self.transactions + 1
+        self.bytes = self.bytes + 1
+
+    def flushed(self):
+        frame = self.frame()
+        self.frames.append(frame)
+        self.framecount = self.framecount + 1
+        if self.outdir is not None:
+            frame.save(join(self.outdir, "frame-%05d.%s" % (self.framecount, self.imageformat)))
+
+    #
+    # Controller model
+    #
+
+    def frame(self) -> Frame:
+        """
+        The current panel contents, whether or not a flush completed.
+        """
+        ram = bytes(self.ram)
+        if self.startline != 0:
+            # Rotate the rows so the start line is on top
+            rotated = bytearray(len(ram))
+            for y in range(HT):
+                src = (y + self.startline) % HT
+                for x in range(WD):
+                    if (ram[WD*(src >> 3) + x] >> (src & 7)) & 1:
+                        rotated[WD*(y >> 3) + x] |= 1 << (y & 7)
+            ram = bytes(rotated)
+        return Frame(time.monotonic(), ram, self.poweron, self.inverse, self.allon)
+
+    def command(self, value):
+        self._command.append(value)
+        if len(self._command) <= COMMAND_ARGS.get(self._command[0], 0):
+            return
+        cmd = self._command
+        self._command = []
+
+        opcode = cmd[0]
+        if opcode == 0x20:
+            self.addressing = cmd[1] & 0x3
+        elif opcode == 0x21:
+            self.colstart = cmd[1] & 0x7F
+            self.colend = cmd[2] & 0x7F
+            self.col = self.colstart
+        elif opcode == 0x22:
+            self.pagestart = cmd[1] & 0x7
+            self.pageend = cmd[2] & 0x7
+            self.page = self.pagestart
+        elif opcode in (0x26, 0x27, 0x29, 0x2A):
+            self.scroll = tuple(cmd)
+        elif opcode == 0xA3:
+            self.scrollarea = (cmd[1] & 0x3F, cmd[2] & 0x7F)
+        elif opcode in (0x2E, 0x2F):
+            self.scrolling = opcode == 0x2F
+        elif opcode in (0xAE, 0xAF):
+            self.poweron = opcode == 0xAF
+        elif opcode in (0xA6, 0xA7):
+            self.inverse = opcode == 0xA7
+        elif opcode in (0xA4, 0xA5):
+            self.allon = opcode == 0xA5
+        elif 0x40 <= opcode <= 0x7F:
+            self.startline = opcode & 0x3F
+        elif 0xB0 <= opcode <= 0xB7:
+            self.page = opcode & 0x7
+        elif opcode <= 0x0F:
+            self.col = (self.col & 0xF0) | opcode
+        elif opcode <= 0x1F:
+            self.col = (self.col & 0x0F) | ((opcode & 0x7) << 4)
+
+    def data(self, values):
+        for value in values:
+            self.ram[WD*self.page + self.col] = value & 0xFF
+            if self.addressing == ADDRESSING_VERTICAL:
+                self.page = self.page + 1
+                if self.page > self.pageend:
+                    self.page = self.pagestart
+                    self.col = self.col + 1
+                    if self.col > self.colend:
+                        self.col = self.colstart
+            elif self.addressing == ADDRESSING_HORIZONTAL:
+                self.col = self.col + 1
+                if self.col > self.colend:
+                    self.col = self.colstart
+                    self.page = self.page + 1
+                    if self.page > self.pageend:
+                        self.page = self.pagestart
+            else:
+                self.col = (self.col + 1) % WD
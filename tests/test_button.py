@@ -0,0 +1,41 @@
+from argoneon import button
+from argoneon.virtualgpio import ReplayGPIO
+
+MS = 1000000
+
+
+def decode(edges):
+    gpio = ReplayGPIO()
+    events = []
+    decoder = button.PulseDecoder(gpio, 4, lambda event, width: events.append((event, width)),
+                                  clock=gpio.monotonic_ns)
+    decoder.start()
+    gpio.replay(4, edges)
+    return events
+
+
+def test_presses():
+    assert decode([(0, 1), (25*MS, 0)]) == [(button.REBOOT, 25*MS)]
+    assert decode([(0, 1), (45*MS, 0)]) == [(button.SHUTDOWN, 45*MS)]
+    assert decode([(0, 1), (65*MS, 0)]) == [(button.SWITCH, 65*MS)]
+
+
+def test_pulse_sequence():
+    edges = [(0, 1), (65*MS, 0), (1000*MS, 1), (1045*MS, 0), (2000*MS, 1), (2022*MS, 0)]
+    assert decode(edges) == [(button.SWITCH, 65*MS), (button.SHUTDOWN, 45*MS), (button.REBOOT, 22*MS)]
+
+
+def test_noise_is_ignored():
+    # Glitches and overlong pulses classify as nothing
+    assert decode([(0, 1), (3*MS, 0), (10*MS, 1), (200*MS, 0)]) == []
+    assert decode([(0, 1), (5*MS, 0), (100*MS, 1), (145*MS, 0)]) == [(button.SHUTDOWN, 45*MS)]
+
+
+def test_stop():
+    gpio = ReplayGPIO()
+    events = []
+    decoder = button.PulseDecoder(gpio, 4, lambda event, width: events.append(event), clock=gpio.monotonic_ns)
+    decoder.start()
+    decoder.stop()
+    gpio.replay(4, [(0, 1), (45*MS, 0)])
+    assert events == []
@@ -0,0 +1,26 @@
+from argoneon import eond
+
+
+def test_describe_month_range():
+    assert eond.describeConfigListEntry("0 3 * 1-6 * on") == "Startup | Annually: Every day of Jan-Jun,at 3am"
+
+
+def test_describe_minute_step():
+    assert eond.describeConfigListEntry("*/15 * * * * on") == "Startup | Every 15 minutes"
+
+
+def test_describe_dates_and_weekdays():
+    assert eond.describeConfigListEntry("0 6 1,15 * * on") == "Startup | Monthly: Every 1st,15th of the Month,at 6am"
+    assert eond.describeConfigListEntry("0,30 7 * * 1-5 off") == "Shutdown | Weekly: on Mon-Fri,at 7am,7:30am"
+    assert eond.describeConfigListEntry("0 3 11-13 12 * on") == "Startup | Annually: Every 11th-13th of Dec,at 3am"
+
+
+def test_describe_many_times():
+    assert eond.describeConfigListEntry("*/30 8-18 * * * off") == "Shutdown | Daily: 0,30 minutes past 8am-6pm"
+    assert eond.describeConfigListEntry("5/20 8 * * * on") == "Startup | Daily: every 20 minutes from the 5th minute of 8am"
+
+
+def test_load_skips_every_minute(tmp_path):
+    config = tmp_path / "rtc.conf"
+    config.write_text("# comment\n* 3 * * * off\n*/1 3 * * * off\n0-59 * * * * off\n0 3 * * * off\n0 3 * 13 * on\n")
+    assert eond.loadConfigList(str(config)) == ["0 3 * * * off"]
@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import argoneon
+
+# Generous, so a slow CI runner passes; benchmarks/import_time.py holds the real budget
+BUDGET_MS = 1000
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print((time.perf_counter() - start) * 1000)
+print(",".join(name for name in ("RPi.GPIO", "smbus2") if name in sys.modules))
+"""
+
+
+@pytest.mark.parametrize("module", ["argoneon.argond", "argoneon.oned", "argoneon.eond",
+                                    "argoneon.irdecoder", "argoneon.status"])
+def test_entry_point_import(module):
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(list(argoneon.__path__)[0]))
+    output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)],
+                            capture_output=True, text=True, check=True, env=env).stdout
+    elapsed, hardware = output.splitlines()[-2:]
+    assert hardware == ""
+    assert float(elapsed) < BUDGET_MS